@@ -0,0 +1,69 @@
+'''
+    Translator time on large synthetic programs: the ProgramAnalysis pass,
+    the walks it replaced (GlobalVariableExtraction over the module, then
+    FunctionVariableExtraction over every function, kept in
+    separate_walks.py) and the full translation.
+
+        python benchmarks/bench_analysis.py -o analysis.json
+        python -m pyperf compare_to before.json after.json
+'''
+import ast
+import os
+import sys
+
+import pyperf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+from separate_walks import separate_walks  # noqa: E402
+from translate_utils.pipeline import translate  # noqa: E402
+from translate_utils.visitors.ProgramAnalysis import (  # noqa: E402
+    ProgramAnalysis)
+
+# (functions, statements per function) of the synthetic programs
+SIZES = ((50, 20), (200, 40))
+
+
+def synthetic_program(functions, statements):
+    '''
+        RBS source with the given number of functions, each made of a loop
+        and if-statements over a few locals, all called from the top level
+    '''
+    lines = ['_LIMIT = 100', 'total = 0', 'n = int(input())']
+    for f in range(functions):
+        lines += ['', '', f'def fn{f}(a, b):', '    acc = 0', '    i = 0',
+                  '    while i < a:']
+        for s in range(statements):
+            lines += [f'        v{s} = acc + {s}',
+                      f'        if v{s} > _LIMIT:',
+                      f'            acc = v{s} - b',
+                      '        else:',
+                      f'            acc = v{s} + 1']
+        lines += ['        i = i + 1', '    return acc']
+    lines.append('')
+    for f in range(functions):
+        lines += [f'r{f} = fn{f}(n, n)', f'total = total + r{f}']
+    lines.append('print(total)')
+    return '\n'.join(lines) + '\n'
+
+
+def fused_walk(root_node):
+    ProgramAnalysis().analyze(root_node)
+
+
+def main():
+    runner = pyperf.Runner()
+    for functions, statements in SIZES:
+        source = synthetic_program(functions, statements)
+        root_node = ast.parse(source)
+        size = f'{functions}x{statements}'
+        runner.bench_func(f'analysis separate walks {size}',
+                          separate_walks, root_node)
+        runner.bench_func(f'analysis fused walk {size}',
+                          fused_walk, root_node)
+        runner.bench_func(f'translate {size}', translate, source)
+
+
+if __name__ == '__main__':
+    main()
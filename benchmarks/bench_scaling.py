@@ -0,0 +1,165 @@
+'''
+    How the translator scales with the size of its input: the whole pipeline
+    (parse then translator.process) runs on seeded synthetic programs of
+    growing size, and the time and memory curves are fitted on a log-log
+    scale. A growth exponent above the threshold flags superlinear
+    behavior, in the whole pipeline or in one of its phases; the exit
+    status is then 1.
+
+        python benchmarks/bench_scaling.py
+        python benchmarks/bench_scaling.py --factors 1 2 4 8 16 --json
+'''
+import argparse
+import ast
+import io
+import json
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import ProgramShape, generate  # noqa: E402
+from translator import process  # noqa: E402
+from translate_utils.utils.timings import PhaseTimings  # noqa: E402
+
+FACTORS = (1, 2, 4, 8)
+# Growth exponent above which a curve is reported as superlinear
+THRESHOLD = 1.3
+# Phases faster than this (in seconds) at the largest size are too noisy
+# to be judged
+MIN_SECONDS = 0.01
+
+
+def measure(source, repeat):
+    '''
+        Best wall time of the pipeline over repeat runs, the peak memory of
+        a traced run and the time of every phase in a run with timings
+    '''
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _translate(source)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        _translate(source)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    timings = PhaseTimings()
+    _translate(source, timings)
+    phases = {}
+    for record in timings.phases:
+        # The peephole pass runs twice
+        phases[record['name']] = \
+            phases.get(record['name'], 0) + record['seconds']
+    return {'seconds': best, 'peak_bytes': peak, 'phases': phases}
+
+
+def exponent(sizes, values):
+    '''
+        Slope of the least-squares line through (log size, log value)
+    '''
+    points = [(math.log(s), math.log(v)) for s, v in zip(sizes, values)
+              if v > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    if not spread:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+
+
+def run(base, factors, seed, repeat, threshold):
+    results = []
+    for factor in factors:
+        shape = base.scaled(factor)
+        source = generate(shape, seed)
+        result = measure(source, repeat)
+        result.update(factor=factor, shape=repr(shape),
+                      lines=source.count('\n'),
+                      nodes=sum(1 for _ in ast.walk(ast.parse(source))))
+        results.append(result)
+
+    sizes = [r['nodes'] for r in results]
+    curves = {'total time': [r['seconds'] for r in results],
+              'peak memory': [r['peak_bytes'] for r in results]}
+    for name in results[-1]['phases']:
+        if results[-1]['phases'][name] >= MIN_SECONDS:
+            curves[f'phase {name}'] = [r['phases'].get(name, 0)
+                                       for r in results]
+    growth = {}
+    for name, values in curves.items():
+        slope = exponent(sizes, values)
+        growth[name] = {'exponent': slope,
+                        'superlinear': slope is not None
+                        and slope > threshold}
+    return {'seed': seed, 'threshold': threshold, 'sizes': results,
+            'growth': growth}
+
+
+def report(summary):
+    lines = [f'{"factor":>6}{"lines":>8}{"nodes":>9}{"ms":>11}'
+             f'{"peak MiB":>10}']
+    for r in summary['sizes']:
+        lines.append(f'{r["factor"]:>6}{r["lines"]:>8}{r["nodes"]:>9}'
+                     f'{r["seconds"] * 1000:>11.1f}'
+                     f'{r["peak_bytes"] / 1024 / 1024:>10.2f}')
+    lines.append('')
+    lines.append(f'growth exponents against the AST size (superlinear '
+                 f'above {summary["threshold"]})')
+    for name, growth in summary['growth'].items():
+        slope = growth['exponent']
+        flag = '  SUPERLINEAR' if growth['superlinear'] else ''
+        value = '-' if slope is None else f'{slope:.2f}'
+        lines.append(f'  {name:<32}{value:>6}{flag}')
+    return lines
+
+
+def main():
+    defaults = ProgramShape()
+    parser = argparse.ArgumentParser(
+        description='Translator time and memory against the input size')
+    parser.add_argument('--factors', type=int, nargs='+', default=FACTORS,
+                        help='sizes, as multiples of the base shape')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='untraced runs per size, the best one counts')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--json', default=False, action='store_true',
+                        help='print the measures as JSON')
+    for name in ('globals', 'functions', 'depth', 'arrays', 'collisions',
+                 'statements'):
+        parser.add_argument(f'--{name}', type=int,
+                            default=getattr(defaults, name),
+                            help='base shape (default: %(default)s)')
+    args = vars(parser.parse_args())
+    base = ProgramShape(**{name: args[name] for name in (
+        'globals', 'functions', 'depth', 'arrays', 'collisions',
+        'statements')})
+
+    summary = run(base, args['factors'], args['seed'], args['repeat'],
+                  args['threshold'])
+    if args['json']:
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+    else:
+        print('\n'.join(report(summary)))
+    if any(g['superlinear'] for g in summary['growth'].values()):
+        sys.exit(1)
+
+
+def _translate(source, timings=None):
+    process('<synthetic>', ast.parse(source), io.StringIO(),
+            {'timings': timings})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+'''
+    The walks ProgramAnalysis replaced, copied from the tree before it so that
+    bench_analysis.py can time them against the fused walk:
+    GlobalVariableExtraction over the module, then
+    FunctionVariableExtraction over every function
+'''
+import ast
+
+
+class GlobalVariableExtraction(ast.NodeVisitor):
+    """ 
+        We extract all the left hand side of the global (top-level) assignments
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        # Example: {var_name1: ('const', 42), var_name2: ('val', 10),
+        #           var_name3: ('other')}
+        self.results = {}
+        # Kept per instance so that consecutive translations in the same
+        # process (e.g. batch workers) do not share array indices
+        self.slicing_vars = set()
+        # depth of the while/if statement being visited
+        self.nesting = 0
+
+    def visit_Assign(self, node):
+        if len(node.targets) != 1:
+            raise ValueError("Only unary assignments are supported")
+
+        # Call visit_Subscript() if assigning a value to an array element
+        if isinstance(node.targets[0], ast.Subscript):
+            self.slicing_vars.add(node.targets[0].slice.id)
+            return
+        var_name = node.targets[0].id
+
+        if var_name in self.results.keys():
+            return
+        if var_name[0] == '_' and var_name[1:].isupper():
+            self.results[var_name] = ('const', node.value.value)
+        elif isinstance(node.value, ast.Constant) and not self.nesting:
+            # Only an assignment executed exactly once, at the module level,
+            # can become the initial value of the variable
+            self.results[var_name] = ('val', node.value.value)
+        elif var_name[-1] == '_':
+            self.results[var_name] = ('arr', node.value.right.value * 2)
+        else:
+            self.results[var_name] = ('other')
+
+    def visit_While(self, node):
+        self.nesting += 1
+        self.generic_visit(node)
+        self.nesting -= 1
+
+    def visit_If(self, node):
+        self.nesting += 1
+        self.generic_visit(node)
+        self.nesting -= 1
+
+    def visit_FunctionDef(self, node):
+        """
+            We do not visit function definitions, they are not global by
+            definition
+        """
+        pass
+
+
+class FunctionVariableExtraction(ast.NodeVisitor):
+    """
+        We extract all the left hand side of the 
+        local (function-level) assignments
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.results = {'local_var': [], 'params': [], 'return': []}
+        self.slicing_vars = set()
+
+    def visit_Assign(self, node):
+        if len(node.targets) != 1:
+            raise ValueError("Only unary assignments are supported")
+
+        # Add the slicing variable to slicing_vars sety if we encounter
+        # a Subscript
+        if isinstance(node.targets[0], ast.Subscript):
+            self.slicing_vars.add(node.targets[0].slice.id)
+            return
+
+        var_name = node.targets[0].id
+
+        # Ensure we don't add duplicate variable names
+        all_var_name = [t[0] for t in self.results['local_var']]
+        if (var_name in all_var_name or
+                var_name in self.results['params']):
+            return
+
+        # If we encounter an assignment statement that initialized an array
+        if var_name[-1] == '_':
+            # If the array is initialized with a fixed length, give it
+            # a size of length * 2
+            if isinstance(node.value.right, ast.Constant):
+                length = node.value.right.value * 2
+            else:
+                # Defaultly set the size of the array to 200, if it is of
+                # variable length
+                length = 200
+        else:
+            # Normal variables have a size of 2 bytes
+            length = 2
+        self.results['local_var'].append((node.targets[0].id, length))
+
+    def visit_arg(self, node):
+        self.results['params'].append(node.arg)
+
+    def visit_Return(self, node):
+        if not self.results['return']:
+            self.results['return'].append('retVal')
+
+
+def separate_walks(root_node):
+    extractor = GlobalVariableExtraction()
+    extractor.visit(root_node)
+    for node in root_node.body:
+        if isinstance(node, ast.FunctionDef):
+            FunctionVariableExtraction().visit(node)
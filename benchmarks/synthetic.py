@@ -0,0 +1,256 @@
+'''
+    Seeded generator of valid RBS programs of any size, for the scaling
+    benchmarks. The same seed and shape always give the same program.
+
+        python benchmarks/synthetic.py --seed 3 --functions 20 --depth 3
+'''
+import argparse
+import random
+import string
+
+# Trip count of the generated loops and size of the arrays
+TRIP = 3
+ARRAY_SIZE = 8
+
+# Locals are named after the first two characters of their function, which
+# must differ between functions: at most this many functions
+MAX_FUNCTIONS = 26 * 36
+
+
+class ProgramShape():
+    """
+        Size parameters of a generated program. collisions is the number of
+        groups of globals (and of locals) whose long names share the prefix
+        kept by the symbol table, so that they have to be told apart by a
+        suffix. Function names are not made to collide, their first two
+        characters name their locals
+    """
+
+    def __init__(self, globals=10, functions=5, depth=2, arrays=2,
+                 collisions=2, statements=6) -> None:
+        self.globals = globals
+        self.functions = functions
+        self.depth = depth              # nesting of the loops in functions
+        self.arrays = arrays
+        self.collisions = collisions
+        self.statements = statements    # per block of a function
+
+    def scaled(self, factor):
+        '''
+            The shape with factor times more globals, functions and arrays
+        '''
+        return ProgramShape(self.globals * factor, self.functions * factor,
+                            self.depth, self.arrays * factor,
+                            self.collisions * factor, self.statements)
+
+    def __repr__(self) -> str:
+        return (f'ProgramShape(globals={self.globals}, '
+                f'functions={self.functions}, depth={self.depth}, '
+                f'arrays={self.arrays}, collisions={self.collisions}, '
+                f'statements={self.statements})')
+
+
+def generate(shape, seed=0):
+    '''
+        RBS source of a program of the given shape. It reads one value,
+        every function is called from the top level and the values stay
+        far below the 16-bit limit, so that the Python and Pep/9 runs print
+        the same numbers
+    '''
+    if shape.functions > MAX_FUNCTIONS:
+        raise ValueError(f'At most {MAX_FUNCTIONS} functions')
+    return _Generator(shape, random.Random(seed)).program()
+
+
+class _Generator():
+    """Writes the program line by line"""
+
+    def __init__(self, shape, rng) -> None:
+        self.shape = shape
+        self.rng = rng
+        self.lines = []
+        self.indent = 0
+        self.loops = 0      # loop counters of the current function
+
+    def program(self):
+        shape = self.shape
+        self.arrays = [f'arr{a}_' for a in range(shape.arrays)]
+        # Globals keep 8 characters, locals 5 after their function's prefix
+        self.globals = _names('g', 'glob', shape.globals, shape.collisions)
+        self.functions = [
+            f'{_PREFIXES[i]}_{"routine" if i % 2 else "f"}{i}'
+            for i in range(shape.functions)]
+
+        self._line('_LIMIT = 1000')
+        self._line('_FLOOR = -1000')
+        self._line(f'_SIZE = {ARRAY_SIZE}')
+        for array in self.arrays:
+            self._line(f'{array} = [0] * {ARRAY_SIZE}')
+        for name in self.globals:
+            self._line(f'{name} = {self.rng.randrange(1, 50)}')
+        for index, name in enumerate(self.functions):
+            self._line('')
+            self._function(index, name)
+
+        self._line('')
+        self._line('n = int(input())')
+        self._line('total = 0')
+        for name in self.functions:
+            args = [self._global_or_input(), self._global_or_input()]
+            self._line(f'r = {name}({args[0]}, {args[1]})')
+            self._line('total = total + r')
+            self._reduce('total')
+        for name in self.globals:
+            self._line(f'{name} = {name} + total')
+            self._reduce(name)
+            self._line(f'print({name})')
+        self._line('print(total)')
+        return '\n'.join(self.lines) + '\n'
+
+    ####
+    # Functions
+    ####
+
+    def _function(self, index, name):
+        self.loops = 0
+        self.locals = _names('v', 'v', self.shape.statements,
+                             min(self.shape.collisions,
+                                 self.shape.statements // 2))
+        self._line(f'def {name}(a, b):')
+        self.indent += 1
+        self._line('acc = a')
+        for local in self.locals:
+            self._line(f'{local} = {self.rng.randrange(0, 20)}')
+        if self.arrays:
+            self._fill(self.rng.choice(self.arrays))
+        self._block(self.shape.depth, self.functions[:index])
+        self._line('return acc')
+        self.indent -= 1
+
+    def _block(self, depth, callees):
+        for _ in range(self.shape.statements):
+            kind = self.rng.randrange(5 if depth else 4)
+            if kind == 0 and not callees:
+                kind = 1
+            if kind == 0:
+                callee = self.rng.choice(callees)
+                self._line(f't = {callee}(acc, '
+                           f'{self.rng.choice(self.locals)})')
+                self._line('acc = acc + t')
+            elif kind == 1:
+                target = self.rng.choice(self.locals)
+                self._line(f'{target} = {self.rng.choice(self.locals)} '
+                           f'{self.rng.choice("+-")} {self._operand()}')
+                self._reduce(target)
+                self._line(f'acc = acc + {target}')
+            elif kind == 2:
+                local = self.rng.choice(self.locals)
+                self._line(f't = {local} * {self.rng.randrange(2, 9)}')
+                self._line(f'acc = acc + t')
+            elif kind == 3:
+                local = self.rng.choice(self.locals)
+                self._line(f'if {local} > {self._operand()}:')
+                self.indent += 1
+                self._line(f'acc = acc + {local}')
+                self.indent -= 1
+                self._line('else:')
+                self.indent += 1
+                self._line(f'acc = acc - {self.rng.randrange(1, 9)}')
+                self.indent -= 1
+            else:
+                # Nested loop
+                counter = f'k{self.loops}'
+                self.loops += 1
+                self._line(f'{counter} = 0')
+                self._line(f'while {counter} < {TRIP}:')
+                self.indent += 1
+                self._block(depth - 1, callees)
+                self._line(f'{counter} = {counter} + 1')
+                self.indent -= 1
+            self._reduce('acc')
+
+    def _fill(self, array):
+        '''
+            Store into every element of the array, then count the elements
+            above the second parameter
+        '''
+        self._line('i = 0')
+        self._line('while i < _SIZE:')
+        self.indent += 1
+        self._line(f'{array}[i] = a')
+        self._line('i = i + 1')
+        self.indent -= 1
+        self._line('i = 0')
+        self._line('while i < _SIZE:')
+        self.indent += 1
+        self._line(f'if {array}[i] > b:')
+        self.indent += 1
+        self._line('acc = acc + 1')
+        self.indent -= 1
+        self._line('i = i + 1')
+        self.indent -= 1
+
+    ####
+    # Helpers
+    ####
+
+    def _reduce(self, name):
+        # Keep the value between _FLOOR and _LIMIT
+        self._line(f'while {name} > _LIMIT:')
+        self.indent += 1
+        self._line(f'{name} = {name} - _LIMIT')
+        self.indent -= 1
+        self._line(f'while {name} < _FLOOR:')
+        self.indent += 1
+        self._line(f'{name} = {name} + _LIMIT')
+        self.indent -= 1
+
+    def _operand(self):
+        if self.rng.randrange(2):
+            return str(self.rng.randrange(1, 20))
+        return self.rng.choice(self.locals)
+
+    def _global_or_input(self):
+        if self.globals and self.rng.randrange(2):
+            return self.rng.choice(self.globals)
+        return 'n'
+
+    def _line(self, text):
+        self.lines.append('    ' * self.indent + text if text else '')
+
+
+_PREFIXES = [first + second for first in string.ascii_lowercase
+             for second in string.ascii_lowercase + string.digits]
+
+
+def _names(short, prefix, count, collisions):
+    '''
+        count distinct names, the first ones in collisions groups of names
+        that only differ past the characters the symbol table keeps (at
+        most 20 names per group, it tells apart 26 names by changing the
+        last character kept)
+    '''
+    names = []
+    for group in range(collisions):
+        for member in range(min(20, count - len(names))):
+            names.append(f'{prefix}{group:03d}z_{member}')
+    names += [f'{short}{i}' for i in range(count - len(names))]
+    return names[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Print a synthetic RBS program')
+    parser.add_argument('--seed', type=int, default=0)
+    defaults = ProgramShape()
+    for name in ('globals', 'functions', 'depth', 'arrays', 'collisions',
+                 'statements'):
+        parser.add_argument(f'--{name}', type=int,
+                            default=getattr(defaults, name))
+    args = vars(parser.parse_args())
+    seed = args.pop('seed')
+    print(generate(ProgramShape(**args), seed), end='')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+import os
+import sys
+
+import pytest
+
+# The tests import the translator from the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from translate_utils.pipeline import translate  # noqa: E402
+from translate_utils.utils.simulator import simulate  # noqa: E402
+
+# Instructions a test program may run before it is considered stuck
+MAX_STEPS = 5_000_000
+
+
+class _Exit(Exception):
+    """Raised by exit() in the Python run of a program"""
+
+
+def _word(value):
+    # Pep/9 prints signed 16-bit words
+    return ((value + 0x8000) & 0xFFFF) - 0x8000
+
+
+def python_output(source, inputs):
+    '''
+        The values a program prints when run by Python on the inputs
+    '''
+    values = iter(inputs)
+    output = []
+
+    def _exit():
+        raise _Exit()
+
+    env = {'input': lambda *_: str(next(values)),
+           'print': lambda value: output.append(_word(value)),
+           'exit': _exit}
+    try:
+        exec(compile(source, '<test>', 'exec'), env)
+    except _Exit:
+        pass
+    return output
+
+
+def pep9_output(source, inputs, max_steps=MAX_STEPS, **options):
+    '''
+        The values a program prints once translated and simulated
+    '''
+    assembly = translate(source, **options)
+    return simulate(assembly, list(inputs), max_steps)['values']
+
+
+@pytest.fixture
+def check():
+    '''
+        Assert that the translated program prints what Python prints
+    '''
+    def check(source, inputs=(), **options):
+        assert pep9_output(source, inputs, **options) == \
+            python_output(source, inputs)
+    return check
@@ -0,0 +1,83 @@
+'''
+    Reuse of translated functions from the on-disk cache
+'''
+import os
+
+import pytest
+
+from translate_utils.pipeline import translate
+from translate_utils.utils.cache import TranslationCache
+
+# f is recursive so that it stays a function of its own
+FUNCTION = '''
+def f(a):
+    s = 0
+    i = 0
+    while i < a:
+        if i > 2:
+            s = s + i
+        i = i + 1
+    if a > 100:
+        s = f(s)
+    return s
+'''
+
+# The same function after another one with its own loops and ifs: its
+# labels are numbered from another position
+OTHER = '''
+def g(b):
+    k = 0
+    while k < b:
+        if k > 1:
+            k = k + 2
+        k = k + 1
+    if b > 100:
+        k = g(k)
+    return k
+'''
+
+TOP_LEVEL = '''
+n = int(input())
+r = f(n)
+print(r)
+'''
+
+
+def test_hit_renumbers_labels(tmp_path, check):
+    cache = TranslationCache(str(tmp_path))
+    translate(FUNCTION + TOP_LEVEL, cache=cache)
+    assert cache.hits == 0
+
+    source = OTHER + FUNCTION + TOP_LEVEL + 'r = g(n)\nprint(r)\n'
+    output = translate(source, cache=cache)
+    assert cache.hits == 1
+    assert output == translate(source)
+    check(source, [6], cache=cache)
+
+
+def test_least_recently_used_evicted(tmp_path):
+    entry = {'code': 'x' * 100}
+    cache = TranslationCache(str(tmp_path), max_bytes=250)
+    for key in ('a', 'b'):
+        cache.put(key, entry)
+    # a was used after b
+    os.utime(tmp_path / 'a.json', (1000, 1000))
+    os.utime(tmp_path / 'b.json', (2000, 2000))
+    assert cache.get('a') == entry
+
+    cache.put('c', entry)
+    assert cache.evicted > 0
+    assert cache.get('b') is None
+    assert cache.get('a') == entry
+    assert cache.get('c') == entry
+
+
+@pytest.mark.parametrize('directory', ('/proc/nope', '/dev/null/x'))
+def test_unwritable_directory_skipped(check, capsys, directory):
+    cache = TranslationCache(directory)
+    check(FUNCTION + TOP_LEVEL, [5], cache=cache)
+    check(FUNCTION + TOP_LEVEL, [5], cache=cache)
+    warnings = [line for line in capsys.readouterr().err.splitlines()
+                if line.startswith('warning:')]
+    assert len(warnings) == 1
+    assert cache.hits == 0
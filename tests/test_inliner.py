@@ -0,0 +1,52 @@
+'''
+    Inlining of small leaf functions
+'''
+
+
+def test_constant_arguments_printed_and_compared(check):
+    check('''
+def show(a):
+    print(a)
+    return a
+
+
+def positive(b):
+    r = 0
+    if b > 0:
+        r = 1
+    print(r)
+    return r
+
+
+show(5)
+y = show(7)
+print(y)
+z = positive(3)
+print(z)
+''')
+
+
+def test_void_function_printing_constant(check):
+    check('''
+def show(a):
+    print(a)
+
+
+show(5)
+show(7)
+''')
+
+
+def test_variable_arguments(check):
+    check('''
+def add(a, b):
+    c = a + b
+    return c
+
+
+x = int(input())
+y = add(x, 3)
+print(y)
+z = add(y, x)
+print(z)
+''', [4])
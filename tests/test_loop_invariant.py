@@ -0,0 +1,39 @@
+'''
+    Loop-invariant code motion
+'''
+
+
+def test_hoisted_call_runs_only_with_the_loop(check):
+    # spin never returns: moved before a loop that does not run, it hangs
+    check('''
+def spin(n):
+    return spin(n + 2)
+
+
+c = int(input())
+k = int(input())
+i = 0
+r = 0
+while i < c:
+    r = spin(k)
+    i = i + 1
+print(r)
+''', [0, 1])
+
+
+def test_hoisted_call_computed_once(check):
+    check('''
+def twice(n):
+    return n * 2
+
+
+c = int(input())
+k = int(input())
+i = 0
+r = 0
+while i < c:
+    t = twice(k)
+    r = r + t
+    i = i + 1
+print(r)
+''', [4, 3])
@@ -0,0 +1,77 @@
+'''
+    Every sample, translated with each configuration of options, prints
+    what Python prints
+'''
+import glob
+import io
+import os
+
+import pytest
+
+from translate_utils.pipeline import translate
+from translate_utils.utils.assembler import assemble, object_text
+from translate_utils.utils.block_profile import BlockProfile
+
+SAMPLES = sorted(glob.glob(os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    '_samples', '*', '*.py')))
+
+# Inputs of the samples reading any, by file name
+INPUTS = {
+    'add_sub': [[5], [100]], 'factorial': [[5], [7]],
+    'fibonnaci': [[10], [1]], 'mult': [[6, 7], [3, 0]], 'simple': [[]],
+    'gcd': [[12, 18], [35, 14]], 'smart_mult': [[6, 7], [9, 3]],
+    'call_param': [[3, 4]], 'call_return': [[3, 4]], 'call_void': [[3, 4]],
+    'factorial_rec': [[5], [6]], 'fib_rec': [[10], [1]],
+    'eratosthenes': [[50]], 'eratosthenes_local': [[50]],
+    'fibo_cached': [[20]], 'global_read': [[3, 2, 10, 20]],
+    'local_read': [[3, 2, 10, 20]],
+}
+
+# Options of each configuration, on top of the defaults: every pass
+# disabled in turn, or an optional mode enabled
+CONFIGURATIONS = {
+    'default': {},
+    'no-peephole': {'peephole': False},
+    'no-fold': {'fold': False},
+    'no-track-registers': {'track_registers': False},
+    'no-tail-calls': {'tail_calls': False},
+    'no-inline': {'inline': False},
+    'no-hoist': {'hoist': False},
+    'no-dead-code': {'dead_code': False},
+    'profile': {'profile': BlockProfile},
+    'no-share-slots': {'share_slots': False},
+    'memoize': {'memoize': True},
+    'no-evaluate': {'evaluate': False},
+}
+
+
+def _name(path):
+    return os.path.relpath(path, os.path.dirname(os.path.dirname(path)))
+
+
+def _source(path):
+    with open(path) as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('configuration', CONFIGURATIONS)
+@pytest.mark.parametrize('path', SAMPLES, ids=_name)
+def test_sample(check, path, configuration):
+    source = _source(path)
+    for inputs in INPUTS[os.path.basename(path)[:-3]]:
+        options = dict(CONFIGURATIONS[configuration])
+        if 'profile' in options:
+            # A profile collects the counters of a single program
+            options['profile'] = options['profile']()
+        check(source, inputs, **options)
+
+
+@pytest.mark.parametrize('path', SAMPLES, ids=_name)
+def test_object_code(path):
+    # The object code written directly matches the assembled text
+    source = _source(path)
+    listing = io.StringIO()
+    assert translate(source, object=True, listing=listing) == \
+        object_text(assemble(translate(source)).code)
+    assert listing.getvalue()
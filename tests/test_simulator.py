@@ -0,0 +1,45 @@
+'''
+    Execution statistics of the simulator
+'''
+from translate_utils.utils.assembler import assemble
+from translate_utils.utils.simulator import Pep9Simulator, simulate
+
+# A call to a routine storing into and printing a local through the index
+# register
+PROGRAM = '''
+main:    CALL    sub
+         STOP
+sub:     SUBSP   4,i
+         LDWX    2,i
+         LDWA    7,i
+         STWA    0,sx
+         DECO    0,sx
+         ADDSP   4,i
+         RET
+         .END
+'''
+
+
+def test_statistics():
+    stats = simulate(PROGRAM)
+    assert stats['values'] == [7]
+    assert stats['instructions'] == 9
+    # DECO and RET read, CALL and STWA write
+    assert stats['memory_reads'] == 2
+    assert stats['memory_writes'] == 2
+    # Return address and the 4 bytes of locals
+    assert stats['stack_high_water'] == 6
+    # 23 bytes of instructions fetched, 4 words of data
+    assert stats['cycles'] == 31
+    assert stats['histogram'] == {
+        'CALL': 1, 'STOP': 1, 'SUBSP': 1, 'LDWX': 1, 'LDWA': 1, 'STWA': 1,
+        'DECO': 1, 'ADDSP': 1, 'RET': 1}
+
+
+def test_stack_addressing():
+    simulator = Pep9Simulator(assemble(PROGRAM))
+    simulator.run()
+    # sub's locals start 6 bytes below the top, X selects the second word
+    address = simulator.stack_top - 4
+    assert simulator.memory[address:address + 2] == bytes([0, 7])
+    assert simulator.sp == simulator.stack_top
@@ -0,0 +1,47 @@
+'''
+    Tail self-calls compiled as jumps
+'''
+
+
+def test_accumulator(check):
+    check('''
+def fact(n):
+    if n < 2:
+        return 1
+    r = fact(n - 1)
+    r = r * n
+    return r
+
+
+n = int(input())
+x = fact(n)
+print(x)
+''', [6])
+
+
+def test_locals_named_like_hidden_ones(check):
+    # The accumulator and the temporaries are named apart from these
+    check('''
+def fact(n):
+    _acc = 1
+    _0 = 2
+    if n < _0:
+        return _acc
+    r = fact(n - 1)
+    r = r * n
+    return r
+
+
+def swap(a, b, _t0):
+    if a < 1:
+        return b
+    return swap(b - 1, a, _t0)
+
+
+n = int(input())
+x = fact(n)
+print(x)
+m = int(input())
+y = swap(m, 9, 0)
+print(y)
+''', [4, 5])
@@ -0,0 +1,66 @@
+'''
+    Phase and function timings of a translation
+'''
+import json
+import sys
+
+import translator
+from translate_utils.pipeline import translate
+from translate_utils.utils.timings import PhaseTimings
+
+SOURCE = '''
+def f(a):
+    b = a + 1
+    return b
+
+
+n = int(input())
+r = f(n)
+print(r)
+'''
+
+KEYS = {'name', 'seconds', 'peak_bytes', 'nodes', 'instructions'}
+
+
+def test_phases_and_functions():
+    timings = PhaseTimings()
+    translate(SOURCE, inline=False, timings=timings)
+    data = timings.to_json()
+    assert set(data) == {'seconds', 'peak_bytes', 'phases', 'functions'}
+    names = [record['name'] for record in data['phases']]
+    for name in ('parse', 'fold', 'analysis', 'visit', 'peephole',
+                 'emission'):
+        assert name in names
+    assert [record['name'] for record in data['functions']] == ['f']
+    for record in data['phases']:
+        assert set(record) == KEYS
+        assert record['seconds'] >= 0
+    # Function records also tell whether the cache provided the function
+    assert set(data['functions'][0]) == KEYS | {'cached'}
+    assert not data['functions'][0]['cached']
+    assert data['functions'][0]['instructions'] > 0
+    assert len(timings.table()) == len(names) + 4
+
+
+def test_json_line():
+    timings = PhaseTimings()
+    translate(SOURCE, timings=timings)
+    line = translator.format_timings(timings, 'json', 'a.py')
+    assert line.endswith('\n') and line.count('\n') == 1
+    data = json.loads(line)
+    assert data['file'] == 'a.py'
+    assert data['phases'] == json.loads(json.dumps(timings.to_json()))[
+        'phases']
+
+
+def test_command_line(tmp_path, capsys, monkeypatch):
+    source = tmp_path / 'a.py'
+    source.write_text(SOURCE)
+    monkeypatch.setattr(sys, 'argv', ['translator.py', '-f', str(source),
+                                      '--no-cache', '--timings', 'json'])
+    translator.main()
+    out, err = capsys.readouterr()
+    assert out.rstrip().endswith('.END')
+    data = json.loads(err)
+    assert data['file'] == str(source)
+    assert {'seconds', 'peak_bytes', 'phases', 'functions'} < set(data)
@@ -0,0 +1,135 @@
+'''
+    Command line modes of translator.py
+'''
+import json
+import os
+import signal
+
+import pytest
+
+import translator
+from translate_utils.pipeline import translate
+
+
+def test_batch(tmp_path, capsys):
+    sources = tmp_path / 'src'
+    (sources / 'sub').mkdir(parents=True)
+    (sources / 'a.py').write_text('x = 1\nprint(x)\n')
+    (sources / 'sub' / 'b.py').write_text('y = 2\nprint(y)\n')
+    (sources / 'bad.py').write_text('x = (\n')
+    out = tmp_path / 'out'
+    # The directory and the glob name the same files
+    paths = [str(sources), str(sources / '*.py')]
+
+    assert len(translator.collect_inputs(paths)) == 3
+    assert translator.translate_batch(paths, str(out), jobs=2) == 1
+    for name in ('a.pep', os.path.join('sub', 'b.pep')):
+        text = (out / name).read_text()
+        assert 'BR tl_1' in text and '.END' in text
+    assert not (out / 'bad.pep').exists()
+    errors = capsys.readouterr().err
+    assert 'bad.py: SyntaxError' in errors
+    assert 'Translated 2/3 files (1 failed)' in errors
+
+
+def test_watch_survives_translation_errors(tmp_path, capsys, monkeypatch):
+    source = tmp_path / 'a.py'
+    # print() of a literal is not supported, the visitor raises
+    # AttributeError
+    source.write_text('print(5)\n')
+
+    def run(paths):
+        translate(source.read_text())
+
+    def sleep(_):
+        raise KeyboardInterrupt()
+
+    monkeypatch.setattr(translator.time, 'sleep', sleep)
+    with pytest.raises(SystemExit) as exit_info:
+        translator.watch([str(source)], run)
+    assert exit_info.value.code == 0
+    assert 'error: AttributeError' in capsys.readouterr().err
+
+
+
+
+####
+# Serve mode
+####
+
+REQUEST = {'id': 1, 'source': 'x = 1\nprint(x)\n'}
+
+
+@pytest.fixture
+def server():
+    server = translator.TranslationServer({}, jobs=1)
+    yield server
+    server.close()
+
+
+def _ask(server, *requests):
+    '''
+        The responses to the requests (JSON objects or raw lines), by id
+    '''
+    responses = []
+    for request in requests:
+        line = request if isinstance(request, str) else json.dumps(request)
+        server.handle(line, responses.append)
+    server.wait()
+    return responses
+
+
+def test_serve_translates(server):
+    response, = _ask(server, dict(REQUEST, report=True))
+    assert response['ok'] and response['id'] == 1
+    assert 'BR tl_1' in response['output']
+    assert response['error'] is None
+    assert response['diagnostics']
+    assert response['seconds'] >= 0
+
+
+def test_serve_invalid_json(server):
+    response, = _ask(server, '{"id": 1, "source":')
+    assert not response['ok'] and response['id'] is None
+    assert response['error'].startswith('invalid request')
+
+
+def test_serve_unknown_options(server):
+    response, = _ask(server, dict(REQUEST, id=2, options={'nope': True}))
+    assert not response['ok'] and response['id'] == 2
+    assert response['error'] == 'invalid request: unknown options: nope'
+
+
+def test_serve_syntax_error(server):
+    response, = _ask(server, dict(REQUEST, source='x = 1\ny = (\n'))
+    assert not response['ok']
+    assert response['error'].startswith('SyntaxError')
+    assert response['line'] == 2
+
+
+def test_serve_timeout():
+    server = translator.TranslationServer({}, jobs=1, timeout=0.01)
+    source = 'x = 1\n' + 'x = x + 1\n' * 20000 + 'print(x)\n'
+    try:
+        response, = _ask(server, dict(REQUEST, source=source))
+    finally:
+        server.close()
+    assert not response['ok']
+    assert response['error'] == 'TimeoutError: the translation took too long'
+
+
+def test_serve_replaces_dead_workers(server):
+    assert _ask(server, REQUEST)[0]['ok']
+    pool = server._TranslationServer__pool
+    for pid in list(pool._processes):
+        os.kill(pid, signal.SIGKILL)
+    # The request started before the pool notices the death fails, the
+    # next ones get a new pool
+    responses = []
+    while len(responses) < 3:
+        responses += _ask(server, REQUEST)
+        if responses[-1]['ok']:
+            break
+    assert responses[-1]['ok']
+    assert all(r['error'].startswith('BrokenProcessPool')
+               for r in responses[:-1])
@@ -1,29 +1,56 @@
+import sys
 from ..utils.symbol_table import SymbolTable as st
+from ..optimizers.StackSlots import sequential
+from ..visitors.ProgramAnalysis import FunctionInfo
 
 
 class DynamicMemoryAllocation():
 
-    def __init__(self, func_vars: dict(), st: st, func_name: str) -> None:
-        self.__func_vars = func_vars
+    def __init__(self, func_info: FunctionInfo, st: st, func_name: str,
+                 light: bool = False, offsets=None) -> None:
+        self.__func_info = func_info
         self.st = st
         self.f_name = func_name
+        # light calling convention: no locals, the parameter is passed in
+        # the accumulator and spilled below the return address
+        self.light = light
+        # {local: offset}, locals whose live ranges are disjoint may share
+        # an offset (see StackSlotSharing). None to place them one after
+        # the other
+        if offsets is None:
+            offsets, _ = sequential(func_info.local_vars)
+        self.offsets = offsets
 
-    def generate(self):
+    def generate(self, writer=None):
+        if writer is None:
+            writer = sys.stdout
+        if self.light:
+            lines = ['; Allocating memory for the parameter (passed in A)']
+            for var in self.__func_info.params:
+                name = self.st.func_convert(var, self.f_name)
+                lines.append(f'{str(name+":"):<9}\t.EQUATE -2')
+            lines.append('')
+            writer.write('\n'.join(lines))
+            return
         count = 0
-        print(f'; Allocating memory for local variables')
-        for var in self.__func_vars['local_var']:
+        lines = [f'; Allocating memory for local variables']
+        for var in self.__func_info.local_vars:
             name = self.st.func_convert(var[0], self.f_name)
             # check if it is an array
             if var[0][-1] == '_':
                 self.st.add_special_var(name)
-            print(f'{str(name+":"):<9}\t.EQUATE {count}')
-            # Increment the stack pointer value
-            count += var[1]
+            offset = self.offsets[var[0]]
+            lines.append(f'{str(name+":"):<9}\t.EQUATE {offset}')
+            # The locals end after the last slot
+            count = max(count, offset + var[1])
 
         # Push two bytes to the stack for function's return address
         count += 2
-        print(f'; Allocating memory for parameters and return value')
-        for var in self.__func_vars['params'] + self.__func_vars['return']:
+        lines.append(f'; Allocating memory for parameters and return value')
+        returns = ('retVal',) if self.__func_info.returns else ()
+        for var in self.__func_info.params + returns:
             name = self.st.func_convert(var, self.f_name)
-            print(f'{str(name+":"):<9}\t.EQUATE {count}')
+            lines.append(f'{str(name+":"):<9}\t.EQUATE {count}')
             count += 2
+        lines.append('')
+        writer.write('\n'.join(lines))
@@ -1,3 +1,5 @@
+import sys
+from ..utils.assembler import Assembler, listing_text, object_text
 from ..utils.symbol_table import SymbolTable as st
 
 
@@ -6,8 +8,27 @@ class EntryPoint():
     def __init__(self, instructions) -> None:
         self.__instructions = instructions
 
-    def generate(self):
-        print('; Top Level instructions')
-        for label, instr in self.__instructions:
-            s = f'\t\t{instr}' if label == None else f'{str(label)+":":<9}\t{instr}'
-            print(s)
+    def generate(self, writer=None):
+        if writer is None:
+            writer = sys.stdout
+        lines = ['; Top Level instructions']
+        for instruction in self.__instructions:
+            lines.append(instruction.line())
+        lines.append('')
+        writer.write('\n'.join(lines))
+
+    def generate_object(self, data: str, writer=None, listing=None):
+        '''
+            Write the object code of the program in the hex format of the
+            Pep/9 loader: data holds the assembly written before the
+            instructions (branch to the top level, globals, frames), the
+            instructions are encoded directly. listing is an optional text
+            sink receiving the assembler listing
+        '''
+        if writer is None:
+            writer = sys.stdout
+        program = Assembler(data.splitlines() + self.__instructions) \
+            .assemble(listing is not None)
+        writer.write(object_text(program.code))
+        if listing is not None:
+            listing.write(listing_text(program))
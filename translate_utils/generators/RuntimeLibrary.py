@@ -0,0 +1,129 @@
+from ..utils.ir import Instruction
+
+
+class RuntimeLibrary():
+    """
+        Pep/9 routines shared by the generated code. They are emitted once,
+        after the program, and only when some instruction calls them.
+
+        Calling convention: the left operand is passed in the accumulator,
+        the right one in the word pushed right before the CALL (2,s on
+        entry). The result is returned in the accumulator; the index
+        register is preserved.
+    """
+
+    MULTIPLY = '_mul_rt'
+    DIVIDE = '_div_rt'
+
+    def __init__(self, used) -> None:
+        self.__used = used
+
+    def generate(self):
+        instructions = []
+        for name, routine in ((RuntimeLibrary.MULTIPLY, MULTIPLY),
+                              (RuntimeLibrary.DIVIDE, DIVIDE)):
+            if name in self.__used:
+                instructions += [Instruction.parse(instr, label)
+                                 for label, instr in routine]
+        return instructions
+
+
+# A * B with 16-bit wraparound, by shift-and-add over the bits of B.
+# Frame: 0 product, 2 shifted A, 4 shifted B, 6 saved X, 10 B
+MULTIPLY = [
+    ('_mul_rt', 'SUBSP 8,i'),
+    (None, 'STWX 6,s'),
+    (None, 'STWA 2,s'),
+    (None, 'LDWA 10,s'),
+    (None, 'STWA 4,s'),
+    (None, 'LDWA 0,i'),
+    (None, 'STWA 0,s'),
+    # X counts the bits left, B may be negative and never reach 0
+    (None, 'LDWX 16,i'),
+    ('_mul_lp', 'LDWA 4,s'),
+    (None, 'BREQ _mul_end'),
+    (None, 'ANDA 1,i'),
+    (None, 'BREQ _mul_sk'),
+    (None, 'LDWA 0,s'),
+    (None, 'ADDA 2,s'),
+    (None, 'STWA 0,s'),
+    ('_mul_sk', 'LDWA 2,s'),
+    (None, 'ASLA'),
+    (None, 'STWA 2,s'),
+    (None, 'LDWA 4,s'),
+    (None, 'ASRA'),
+    (None, 'STWA 4,s'),
+    (None, 'SUBX 1,i'),
+    (None, 'BRNE _mul_lp'),
+    ('_mul_end', 'LDWA 0,s'),
+    (None, 'LDWX 6,s'),
+    (None, 'ADDSP 8,i'),
+    (None, 'RET'),
+]
+
+# A // B in the accumulator and A % B in the argument word (0,s once
+# returned), both with Python's floor semantics. Restoring division of the
+# magnitudes, then sign correction. Division by zero gives an unspecified
+# result.
+# Frame: 0 quotient, 2 remainder, 4 |B|, 6 A, 8 saved X, 12 B
+DIVIDE = [
+    ('_div_rt', 'SUBSP 10,i'),
+    (None, 'STWX 8,s'),
+    (None, 'STWA 6,s'),
+    (None, 'CPWA 0,i'),
+    (None, 'BRGE _div_pa'),
+    (None, 'NEGA'),
+    ('_div_pa', 'STWA 0,s'),
+    (None, 'LDWA 12,s'),
+    (None, 'BRGE _div_pb'),
+    (None, 'NEGA'),
+    ('_div_pb', 'STWA 4,s'),
+    (None, 'LDWA 0,i'),
+    (None, 'STWA 2,s'),
+    (None, 'LDWX 16,i'),
+    # Shift the next bit of the dividend into the remainder
+    ('_div_lp', 'LDWA 0,s'),
+    (None, 'ASLA'),
+    (None, 'STWA 0,s'),
+    (None, 'LDWA 2,s'),
+    (None, 'ROLA'),
+    (None, 'STWA 2,s'),
+    # No borrow (C set) when the remainder is at least the divisor
+    (None, 'SUBA 4,s'),
+    (None, 'BRC _div_ge'),
+    (None, 'BR _div_nx'),
+    ('_div_ge', 'STWA 2,s'),
+    (None, 'LDWA 0,s'),
+    (None, 'ORA 1,i'),
+    (None, 'STWA 0,s'),
+    ('_div_nx', 'SUBX 1,i'),
+    (None, 'BRNE _div_lp'),
+    # The truncated remainder takes the sign of A
+    (None, 'LDWA 6,s'),
+    (None, 'BRGE _div_ap'),
+    (None, 'LDWA 2,s'),
+    (None, 'NEGA'),
+    (None, 'STWA 2,s'),
+    (None, 'LDWA 12,s'),
+    (None, 'BRLT _div_sm'),
+    (None, 'BR _div_df'),
+    ('_div_ap', 'LDWA 12,s'),
+    (None, 'BRGE _div_sm'),
+    # Signs differ: negate the quotient and round it towards -infinity
+    ('_div_df', 'LDWA 0,s'),
+    (None, 'NEGA'),
+    (None, 'STWA 0,s'),
+    (None, 'LDWA 2,s'),
+    (None, 'BREQ _div_sm'),
+    (None, 'ADDA 12,s'),
+    (None, 'STWA 2,s'),
+    (None, 'LDWA 0,s'),
+    (None, 'SUBA 1,i'),
+    (None, 'STWA 0,s'),
+    ('_div_sm', 'LDWA 2,s'),
+    (None, 'STWA 12,s'),
+    (None, 'LDWA 0,s'),
+    (None, 'LDWX 8,s'),
+    (None, 'ADDSP 10,i'),
+    (None, 'RET'),
+]
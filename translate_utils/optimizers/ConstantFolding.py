@@ -0,0 +1,176 @@
+import ast
+import operator
+
+# Operators evaluated at translation time
+OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    # Same floor semantics as the runtime division routine
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+}
+
+
+def to_word(value: int) -> int:
+    '''
+        Wrap a Python integer around like a signed 16-bit Pep/9 word
+    '''
+    return ((value + 0x8000) & 0xFFFF) - 0x8000
+
+
+def is_constant_name(name: str) -> bool:
+    # Constants are named _UPPERCASE and become .EQUATE symbols
+    return len(name) > 1 and name[0] == '_' and name[1:].isupper()
+
+
+class ConstantFolding(ast.NodeTransformer):
+    """
+        Evaluates literal and _CONSTANT subexpressions at translation time
+        with Pep/9's 16-bit wraparound, and simplifies identities
+        (x + 0, 0 + x, x - 0, (x + 1) + 2, x * 1, x * 0, x // 1, x % 1)
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.constants = {}     # value of every _CONSTANT defined globally
+        self.folded = 0         # expressions replaced by a constant
+        self.simplified = 0     # identities removed
+
+    def report(self):
+        return [f'; folding {self.folded} expressions folded, '
+                f'{self.simplified} identities simplified']
+
+    def visit_Module(self, node):
+        # Collect the constants first, functions may be defined before them
+        for statement in node.body:
+            if (isinstance(statement, ast.Assign)
+                    and isinstance(statement.targets[0], ast.Name)
+                    and is_constant_name(statement.targets[0].id)):
+                statement.value = self.visit(statement.value)
+                value = self._value(statement.value)
+                if value is not None:
+                    self.constants[statement.targets[0].id] = value
+        self.generic_visit(node)
+        return node
+
+    def visit_Assign(self, node):
+        self.generic_visit(node)
+        node.value = self._substitute(node.value)
+        return node
+
+    def visit_Return(self, node):
+        self.generic_visit(node)
+        node.value = self._substitute(node.value)
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        node.comparators = [self._substitute(c) for c in node.comparators]
+        return node
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        # print only accepts variables
+        if not (isinstance(node.func, ast.Name) and node.func.id == 'print'):
+            node.args = [self._substitute(arg) for arg in node.args]
+        return node
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        value = self._value(node.operand)
+        if value is None or not isinstance(node.op, (ast.USub, ast.UAdd)):
+            return node
+        self.folded += 1
+        return self._constant(-value if isinstance(node.op, ast.USub)
+                              else value, node)
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        left, right = self._value(node.left), self._value(node.right)
+        op = type(node.op)
+
+        if (left is not None and right is not None and op in OPERATORS
+                and not (op in (ast.FloorDiv, ast.Mod) and right == 0)):
+            self.folded += 1
+            return self._constant(OPERATORS[op](left, right), node)
+
+        if op in (ast.Add, ast.Sub):
+            if right == 0:
+                self.simplified += 1
+                return node.left
+            if left == 0 and op is ast.Add:
+                self.simplified += 1
+                return node.right
+            if right is not None and isinstance(node.left, ast.BinOp):
+                reassociated = self._reassociate(node, right)
+                if reassociated is not None:
+                    return reassociated
+        elif op in (ast.Mult, ast.FloorDiv, ast.Mod):
+            simplified = self._multiplicative_identity(node, op, left, right)
+            if simplified is not None:
+                self.simplified += 1
+                return simplified
+
+        node.left = self._substitute(node.left)
+        node.right = self._substitute(node.right)
+        return node
+
+    ####
+    # Helper functions
+    ####
+
+    def _reassociate(self, node, right):
+        '''
+            (x +/- c1) +/- c2 becomes x +/- c, or x if c is 0
+        '''
+        inner = self._value(node.left.right)
+        if inner is None or type(node.left.op) not in (ast.Add, ast.Sub):
+            return None
+        total = (inner if isinstance(node.left.op, ast.Add) else -inner) + \
+            (right if isinstance(node.op, ast.Add) else -right)
+        total = to_word(total)
+        self.simplified += 1
+        if total == 0:
+            return node.left.left
+        op = ast.Add() if total > 0 else ast.Sub()
+        return ast.copy_location(
+            ast.BinOp(node.left.left, op, self._constant(abs(total), node)),
+            node)
+
+    def _multiplicative_identity(self, node, op, left, right):
+        '''
+            The simplified form of x * 1, 1 * x, x * 0, 0 * x, x // 1 and
+            x % 1, None if node is none of them. Operands are variables or
+            constants, dropping one has no side effect
+        '''
+        if op is ast.Mult:
+            if right == 1:
+                return node.left
+            if left == 1:
+                return node.right
+            if 0 in (left, right):
+                return self._constant(0, node)
+        elif right == 1:
+            return node.left if op is ast.FloorDiv else self._constant(0, node)
+        return None
+
+    def _value(self, node):
+        '''
+            The value of a literal or known constant, None otherwise
+        '''
+        if isinstance(node, ast.Constant) and type(node.value) is int:
+            return node.value
+        if isinstance(node, ast.Name) and node.id in self.constants:
+            return self.constants[node.id]
+        return None
+
+    def _substitute(self, node):
+        # Replace a known constant's name by its value
+        if isinstance(node, ast.Name) and node.id in self.constants:
+            return self._constant(self.constants[node.id], node)
+        return node
+
+    @staticmethod
+    def _constant(value, node):
+        return ast.copy_location(ast.Constant(to_word(value)), node)
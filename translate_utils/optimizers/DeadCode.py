@@ -0,0 +1,219 @@
+import ast
+
+from .LoopInvariant import pure_functions
+
+
+class DeadCodeElimination():
+    """
+        Removes the functions the top-level code can never call, then the
+        stores whose value is never read:
+        - a variable assignment is dead when no path from it reaches a read
+          of the variable before another assignment (backward liveness over
+          the while/if structure of each function and of the module)
+        - an array that is never indexed for reading by the reachable code
+          loses its creation and every store to its elements
+
+        The value of a dead store is still computed when it calls a function
+        with effects (the statement becomes a bare call), and an assignment
+        reading the input is kept. Removing stores can make other variables
+        and functions dead, the passes are repeated until nothing changes.
+        Constants are never removed.
+    """
+
+    def __init__(self) -> None:
+        self.functions = []     # names of the removed functions
+        self.stores = 0         # removed assignments
+
+    def report(self):
+        lines = [f'; dead code {name} removed: not reachable from the top '
+                 f'level' for name in self.functions]
+        return lines + [f'; dead code {len(self.functions)} functions, '
+                        f'{self.stores} stores removed']
+
+    def eliminate(self, root_node):
+        # id -> (node, variables it reads), statements are replaced rather
+        # than modified so entries stay valid across the passes
+        self.__reads = {}
+        changed = True
+        while changed:
+            changed = self._unreachable(root_node)
+            functions = {node.name: node for node in root_node.body
+                         if isinstance(node, ast.FunctionDef)}
+            self.__pure = pure_functions(functions)
+            stores = self.stores
+            self._statements(root_node.body, set())
+            for node in functions.values():
+                self._statements(node.body, set())
+            changed = changed or self.stores != stores
+        return root_node
+
+    ####
+    # Call graph
+    ####
+
+    def _unreachable(self, root_node):
+        '''
+            Remove the functions not called, directly or not, by the top-level
+            statements, and collect the arrays the remaining code reads. True
+            if any function was removed
+        '''
+        functions = {node.name: node for node in root_node.body
+                     if isinstance(node, ast.FunctionDef)}
+        reachable = set()
+        self.__arrays = set()
+        pending = [s for s in root_node.body
+                   if not isinstance(s, ast.FunctionDef)]
+        while pending:
+            for n in ast.walk(pending.pop()):
+                if isinstance(n, ast.Call) and isinstance(n.func, ast.Name):
+                    name = n.func.id
+                    if name in functions and name not in reachable:
+                        reachable.add(name)
+                        pending.append(functions[name])
+                elif (isinstance(n, ast.Subscript)
+                        and isinstance(n.ctx, ast.Load)):
+                    self.__arrays.add(n.value.id)
+        dead = [name for name in functions if name not in reachable]
+        if not dead:
+            return False
+        self.functions += dead
+        root_node.body = [s for s in root_node.body
+                          if not isinstance(s, ast.FunctionDef)
+                          or s.name in reachable]
+        return True
+
+    ####
+    # Liveness
+    ####
+
+    def _statements(self, statements, live):
+        '''
+            Remove the dead stores of the statements, in place, given the
+            variables live after them. Return the variables live before them
+        '''
+        i = len(statements) - 1
+        while i >= 0:
+            statement = statements[i]
+            replacement, live = self._statement(statement, live)
+            if replacement is not statement:
+                statements[i:i + 1] = replacement
+            i -= 1
+        return live
+
+    def _statement(self, statement, live):
+        '''
+            (statements replacing the statement, variables live before it)
+        '''
+        if isinstance(statement, ast.Assign):
+            return self._assign(statement, live)
+        if isinstance(statement, ast.If):
+            after = set(live)
+            live = self._statements(statement.body, set(after))
+            live |= self._statements(statement.orelse, set(after))
+            if not statement.body and not statement.orelse:
+                return [], after | self._read(statement.test)
+            if not statement.body:
+                statement.body = [ast.copy_location(ast.Pass(), statement)]
+            return statement, live | self._read(statement.test)
+        if isinstance(statement, ast.While):
+            # Live at the test: read by the test, after the loop or by the
+            # body when it loops back
+            entry = set(live) | self._read(statement.test)
+            while True:
+                body = self._liveness(statement.body, entry)
+                grown = entry | body
+                if grown == entry:
+                    break
+                entry = grown
+            self._statements(statement.body, set(entry))
+            if not statement.body:
+                statement.body = [ast.copy_location(ast.Pass(), statement)]
+            return statement, entry
+        if isinstance(statement, ast.Return):
+            # Nothing after a return is reached
+            live = set()
+        if isinstance(statement, ast.FunctionDef):
+            return statement, live
+        return statement, live | self._read(statement)
+
+    def _assign(self, statement, live):
+        target = statement.targets[0]
+        if isinstance(target, ast.Subscript):
+            if target.value.id in self.__arrays or self._effects(statement):
+                return statement, live | self._read(statement)
+            self.stores += 1
+            return [], live
+        name = target.id
+        if name[-1] == '_':
+            dead = name not in self.__arrays
+        else:
+            dead = name not in live and not _is_constant(name)
+        # The target is not read by the statement, only stored
+        if not dead:
+            return statement, (live - {name}) | self._read(statement)
+        if _reads_input(statement.value):
+            return statement, (live - {name}) | self._read(statement)
+        self.stores += 1
+        if self._effects(statement.value):
+            call = ast.copy_location(ast.Expr(statement.value), statement)
+            return [call], live | self._read(statement)
+        return [], live
+
+    def _liveness(self, statements, live):
+        '''
+            The variables live before the statements, without removing
+            anything
+        '''
+        for statement in reversed(statements):
+            if isinstance(statement, ast.Assign):
+                target = statement.targets[0]
+                if isinstance(target, ast.Name):
+                    live = live - {target.id}
+                live = live | self._read(statement)
+            elif isinstance(statement, ast.If):
+                live = (self._liveness(statement.body, live)
+                        | self._liveness(statement.orelse, live)
+                        | self._read(statement.test))
+            elif isinstance(statement, ast.While):
+                entry = live | self._read(statement.test)
+                while True:
+                    grown = entry | self._liveness(statement.body, entry)
+                    if grown == entry:
+                        break
+                    entry = grown
+                live = entry
+            elif isinstance(statement, ast.Return):
+                live = self._read(statement)
+            else:
+                live = live | self._read(statement)
+        return live
+
+    def _read(self, node):
+        entry = self.__reads.get(id(node))
+        if entry is None:
+            entry = self.__reads[id(node)] = (node, frozenset(_read(node)))
+        return entry[1]
+
+    def _effects(self, node):
+        return any(isinstance(n, ast.Call) and not (
+            isinstance(n.func, ast.Name) and n.func.id in self.__pure)
+            for n in ast.walk(node))
+
+
+def _read(node):
+    '''
+        Variables read by the node, the names of called functions excluded
+    '''
+    nodes = list(ast.walk(node))
+    functions = {id(n.func) for n in nodes if isinstance(n, ast.Call)}
+    return {n.id for n in nodes if isinstance(n, ast.Name)
+            and isinstance(n.ctx, ast.Load) and id(n) not in functions}
+
+
+def _reads_input(node):
+    return any(isinstance(n, ast.Call) and isinstance(n.func, ast.Name)
+               and n.func.id == 'input' for n in ast.walk(node))
+
+
+def _is_constant(name):
+    return name[0] == '_' and name[1:].isupper()
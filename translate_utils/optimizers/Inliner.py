@@ -0,0 +1,254 @@
+import ast
+import copy
+
+from ..utils.fresh_names import FreshNames
+
+# Largest callee inlined by default, in statements (nested ones included)
+DEFAULT_BUDGET = 8
+
+
+class Inliner():
+    """
+        Substitutes the body of small leaf functions (calling no other
+        function, hence not recursive) at their call sites: r = f(x),
+        f(x) and return f(x). Parameters and locals of the callee are
+        renamed to fresh variables of the caller, short enough to keep their
+        name once converted, so that they get their own slot in the caller's
+        frame (or a global at the top level). A parameter that the callee
+        never reassigns is replaced by the argument itself.
+
+        Every call site gets a line in the decision log.
+    """
+
+    def __init__(self, budget=DEFAULT_BUDGET) -> None:
+        self.budget = budget
+        self.decisions = []     # one line per call site
+        self.inlined = 0
+
+    def report(self):
+        return self.decisions + [f'; inline {self.inlined} calls inlined']
+
+    def inline(self, root_node):
+        self.__functions = {node.name: node for node in root_node.body
+                            if isinstance(node, ast.FunctionDef)}
+        self.__reasons = {}     # callee -> why it cannot be inlined
+        self.__fresh = FreshNames(root_node)
+        # Array indices live in the index register, they are copied
+        # rather than substituted
+        self.__indices = {n.slice.id for n in ast.walk(root_node)
+                          if isinstance(n, ast.Subscript)
+                          and isinstance(n.slice, ast.Name)}
+
+        root_node.body = self._block(root_node.body, None)
+        for node in root_node.body:
+            if isinstance(node, ast.FunctionDef):
+                node.body = self._block(node.body, node)
+        return root_node
+
+    ####
+    # Call sites
+    ####
+
+    def _block(self, statements, caller):
+        result = []
+        for statement in statements:
+            if isinstance(statement, (ast.While, ast.If)):
+                statement.body = self._block(statement.body, caller)
+                statement.orelse = self._block(statement.orelse, caller)
+            site = _call_site(statement)
+            if site is None or site.func.id not in self.__functions:
+                result.append(statement)
+                continue
+            inlined = self._site(statement, site, caller)
+            if inlined is None:
+                result.append(statement)
+            else:
+                result += inlined
+        return result
+
+    def _site(self, statement, call, caller):
+        '''
+            The statements replacing the call site, None if the callee cannot
+            be inlined there
+        '''
+        callee = self.__functions[call.func.id]
+        reason = self._reason(callee)
+        returns = isinstance(callee.body[-1], ast.Return)
+        if reason is None:
+            reason = self._site_reason(statement, call, callee, caller,
+                                       returns)
+        where = f'{caller.name if caller else "<module>"} line ' \
+                f'{getattr(statement, "lineno", "?")}'
+        if reason is not None:
+            self.decisions.append(
+                f'; inline {where}: {callee.name} not inlined ({reason})')
+            return None
+
+        body = copy.deepcopy(callee.body)
+        value = body.pop().value if returns else None
+        params = [arg.arg for arg in callee.args.args]
+        assigned = _assigned(callee.body)
+        named = _named(callee.body)
+        renames = {}
+        inlined = []
+        for param, arg in zip(params, call.args):
+            if param not in assigned and (
+                    isinstance(arg, ast.Constant) and param not in named
+                    or isinstance(arg, ast.Name)
+                    and arg.id not in self.__indices):
+                renames[param] = arg
+            else:
+                renames[param] = ast.Name(self._fresh(), ast.Load())
+                inlined.append(_assign(renames[param].id, arg, statement))
+        for name in sorted(assigned - set(params)):
+            renames[name] = ast.Name(self._fresh(), ast.Load())
+
+        renamer = _Renamer(renames)
+        inlined += [renamer.visit(s) for s in body]
+        if isinstance(statement, ast.Assign):
+            inlined.append(_assign(statement.targets[0].id,
+                                   renamer.visit(value), statement))
+        elif isinstance(statement, ast.Return):
+            inlined.append(ast.copy_location(
+                ast.Return(renamer.visit(value)), statement))
+        for node in inlined:
+            ast.copy_location(node, statement)
+        self.inlined += 1
+        size = _size(callee.body)
+        self.decisions.append(f'; inline {where}: {callee.name} inlined '
+                              f'({size} statement{"s" * (size != 1)})')
+        return inlined
+
+    def _reason(self, callee):
+        '''
+            Why the callee cannot be inlined anywhere, None if it can
+        '''
+        if callee.name not in self.__reasons:
+            self.__reasons[callee.name] = self._callee_reason(callee)
+        return self.__reasons[callee.name]
+
+    def _callee_reason(self, callee):
+        nodes = list(ast.walk(callee))
+        called = {n.func.id for n in nodes
+                  if isinstance(n, ast.Call) and isinstance(n.func, ast.Name)}
+        if callee.name in called:
+            return 'recursive'
+        if called & set(self.__functions):
+            return 'not a leaf'
+        if any(isinstance(n, ast.Subscript) or isinstance(n, ast.Name)
+               and n.id[-1] == '_' for n in nodes):
+            return 'uses arrays'
+        if any(isinstance(n, ast.Return) and (n is not callee.body[-1]
+                                              or n.value is None)
+               for n in nodes):
+            return 'several returns'
+        size = _size(callee.body)
+        if size > self.budget:
+            return f'over budget, {size} > {self.budget} statements'
+        return None
+
+    def _site_reason(self, statement, call, callee, caller, returns):
+        if call.keywords or len(call.args) != len(callee.args.args):
+            return 'arguments do not match the parameters'
+        if not isinstance(statement, ast.Expr) and not returns:
+            return 'no return value'
+        if (isinstance(statement, ast.Expr) and returns
+                and not _pure(callee.body[-1].value)):
+            return 'discarded return value has side effects'
+        if caller is not None:
+            # Free variables of the callee must designate the same variables
+            # in the caller
+            params = [arg.arg for arg in callee.args.args]
+            free = _read(callee.body) - _assigned(callee.body) - set(params)
+            scope = _assigned(caller.body) | {a.arg for a in caller.args.args}
+            if free & scope:
+                return f'{", ".join(sorted(free & scope))} is local to ' \
+                       f'{caller.name}'
+        return None
+
+    def _fresh(self):
+        return self.__fresh.next()
+
+
+class _Renamer(ast.NodeTransformer):
+    """Replaces variables by the given expressions"""
+
+    def __init__(self, renames) -> None:
+        super().__init__()
+        self.renames = renames
+
+    def visit_Name(self, node):
+        if node.id not in self.renames:
+            return node
+        replacement = self.renames[node.id]
+        if isinstance(replacement, ast.Name):
+            return ast.copy_location(
+                ast.Name(replacement.id, node.ctx), node)
+        return ast.copy_location(copy.copy(replacement), node)
+
+
+def _call_site(statement):
+    '''
+        The call of r = f(x), f(x) or return f(x), None for other statements
+    '''
+    if isinstance(statement, ast.Assign):
+        if not isinstance(statement.targets[0], ast.Name):
+            return None
+        value = statement.value
+    elif isinstance(statement, (ast.Expr, ast.Return)):
+        value = statement.value
+    else:
+        return None
+    if isinstance(value, ast.Call) and isinstance(value.func, ast.Name):
+        return value
+    return None
+
+
+def _assigned(statements):
+    names = set()
+    for statement in statements:
+        for node in ast.walk(statement):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                names.add(node.id)
+    return names
+
+
+def _named(statements):
+    '''
+        Variables the code generator needs as names, not constants: printed
+        or on the left of a comparison
+    '''
+    names = set()
+    for statement in statements:
+        for node in ast.walk(statement):
+            if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                    and node.func.id == 'print'):
+                operands = node.args
+            elif isinstance(node, ast.Compare):
+                operands = [node.left]
+            else:
+                continue
+            names |= {n.id for n in operands if isinstance(n, ast.Name)}
+    return names
+
+
+def _read(statements):
+    nodes = [n for statement in statements for n in ast.walk(statement)]
+    # The name of a called function is not a variable
+    functions = {id(n.func) for n in nodes if isinstance(n, ast.Call)}
+    return {n.id for n in nodes if isinstance(n, ast.Name)
+            and isinstance(n.ctx, ast.Load) and id(n) not in functions}
+
+
+def _pure(value):
+    return all(not isinstance(n, ast.Call) for n in ast.walk(value))
+
+
+def _size(statements):
+    return sum(1 for statement in statements for node in ast.walk(statement)
+               if isinstance(node, ast.stmt))
+
+
+def _assign(name, value, location):
+    return ast.copy_location(
+        ast.Assign([ast.Name(name, ast.Store())], value), location)
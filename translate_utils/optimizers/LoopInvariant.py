@@ -0,0 +1,248 @@
+import ast
+import copy
+
+from ..utils.fresh_names import FreshNames
+
+# Built-in calls that are never moved: they read the input or write the
+# output
+EFFECTS = {'input', 'print'}
+
+
+class LoopInvariantMotion():
+    """
+        Moves the computations of a while loop that give the same result on
+        every iteration into a preheader placed just before the loop.
+
+        A statement x = e of the loop body (not nested in an if or a loop)
+        is invariant when e only reads variables the loop never assigns,
+        array elements the loop never stores and calls pure functions. It is
+        moved as a whole when x is assigned nowhere else in the loop, is not
+        read in the loop before it and is not read outside the loop (so that
+        running it when the loop does not iterate changes nothing).
+        Otherwise an invariant call or arithmetic expression is computed once
+        into a fresh variable, read by the statement. A pure function may
+        not terminate, so a preheader with a call is guarded by the loop
+        test and only runs when the loop does.
+
+        A function is pure when it only calls pure functions, reads no array
+        and no variable besides its parameters, locals and constants, and
+        divides by nonzero constants only.
+        Inner loops are processed first, what they hoist can then move out
+        of the outer loops.
+    """
+
+    def __init__(self) -> None:
+        self.hoisted = 0        # statements moved out of a loop
+        self.computed = 0       # expressions computed once in a preheader
+
+    def report(self):
+        return [f'; licm {self.hoisted} statements hoisted, {self.computed} '
+                f'expressions computed before their loop']
+
+    def hoist(self, root_node):
+        functions = {node.name: node for node in root_node.body
+                     if isinstance(node, ast.FunctionDef)}
+        self.__pure = pure_functions(functions)
+        self.__fresh = FreshNames(root_node)
+        self.__root = root_node
+        self.__indices = None   # collected when a statement can be moved
+
+        self._block(root_node.body, root_node.body)
+        for node in root_node.body:
+            if isinstance(node, ast.FunctionDef):
+                self._block(node.body, node.body)
+        return root_node
+
+    ####
+    # Loops
+    ####
+
+    def _block(self, statements, scope):
+        '''
+            Insert the preheaders of the loops of the statements, in place.
+            scope holds the statements of the enclosing function (or module)
+        '''
+        i = 0
+        while i < len(statements):
+            statement = statements[i]
+            if isinstance(statement, ast.While):
+                self._block(statement.body, scope)
+                preheader = self._loop(statement, scope)
+                statements[i:i] = preheader
+                i += len(preheader)
+            elif isinstance(statement, ast.If):
+                self._block(statement.body, scope)
+                self._block(statement.orelse, scope)
+            i += 1
+
+    def _loop(self, loop, scope):
+        '''
+            The preheader of the loop, whose body loses the hoisted statements
+        '''
+        nodes = list(ast.walk(loop))
+        stores = {}
+        for node in nodes:
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                stores[node.id] = stores.get(node.id, 0) + 1
+        arrays = {n.value.id for n in nodes if isinstance(n, ast.Subscript)
+                  and isinstance(n.ctx, ast.Store)}
+        # A function with effects may store any global array
+        effects = any(isinstance(n, ast.Call) and not self._pure_call(n)
+                      for n in nodes)
+        outside = None      # variables read out of the loop, when needed
+        preheader, body = [], []
+        seen = _read([loop.test])
+        for statement in loop.body:
+            if (isinstance(statement, ast.Assign)
+                    and isinstance(statement.targets[0], ast.Name)
+                    and self._invariant(statement.value, stores, arrays,
+                                        effects)):
+                target = statement.targets[0].id
+                if (stores[target] == 1 and target not in seen
+                        and _movable(target)
+                        and target not in self._indices()):
+                    if outside is None:
+                        outside = _read(
+                            [s for s in scope
+                             if not isinstance(s, ast.FunctionDef)],
+                            exclude=loop)
+                    if target not in outside:
+                        preheader.append(statement)
+                        del stores[target]
+                        self.hoisted += 1
+                        continue
+                if (isinstance(statement.value, (ast.BinOp, ast.Call))
+                        and target not in self._indices()):
+                    name = self.__fresh.next()
+                    preheader.append(ast.copy_location(ast.Assign(
+                        [ast.Name(name, ast.Store())], statement.value),
+                        statement))
+                    statement.value = ast.copy_location(
+                        ast.Name(name, ast.Load()), statement.value)
+                    self.computed += 1
+            seen |= _read([statement])
+            body.append(statement)
+        loop.body = body or [ast.copy_location(ast.Pass(), loop)]
+        if any(isinstance(n, ast.Call) for statement in preheader
+               for n in ast.walk(statement)):
+            # The call would otherwise run when the loop does not
+            preheader = [ast.copy_location(
+                ast.If(copy.deepcopy(loop.test), preheader, []), loop)]
+        return preheader
+
+    def _indices(self):
+        '''
+            Variables used as array indices, they live in the index register
+            and are left alone
+        '''
+        if self.__indices is None:
+            self.__indices = {n.slice.id for n in ast.walk(self.__root)
+                              if isinstance(n, ast.Subscript)
+                              and isinstance(n.slice, ast.Name)}
+        return self.__indices
+
+    def _invariant(self, value, stores, arrays, effects):
+        for node in ast.walk(value):
+            if isinstance(node, ast.Name):
+                if isinstance(node.ctx, ast.Load) and node.id in stores:
+                    return False
+            elif isinstance(node, ast.Call):
+                if not self._pure_call(node):
+                    return False
+            elif isinstance(node, ast.Subscript):
+                if effects or node.value.id in arrays:
+                    return False
+            elif isinstance(node, ast.BinOp):
+                if not _safe(node):
+                    return False
+            elif not isinstance(node, (ast.Constant, ast.UnaryOp,
+                                       ast.operator, ast.unaryop,
+                                       ast.expr_context)):
+                return False
+        return True
+
+    def _pure_call(self, node):
+        return (isinstance(node.func, ast.Name) and not node.keywords
+                and node.func.id in self.__pure)
+
+
+def pure_functions(functions):
+    '''
+        Names of the pure functions, the others are removed until none of
+        the remaining ones calls a removed function
+    '''
+    pure = {}       # name -> functions it calls
+    for name, node in functions.items():
+        local = {arg.arg for arg in node.args.args}
+        reads = set()
+        called = set()
+        effects = False
+        for n in ast.walk(node):
+            if isinstance(n, ast.Name):
+                if isinstance(n.ctx, ast.Store):
+                    local.add(n.id)
+                else:
+                    reads.add(n.id)
+            elif isinstance(n, ast.Call):
+                if (not isinstance(n.func, ast.Name) or n.func.id in EFFECTS
+                        or n.func.id not in functions):
+                    effects = True
+                    break
+                called.add(n.func.id)
+            elif (isinstance(n, ast.Subscript)
+                    or isinstance(n, ast.BinOp) and not _safe(n)):
+                effects = True
+                break
+        if effects or any(r not in local and not _is_constant(r)
+                          and r not in functions for r in reads):
+            continue
+        pure[name] = called
+    changed = True
+    while changed:
+        changed = False
+        for name in sorted(pure):
+            if any(callee not in pure for callee in pure[name]):
+                del pure[name]
+                changed = True
+    return set(pure)
+
+
+def _safe(node):
+    '''
+        False for a division by a value that may be zero. Python raises an
+        error for a zero divisor and the runtime routine returns an
+        unspecified result, such a division stays where the program has it
+    '''
+    if isinstance(node.op, (ast.FloorDiv, ast.Mod)):
+        return isinstance(node.right, ast.Constant) and node.right.value != 0
+    return True
+
+
+def _is_constant(name):
+    return name[0] == '_' and name[1:].isupper()
+
+
+def _movable(name):
+    # Arrays and constants are allocated statically
+    return name[-1] != '_' and not _is_constant(name)
+
+
+def _assigned(statements):
+    return {n.id for statement in statements for n in ast.walk(statement)
+            if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store)}
+
+
+def _read(statements, exclude=None):
+    '''
+        Variables read by the statements, except inside the exclude node
+    '''
+    names = set()
+    pending = list(statements)
+    while pending:
+        node = pending.pop()
+        if node is exclude:
+            continue
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+            names.add(node.id)
+        pending.extend(ast.iter_child_nodes(node))
+    return names
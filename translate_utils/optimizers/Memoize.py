@@ -0,0 +1,83 @@
+import ast
+
+from .LoopInvariant import pure_functions
+
+# Arguments 0 to DEFAULT_ENTRIES - 1 are recorded
+DEFAULT_ENTRIES = 128
+
+
+class Memoizer():
+    """
+        Picks the functions whose results can be recorded in a table: pure
+        recursive functions of a single parameter that they never assign,
+        returning a value. Each gets a table of values and a table of flags
+        (a word per argument in 0..entries-1, set once the value is
+        recorded), placed with the globals.
+
+        The code generator looks the argument up at the entry of the
+        function and returns the recorded value when there is one; every
+        return records its value. Other arguments take the plain path. The
+        tail calls of these functions are kept as calls, the jump would
+        skip the lookup and reassign the parameter the value is recorded
+        under
+    """
+
+    def __init__(self, entries=DEFAULT_ENTRIES) -> None:
+        self.entries = entries
+        self.tables = {}    # function -> (values label, flags label, entries)
+
+    def report(self):
+        lines = [f'; memoize {name}: arguments 0 to {self.entries - 1} '
+                 f'recorded in {values}' for name, (values, _, _)
+                 in self.tables.items()]
+        return lines + [f'; memoize {len(self.tables)} functions, '
+                        f'{4 * self.entries * len(self.tables)} bytes of '
+                        f'tables']
+
+    def select(self, root_node, names):
+        '''
+            Find the memoized functions of the module and name their tables
+            with a prefix none of the program's names starts with
+        '''
+        functions = {node.name: node for node in root_node.body
+                     if isinstance(node, ast.FunctionDef)}
+        prefix = '_m'
+        while any(name.startswith(prefix) for name in names):
+            prefix += '_'
+        self.tables = {}
+        pure = pure_functions(functions)
+        for name, node in functions.items():
+            if name in pure and self._eligible(node):
+                index = len(self.tables)
+                self.tables[name] = (f'{prefix}v{index}', f'{prefix}f{index}',
+                                     self.entries)
+        return self.tables
+
+    def declarations(self):
+        '''
+            (label, bytes) of the tables, reserved as static memory
+        '''
+        return [(label, 2 * entries) for values, flags, entries
+                in self.tables.values() for label in (values, flags)]
+
+    @staticmethod
+    def _eligible(node):
+        arguments = node.args
+        if (len(arguments.args) != 1 or arguments.posonlyargs
+                or arguments.kwonlyargs or arguments.vararg
+                or arguments.kwarg or arguments.defaults):
+            return False
+        param = arguments.args[0].arg
+        recursive = returns = False
+        for n in ast.walk(node):
+            if (isinstance(n, ast.Name) and n.id == param
+                    and isinstance(n.ctx, ast.Store)):
+                return False
+            if isinstance(n, ast.Return):
+                if n.value is None:
+                    return False
+                returns = True
+            elif (isinstance(n, ast.Call) and isinstance(n.func, ast.Name)
+                    and n.func.id == node.name):
+                recursive = True
+        return recursive and returns
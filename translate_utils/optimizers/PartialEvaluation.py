@@ -0,0 +1,248 @@
+import ast
+import operator
+
+from .ConstantFolding import OPERATORS, is_constant_name, to_word
+from .LoopInvariant import pure_functions
+
+# Statements and expressions a single call site may evaluate
+DEFAULT_STEPS = 10000
+# Calls nested in an evaluation
+DEFAULT_DEPTH = 64
+
+COMPARISONS = {
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+}
+
+
+class _Abort(Exception):
+    """The call cannot be evaluated at translation time"""
+
+
+class PartialEvaluator():
+    """
+        Runs the calls to pure functions whose arguments are known at
+        translation time (literals, constants, and variables assigned a
+        known value earlier in the same straight-line code) on a small RBS
+        interpreter, and replaces them by their result: r = f(2) becomes
+        r = 4, compiled as an immediate load. Arithmetic wraps around like
+        Pep/9's 16-bit words, the same way as ConstantFolding.
+
+        An evaluation running more than steps statements and expressions,
+        nesting more than depth calls, dividing by zero or reading a
+        variable before assigning it leaves the call as it is. Every call
+        site evaluated, or given up, gets a line in the log
+    """
+
+    def __init__(self, steps=DEFAULT_STEPS, depth=DEFAULT_DEPTH) -> None:
+        self.steps = steps
+        self.depth = depth
+        self.log = []
+        self.evaluated = 0
+
+    def report(self):
+        return self.log + [f'; evaluate {self.evaluated} calls evaluated']
+
+    def evaluate(self, root_node):
+        self.__functions = {node.name: node for node in root_node.body
+                            if isinstance(node, ast.FunctionDef)}
+        self.__pure = pure_functions(self.__functions)
+        self.__constants = {}
+        for statement in root_node.body:
+            if (isinstance(statement, ast.Assign)
+                    and isinstance(statement.targets[0], ast.Name)
+                    and is_constant_name(statement.targets[0].id)
+                    and isinstance(statement.value, ast.Constant)):
+                self.__constants[statement.targets[0].id] = \
+                    statement.value.value
+        if not self.__pure:
+            return root_node
+        self.__scope = '<module>'
+        root_node.body = self._block(root_node.body, {})
+        for node in root_node.body:
+            if isinstance(node, ast.FunctionDef):
+                self.__scope = node.name
+                node.body = self._block(node.body, {})
+        return root_node
+
+    ####
+    # Call sites
+    ####
+
+    def _block(self, statements, known):
+        '''
+            The statements with their evaluable calls replaced, given the
+            values of the variables known before them (updated in place)
+        '''
+        result = []
+        for statement in statements:
+            if isinstance(statement, ast.While):
+                # Known before the loop unless the loop assigns them
+                for name in _assigned(statement):
+                    known.pop(name, None)
+                statement.body = self._block(statement.body, dict(known))
+            elif isinstance(statement, ast.If):
+                statement.body = self._block(statement.body, dict(known))
+                statement.orelse = self._block(statement.orelse, dict(known))
+                for name in _assigned(statement):
+                    known.pop(name, None)
+            elif isinstance(statement, (ast.Assign, ast.Expr, ast.Return)):
+                value = statement.value
+                if (isinstance(value, ast.Call)
+                        and isinstance(value.func, ast.Name)
+                        and value.func.id in self.__pure):
+                    value = self._site(statement, value, known)
+                    if value is None and isinstance(statement, ast.Expr):
+                        # The call has no effect, its value is unused
+                        continue
+                    if value is not None:
+                        statement.value = value
+                if isinstance(statement, ast.Assign):
+                    target = statement.targets[0]
+                    if isinstance(target, ast.Name):
+                        constant = _value(statement.value, known,
+                                          self.__constants)
+                        if constant is None:
+                            known.pop(target.id, None)
+                        else:
+                            known[target.id] = constant
+            result.append(statement)
+        return result
+
+    def _site(self, statement, call, known):
+        '''
+            The constant replacing the call, None when it is evaluated for
+            an unused value. The call itself if it cannot be evaluated
+        '''
+        arguments = [_value(arg, known, self.__constants)
+                     for arg in call.args]
+        if call.keywords or None in arguments:
+            return call
+        name = call.func.id
+        where = f'{self.__scope} line {getattr(statement, "lineno", "?")}'
+        text = f'{name}({", ".join(map(str, arguments))})'
+        self.__budget = self.steps
+        try:
+            result = self._call(name, arguments, 0)
+        except _Abort as e:
+            self.log.append(f'; evaluate {where}: {text} not evaluated '
+                            f'({e})')
+            return call
+        self.evaluated += 1
+        used = self.steps - self.__budget
+        self.log.append(f'; evaluate {where}: {text} = {result} ({used} '
+                        f'step{"s" * (used != 1)})')
+        if isinstance(statement, ast.Expr):
+            return None
+        return ast.copy_location(ast.Constant(result), call)
+
+    ####
+    # Interpreter
+    ####
+
+    def _call(self, name, arguments, depth):
+        function = self.__functions[name]
+        params = [arg.arg for arg in function.args.args]
+        if depth >= self.depth:
+            raise _Abort(f'more than {self.depth} nested calls')
+        if len(arguments) != len(params):
+            raise _Abort('arguments do not match the parameters')
+        variables = dict(zip(params, arguments))
+        try:
+            self._statements(function.body, variables, depth)
+        except _Return as returned:
+            return returned.value
+        raise _Abort('no return value')
+
+    def _statements(self, statements, variables, depth):
+        for statement in statements:
+            self._step()
+            if isinstance(statement, ast.Assign):
+                target = statement.targets[0]
+                if not isinstance(target, ast.Name):
+                    raise _Abort('assigns an array element')
+                variables[target.id] = self._expression(
+                    statement.value, variables, depth)
+            elif isinstance(statement, ast.If):
+                taken = statement.body if self._expression(
+                    statement.test, variables, depth) else statement.orelse
+                self._statements(taken, variables, depth)
+            elif isinstance(statement, ast.While):
+                while self._expression(statement.test, variables, depth):
+                    self._statements(statement.body, variables, depth)
+                    self._step()
+            elif isinstance(statement, ast.Return):
+                if statement.value is None:
+                    raise _Abort('no return value')
+                raise _Return(self._expression(
+                    statement.value, variables, depth))
+            elif isinstance(statement, ast.Expr):
+                self._expression(statement.value, variables, depth)
+            elif not isinstance(statement, ast.Pass):
+                raise _Abort(f'{type(statement).__name__} statement')
+
+    def _expression(self, node, variables, depth):
+        self._step()
+        if isinstance(node, ast.Constant) and type(node.value) is int:
+            return to_word(node.value)
+        if isinstance(node, ast.Name):
+            if node.id in variables:
+                return variables[node.id]
+            if node.id in self.__constants:
+                return to_word(self.__constants[node.id])
+            raise _Abort(f'{node.id} read before being assigned')
+        if isinstance(node, ast.BinOp) and type(node.op) in OPERATORS:
+            left = self._expression(node.left, variables, depth)
+            right = self._expression(node.right, variables, depth)
+            if isinstance(node.op, (ast.FloorDiv, ast.Mod)) and right == 0:
+                raise _Abort('division by zero')
+            return to_word(OPERATORS[type(node.op)](left, right))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            return to_word(-self._expression(node.operand, variables, depth))
+        if (isinstance(node, ast.Compare) and len(node.ops) == 1
+                and type(node.ops[0]) in COMPARISONS):
+            return COMPARISONS[type(node.ops[0])](
+                self._expression(node.left, variables, depth),
+                self._expression(node.comparators[0], variables, depth))
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                and node.func.id in self.__pure and not node.keywords):
+            arguments = [self._expression(arg, variables, depth)
+                         for arg in node.args]
+            return self._call(node.func.id, arguments, depth + 1)
+        raise _Abort(f'{type(node).__name__} expression')
+
+    def _step(self):
+        self.__budget -= 1
+        if self.__budget < 0:
+            raise _Abort(f'over {self.steps} steps')
+
+
+class _Return(Exception):
+    """Unwinds the interpreter from a return statement"""
+
+    def __init__(self, value) -> None:
+        super().__init__()
+        self.value = value
+
+
+def _value(node, known, constants):
+    '''
+        The value of a literal, constant or known variable, None otherwise
+    '''
+    if isinstance(node, ast.Constant) and type(node.value) is int:
+        return to_word(node.value)
+    if isinstance(node, ast.Name):
+        if node.id in known:
+            return known[node.id]
+        if node.id in constants:
+            return to_word(constants[node.id])
+    return None
+
+
+def _assigned(statement):
+    return {n.id for n in ast.walk(statement)
+            if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store)}
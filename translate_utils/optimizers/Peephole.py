@@ -0,0 +1,356 @@
+from ..utils import pep9
+from ..utils.ir import Instruction, Opcode
+
+# Store matching each load, for the store-load rule
+STORES = {Opcode.LDWA: Opcode.STWA, Opcode.LDWX: Opcode.STWX}
+# Instructions after which execution never falls through
+UNCONDITIONAL = {Opcode[m] for m in pep9.UNCONDITIONAL}
+# Branches to a label of the program (CALL returns to the next instruction)
+JUMPS = {Opcode[m] for m in pep9.BRANCH if m != 'CALL'}
+# Instructions leaving the straight-line code
+LEAVING = {Opcode[m] for m in pep9.BRANCH} | {Opcode.RET}
+# Rules counting the branches they retarget rather than removed instructions
+RETARGETING = {'thread-jumps'}
+# Compares with zero, for the zero-compare rule, and the instructions
+# setting N and Z from the value they leave in the compared register
+ZERO_COMPARES = {
+    Opcode['CPW' + r]: {Opcode[m + r] for m in ('LDW', 'ADD', 'SUB', 'AND',
+                                                'OR', 'NEG', 'NOT')}
+    for r in 'AX'}
+# Instructions changing neither the registers nor the status bits
+FLAG_NEUTRAL = {Opcode.STWA, Opcode.STWX, Opcode.STBA, Opcode.STBX}
+
+
+class PeepholeOptimizer():
+    """
+        Rewrites the recorded instruction list, removing redundant
+        instructions while keeping every referenced label on an instruction
+    """
+
+    # Rules in the order they are applied
+    RULES = ('nop-chain', 'unreachable', 'thread-jumps', 'branch-to-next',
+             'store-load', 'zero-compare', 'sp-adjust')
+
+    def __init__(self, rules=None, pinned=()) -> None:
+        self.rules = PeepholeOptimizer.RULES if rules is None else tuple(rules)
+        for rule in self.rules:
+            if rule not in PeepholeOptimizer.RULES:
+                raise ValueError(f'Unknown peephole rule: {rule}')
+        # labels referenced from outside the instruction list
+        self.pinned = set(pinned)
+        # rule -> [instructions removed, bytes removed]
+        self.stats = {rule: [0, 0] for rule in self.rules}
+
+    def optimize(self, instructions):
+        # Apply every rule until none of them changes the program anymore
+        instructions = list(instructions)
+        changed = True
+        while changed:
+            changed = False
+            for rule in self.rules:
+                result = getattr(self, '_' + rule.replace('-', '_'))(
+                    instructions)
+                if result is not None:
+                    instructions = result
+                    changed = True
+        return instructions
+
+    def report(self):
+        '''
+            One line per rule with the instructions and bytes eliminated
+            (branches retargeted for thread-jumps, not in the total)
+        '''
+        lines = []
+        for rule, (count, size) in self.stats.items():
+            lines.append(f'; peephole {rule:<15} {count:>5} instructions '
+                         f'{size:>6} bytes')
+        removed = [s for rule, s in self.stats.items()
+                   if rule not in RETARGETING]
+        total = [sum(s[0] for s in removed), sum(s[1] for s in removed)]
+        lines.append(f'; peephole {"total":<15} {total[0]:>5} instructions '
+                     f'{total[1]:>6} bytes')
+        return lines
+
+    ####
+    # Rules, each returns the rewritten list or None if nothing changed
+    ####
+
+    def _nop_chain(self, instructions):
+        '''
+            Drop labels nothing refers to, then remove NOP1 sentinels by
+            moving their label to the next instruction (or by aliasing it to
+            the label the next instruction already has)
+        '''
+        references = self._references(instructions)
+        result = []
+        aliases = {}
+        changed = False
+        for i, instruction in enumerate(instructions):
+            label = instruction.label
+            if label is not None and label not in references:
+                label = None
+                instruction = instruction.replace(label=None)
+                changed = True
+            if instruction.opcode is not Opcode.NOP1:
+                result.append(instruction)
+                continue
+            following = instructions[i + 1] if i + 1 < len(instructions) \
+                else Instruction(Opcode.END)
+            if following.opcode.directive and label is not None:
+                # A directive cannot hold the label, keep the sentinel
+                result.append(instruction)
+                continue
+            self._removed('nop-chain', instruction)
+            changed = True
+            if label is None:
+                continue
+            if following.label is None:
+                instructions[i + 1] = following.replace(label=label)
+            elif label in self.pinned and following.label not in self.pinned:
+                aliases[following.label] = label
+                instructions[i + 1] = following.replace(label=label)
+            else:
+                aliases[label] = following.label
+                references.add(following.label)
+        if not changed:
+            return None
+        return self._rename(result, aliases) if aliases else result
+
+    def _unreachable(self, instructions):
+        '''
+            Remove unlabelled instructions following BR, RET or STOP
+        '''
+        result = []
+        dead = False
+        for instruction in instructions:
+            if instruction.label is not None or instruction.opcode.directive:
+                dead = False
+            if dead:
+                self._removed('unreachable', instruction)
+                continue
+            result.append(instruction)
+            dead = instruction.opcode in UNCONDITIONAL
+        return result if len(result) != len(instructions) else None
+
+    def _thread_jumps(self, instructions):
+        '''
+            Retarget branches to a label on a BR (or on sentinels followed
+            by one) to the end of the chain of BRs. Nothing is removed here,
+            the count is the branches retargeted: the BRs no longer reached
+            go with the unreachable rule
+        '''
+        targets = {instruction.label: i
+                   for i, instruction in enumerate(instructions)
+                   if instruction.label is not None}
+
+        def destination(start):
+            label = start
+            seen = {label}
+            while label in targets:
+                i = targets[label]
+                while (i < len(instructions)
+                       and instructions[i].opcode is Opcode.NOP1):
+                    i += 1
+                if (i == len(instructions)
+                        or instructions[i].opcode is not Opcode.BR
+                        or instructions[i].mode not in (None, 'i')):
+                    break
+                label = instructions[i].operand
+                if label in seen:
+                    # An endless loop of BRs, leave it alone
+                    return start
+                seen.add(label)
+            return label
+
+        result = []
+        changed = False
+        for instruction in instructions:
+            if (instruction.opcode in JUMPS
+                    and instruction.mode in (None, 'i')):
+                target = destination(instruction.operand)
+                if target != instruction.operand:
+                    self.stats['thread-jumps'][0] += 1
+                    instruction = instruction.replace(operand=target)
+                    changed = True
+            result.append(instruction)
+        return result if changed else None
+
+    def _branch_to_next(self, instructions):
+        '''
+            Remove branches whose target is the next instruction. A label on
+            such a branch becomes an alias of the target
+        '''
+        result = []
+        aliases = {}
+        for i, instruction in enumerate(instructions):
+            label, operand = instruction.label, instruction.operand
+            if (label not in self.pinned and i + 1 < len(instructions)
+                    and instruction.opcode in JUMPS
+                    and instructions[i + 1].label == operand):
+                self._removed('branch-to-next', instruction)
+                if label is not None:
+                    aliases[label] = operand
+                continue
+            result.append(instruction)
+        if len(result) == len(instructions):
+            return None
+        return self._rename(result, aliases) if aliases else result
+
+    def _store_load(self, instructions):
+        '''
+            Remove a load of the value that was just stored from the same
+            register, unless the status bits it sets are used afterwards
+        '''
+        result = []
+        for i, instruction in enumerate(instructions):
+            if instruction.label is None and result:
+                previous = result[-1]
+                if (instruction.opcode in STORES
+                        and previous.opcode is STORES[instruction.opcode]
+                        and previous.operand == instruction.operand
+                        and previous.mode == instruction.mode
+                        and not flags_live(instructions, i + 1, 'NZ')):
+                    self._removed('store-load', instruction)
+                    continue
+            result.append(instruction)
+        return result if len(result) != len(instructions) else None
+
+    def _zero_compare(self, instructions):
+        '''
+            Remove a compare with 0 when the status bits already describe
+            the register: the previous instruction (past stores, which leave
+            them alone) loaded or computed its value. The compare would also
+            clear V and set C, so nothing may read these bits without
+            setting them right before
+        '''
+        if _carry_read(instructions):
+            return None
+        result = []
+        for instruction in instructions:
+            setters = ZERO_COMPARES.get(instruction.opcode)
+            if (setters is not None and instruction.label is None
+                    and instruction.mode == 'i'
+                    and str(instruction.operand) == '0'
+                    and _sets_flags(result, setters)):
+                self._removed('zero-compare', instruction)
+                continue
+            result.append(instruction)
+        return result if len(result) != len(instructions) else None
+
+    def _sp_adjust(self, instructions):
+        '''
+            Combine adjacent ADDSP/SUBSP into a single adjustment
+        '''
+        result = []
+        changed = False
+        for i, instruction in enumerate(instructions):
+            if instruction.label is None and result:
+                current = _stack_adjustment(instruction)
+                previous = _stack_adjustment(result[-1])
+                if (current is not None and previous is not None
+                        and (current + previous or result[-1].label is None)
+                        and not flags_live(instructions, i + 1, 'NZVC')):
+                    changed = True
+                    total = current + previous
+                    self._removed('sp-adjust', instruction)
+                    if total == 0:
+                        self._removed('sp-adjust', result[-1])
+                        result.pop()
+                    else:
+                        op = Opcode.ADDSP if total > 0 else Opcode.SUBSP
+                        result[-1] = Instruction(op, abs(total), 'i',
+                                                 result[-1].label)
+                    continue
+            result.append(instruction)
+        return result if changed else None
+
+    ####
+    # Helper functions
+    ####
+
+    def _removed(self, rule, instruction):
+        self.stats[rule][0] += 1
+        self.stats[rule][1] += instruction.size
+
+    def _references(self, instructions):
+        references = set(self.pinned)
+        for instruction in instructions:
+            if instruction.operand is not None:
+                references.add(instruction.operand)
+        return references
+
+    @staticmethod
+    def _rename(instructions, aliases):
+        '''
+            Redirect every operand naming an aliased label
+        '''
+        def resolve(label):
+            while label in aliases:
+                label = aliases[label]
+            return label
+
+        result = []
+        for instruction in instructions:
+            if instruction.operand in aliases:
+                instruction = instruction.replace(
+                    operand=resolve(instruction.operand))
+            result.append(instruction)
+        return result
+
+
+def flags_live(instructions, start, flags):
+    '''
+        Whether any of the given status bits may be read, starting from
+        instruction start, before being overwritten
+    '''
+    pending = set(flags)
+    for i in range(start, len(instructions)):
+        opcode = instructions[i].opcode
+        if pending & opcode.flags_read:
+            return True
+        pending -= opcode.flags_written
+        if not pending or opcode is Opcode.STOP or opcode is Opcode.END:
+            return False
+        if opcode in LEAVING:
+            # Control leaves the straight-line code, assume the worst
+            return True
+    return False
+
+
+def _sets_flags(instructions, setters):
+    '''
+        Whether the last of the instructions that changes the status bits
+        is one of setters, with no label in between
+    '''
+    for instruction in reversed(instructions):
+        if instruction.opcode in setters:
+            return True
+        if instruction.label is not None or \
+                instruction.opcode not in FLAG_NEUTRAL:
+            return False
+    return False
+
+
+def _carry_read(instructions):
+    '''
+        Whether V or C may be read somewhere the previous instruction did
+        not set them
+    '''
+    for i, instruction in enumerate(instructions):
+        read = instruction.opcode.flags_read & {'V', 'C'}
+        if read and (i == 0 or instruction.label is not None
+                     or not read <= instructions[i - 1].opcode.flags_written):
+            return True
+    return False
+
+
+def _stack_adjustment(instruction):
+    opcode = instruction.opcode
+    if (opcode is not Opcode.ADDSP and opcode is not Opcode.SUBSP
+            or instruction.mode != 'i'):
+        return None
+    try:
+        value = int(instruction.operand)
+    except ValueError:
+        return None
+    return value if opcode is Opcode.ADDSP else -value
@@ -0,0 +1,150 @@
+from ..utils import pep9
+from ..utils.ir import Opcode
+from .Peephole import flags_live
+
+# Addressing modes whose effective address depends on the index register
+INDEXED_MODES = {'x', 'sx', 'sfx'}
+# Addressing modes whose effective address is computed at runtime
+COMPUTED_MODES = {'n', 'sf', 'x', 'sx', 'sfx'}
+# Addressing modes relative to the stack pointer
+STACK_MODES = {'s', 'sf', 'sx', 'sfx'}
+
+# Instructions leaving both registers untouched
+NEUTRAL = {Opcode[m] for m in (
+    'CPWA', 'CPWX', 'CPBA', 'CPBX', 'DECO', 'HEXO', 'STRO', 'NOP', 'NOP0',
+    'NOP1', *pep9.CONDITIONAL_BRANCHES)}
+# Arithmetic and logic on the accumulator and on the index register
+ACCUMULATOR_OPS = {o for o in Opcode if o.value.endswith('A')
+                   and o.value in pep9.FLAGS_WRITTEN}
+INDEX_OPS = {o for o in Opcode if o.value.endswith('X')
+             and o.value in pep9.FLAGS_WRITTEN}
+
+
+class RegisterTracker():
+    """
+        Follows what the accumulator and the index register hold across
+        straight-line code and removes loads of a value that is already
+        there. Knowledge is dropped at labels, CALL, DECI and any store that
+        may alias a tracked location.
+
+        The content of a register is a set of operands (operand, mode)
+        currently equal to it; ('<<', operand, mode) stands for the operand
+        shifted left once, as produced by LDWX i,d followed by ASLX.
+    """
+
+    def __init__(self) -> None:
+        self.removed = 0
+        self.removed_bytes = 0
+
+    def report(self):
+        return [f'; registers {self.removed} redundant loads removed '
+                f'({self.removed_bytes} bytes)']
+
+    def optimize(self, instructions):
+        self.__a = set()
+        self.__x = set()
+        result = []
+        skip = 0
+        for i, instruction in enumerate(instructions):
+            if skip:
+                skip -= 1
+                continue
+            if instruction.label is not None:
+                self._reset()
+            opcode = instruction.opcode
+            key = (instruction.operand, instruction.mode)
+
+            if ((opcode is Opcode.LDWA or opcode is Opcode.LDWX)
+                    and instruction.label is None):
+                register = self.__a if opcode is Opcode.LDWA else self.__x
+                if (key in register
+                        and not flags_live(instructions, i + 1, 'NZ')):
+                    self._removed(instruction)
+                    continue
+                if (opcode is Opcode.LDWX and ('<<',) + key in self.__x
+                        and self._shift_follows(instructions, i)):
+                    # X already holds this index scaled for a word array
+                    self._removed(instruction)
+                    self._removed(instructions[i + 1])
+                    skip = 1
+                    continue
+
+            self._execute(opcode, key)
+            result.append(instruction)
+        return result
+
+    ####
+    # Helper functions
+    ####
+
+    def _execute(self, opcode, key):
+        '''
+            Update the register contents after the instruction
+        '''
+        operand, mode = key
+        if opcode is Opcode.LDWA:
+            self.__a = {key}
+        elif opcode is Opcode.LDWX:
+            self._index_changed({key} if mode not in INDEXED_MODES else set())
+        elif opcode is Opcode.STWA:
+            # The stored register still matches every location it matched,
+            # even one the store overwrote: only the other one is affected
+            self.__x = self._surviving(self.__x, key)
+            self.__a = self._surviving(self.__a, key, shifted_only=True)
+            self.__a.add(key)
+        elif opcode is Opcode.STWX:
+            self.__a = self._surviving(self.__a, key)
+            self.__x = self._surviving(self.__x, key, shifted_only=True)
+            self.__x.add(key)
+        elif opcode is Opcode.STBA or opcode is Opcode.STBX:
+            self.__a = self._surviving(self.__a, key)
+            self.__x = self._surviving(self.__x, key)
+        elif opcode is Opcode.ASLX:
+            self._index_changed({('<<',) + k for k in self.__x
+                                 if k[0] != '<<'})
+        elif opcode is Opcode.ADDSP or opcode is Opcode.SUBSP:
+            self.__a = {k for k in self.__a if k[-1] not in STACK_MODES}
+            self.__x = {k for k in self.__x if k[-1] not in STACK_MODES}
+        elif opcode in NEUTRAL:
+            pass
+        elif opcode in ACCUMULATOR_OPS:
+            self.__a = set()
+        elif opcode in INDEX_OPS:
+            self._index_changed(set())
+        else:
+            # BR, CALL, RET, STOP, DECI, ...
+            self._reset()
+
+    def _index_changed(self, contents):
+        self.__x = contents
+        # Operands addressed through X now designate other locations
+        self.__a = {k for k in self.__a if k[-1] not in INDEXED_MODES}
+
+    @staticmethod
+    def _surviving(contents, key, shifted_only=False):
+        '''
+            The operands of contents a store to key cannot modify
+        '''
+        def aliased(k):
+            if shifted_only and k[0] != '<<':
+                return False
+            if key[1] in COMPUTED_MODES:
+                return k[-1] != 'i'
+            return k[-2:] == key or k[-1] in COMPUTED_MODES
+
+        return {k for k in contents if not aliased(k)}
+
+    def _shift_follows(self, instructions, i):
+        following = instructions[i + 1] if i + 1 < len(instructions) \
+            else None
+        return (following is not None and following.label is None
+                and following.opcode is Opcode.ASLX
+                and not flags_live(instructions, i + 2, 'NZVC'))
+
+    def _reset(self):
+        self.__a = set()
+        self.__x = set()
+
+    def _removed(self, instruction):
+        self.removed += 1
+        self.removed_bytes += instruction.size
@@ -0,0 +1,130 @@
+import ast
+
+from .DeadCode import _read
+from .TailRecursion import TailEntry, TailJump
+
+
+class StackSlotSharing():
+    """
+        Lets the scalar locals of a function share frame slots. Two locals
+        interfere when one is assigned where the other is live (backward
+        liveness over the while/if structure of the function, a tail-call
+        jump going back to the start of the body); locals that do not
+        interfere get the same offset. Every statement reads its operands
+        before storing its target, so a local may take the slot of a
+        variable whose last read is in the same assignment.
+
+        Arrays keep a slot of their own, parameters and the return value
+        are not part of the locals
+    """
+
+    def assign(self, node, local_vars):
+        '''
+            ({local: offset in the frame}, bytes taken by the locals) of the
+            function's local_vars ((name, size), ...), in their order
+        '''
+        self.__scalars = {name for name, _ in local_vars if name[-1] != '_'}
+        self.__conflicts = {name: set() for name in self.__scalars}
+        self.__reads = {}
+        # Live where the tail calls jump back to, grown until stable
+        self.__entry = set()
+        while True:
+            self.__found = set()
+            self._statements(node.body, set())
+            if self.__found <= self.__entry:
+                break
+            self.__entry |= self.__found
+
+        offsets = {}
+        slots = []      # (offset, locals sharing it)
+        count = 0
+        for name, size in local_vars:
+            if name not in self.__scalars:
+                offsets[name] = count
+                count += size
+                continue
+            conflicts = self.__conflicts[name]
+            for offset, sharing in slots:
+                if not sharing & conflicts:
+                    sharing.add(name)
+                    offsets[name] = offset
+                    break
+            else:
+                slots.append((count, {name}))
+                offsets[name] = count
+                count += size
+        return offsets, count
+
+    ####
+    # Liveness
+    ####
+
+    def _statements(self, statements, live):
+        '''
+            The variables live before the statements given those live after
+            them, recording the interferences of the assignments
+        '''
+        for statement in reversed(statements):
+            live = self._statement(statement, live)
+        return live
+
+    def _statement(self, statement, live):
+        if isinstance(statement, ast.Assign):
+            target = statement.targets[0]
+            if isinstance(target, ast.Name):
+                self._interfere(target.id, live)
+                live = live - {target.id}
+            return live | self._read(statement)
+        if isinstance(statement, ast.If):
+            return (self._statements(statement.body, set(live))
+                    | self._statements(statement.orelse, set(live))
+                    | self._read(statement.test))
+        if isinstance(statement, ast.While):
+            # Live at the test: read by the test, after the loop or by the
+            # body when it loops back
+            entry = live | self._read(statement.test)
+            while True:
+                grown = entry | self._statements(statement.body, set(entry))
+                if grown == entry:
+                    return entry
+                entry = grown
+        if isinstance(statement, ast.Return):
+            # Nothing after a return is reached
+            return set(self._read(statement))
+        if isinstance(statement, TailJump):
+            return set(self.__entry)
+        if isinstance(statement, TailEntry):
+            self.__found |= live
+            return live
+        return live | self._read(statement)
+
+    def _interfere(self, name, live):
+        '''
+            The local assigned must not overwrite the locals live after the
+            assignment
+        '''
+        if name not in self.__scalars:
+            return
+        conflicts = self.__conflicts
+        for other in live:
+            if other != name and other in conflicts:
+                conflicts[name].add(other)
+                conflicts[other].add(name)
+
+    def _read(self, node):
+        entry = self.__reads.get(id(node))
+        if entry is None:
+            entry = self.__reads[id(node)] = (node, frozenset(_read(node)))
+        return entry[1]
+
+
+def sequential(local_vars):
+    '''
+        The layout of the locals without sharing: one after the other
+    '''
+    offsets = {}
+    count = 0
+    for name, size in local_vars:
+        offsets[name] = count
+        count += size
+    return offsets, count
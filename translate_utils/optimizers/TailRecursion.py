@@ -0,0 +1,269 @@
+import ast
+
+from ..utils.fresh_names import FreshNames
+
+# Operators an accumulator can collect (associative and commutative in
+# 16-bit arithmetic), with their identity
+ACCUMULATED = {ast.Add: 0, ast.Mult: 1}
+
+
+class TailEntry(ast.stmt):
+    """Start of the function body, where tail calls jump back to"""
+    _fields = ()
+
+
+class TailJump(ast.stmt):
+    """Jump to the TailEntry, once the parameters have been reassigned"""
+    _fields = ()
+
+
+class TailRecursion():
+    """
+        Rewrites the self-calls of a function whose result is returned as is
+        (return f(x), or r = f(x) followed by return r) into assignments of
+        the parameters and a jump back to the start of the body, so that the
+        recursion runs in constant stack space.
+
+        When every other self-call in tail position combines its result with
+        a variable or a constant through the same + or * (r = f(x) * n then
+        return r), the pending operations are collected in an accumulator:
+        returns become return acc op value and those calls tail calls too.
+        The accumulator and the temporaries are hidden locals named apart
+        from the function's own variables.
+    """
+
+    def __init__(self) -> None:
+        self.eliminated = 0     # self-calls replaced by a jump
+        self.accumulated = 0    # functions given an accumulator
+
+    def report(self):
+        return [f'; tail calls {self.eliminated} self-calls replaced by '
+                f'jumps, {self.accumulated} functions with an accumulator']
+
+    def transform(self, node):
+        '''
+            Return the rewritten FunctionDef (node itself if it has no tail
+            self-call) and the hidden local variables it uses
+        '''
+        self.__name = node.name
+        self.__params = [arg.arg for arg in node.args.args]
+        self.__void = not any(isinstance(n, ast.Return)
+                              for n in ast.walk(node))
+        self.__hidden = []
+        self.__fresh = FreshNames(node)
+        self.__temporaries = {}     # parameter index -> temporary
+
+        matches = list(self._matches(node.body, tail=True))
+        operators = {type(m[3].op) for m in matches if m[3] is not None}
+        accumulate = operators.pop() if len(operators) == 1 else None
+
+        body = None
+        if accumulate is not None:
+            self.__accumulator = self.__fresh.next()
+            body = self._attempt(node, accumulate)
+        if body is None:
+            accumulate = None
+            body = self._attempt(node, None)
+        if body is None:
+            return node, ()
+
+        entry = [ast.copy_location(TailEntry(), node.body[0])]
+        if accumulate is not None:
+            self.accumulated += 1
+            self._hide(self.__accumulator)
+            entry.insert(0, self._assign(
+                self.__accumulator, ast.Constant(ACCUMULATED[accumulate]),
+                node.body[0]))
+        function = ast.FunctionDef(
+            node.name, node.args, entry + body, node.decorator_list,
+            node.returns, node.type_comment)
+        return ast.copy_location(function, node), tuple(self.__hidden)
+
+    ####
+    # Helper functions
+    ####
+
+    def _matches(self, statements, tail):
+        '''
+            (index, statements consumed, call, combining BinOp or None) of
+            every self-call in tail position of the block
+        '''
+        i = 0
+        while i < len(statements):
+            match = self._match(statements, i, tail)
+            if match is not None:
+                yield match
+                i += match[1]
+                continue
+            statement = statements[i]
+            if isinstance(statement, ast.While):
+                yield from self._matches(statement.body, False)
+            elif isinstance(statement, ast.If):
+                last = tail and i == len(statements) - 1
+                yield from self._matches(statement.body, last)
+                yield from self._matches(statement.orelse, last)
+            i += 1
+
+    def _match(self, statements, i, tail):
+        following = statements[i:i + 3]
+        first = following[0]
+        if isinstance(first, ast.Return):
+            if self._self_call(first.value):
+                return (i, 1, first.value, None)
+            combined = self._combined(first.value, None)
+            if combined is not None:
+                return (i, 1, combined[0], combined[1])
+        elif isinstance(first, ast.Expr):
+            if (self.__void and tail and i == len(statements) - 1
+                    and self._self_call(first.value)):
+                return (i, 1, first.value, None)
+        elif (isinstance(first, ast.Assign)
+                and isinstance(first.targets[0], ast.Name)
+                and self._self_call(first.value) and len(following) > 1):
+            result = first.targets[0].id
+            second = following[1]
+            if isinstance(second, ast.Return):
+                if _is_name(second.value, result):
+                    return (i, 2, first.value, None)
+                combined = self._combined(second.value, result)
+                if combined is not None:
+                    return (i, 2, first.value, combined[1])
+            elif (isinstance(second, ast.Assign) and len(following) > 2
+                    and isinstance(second.targets[0], ast.Name)
+                    and isinstance(following[2], ast.Return)
+                    and _is_name(following[2].value, second.targets[0].id)):
+                combined = self._combined(second.value, result)
+                if combined is not None:
+                    return (i, 3, first.value, combined[1])
+        return None
+
+    def _combined(self, value, result):
+        '''
+            (call, BinOp) if value is call op operand or operand op call,
+            where call is a self-call (or the variable result holding it) and
+            operand a constant or another variable
+        '''
+        if (not isinstance(value, ast.BinOp)
+                or type(value.op) not in ACCUMULATED):
+            return None
+        for call, operand in ((value.left, value.right),
+                              (value.right, value.left)):
+            if ((self._self_call(call) or _is_name(call, result))
+                    and isinstance(operand, (ast.Name, ast.Constant))
+                    and not _is_name(operand, result)):
+                return call, value
+        return None
+
+    def _self_call(self, node):
+        return (isinstance(node, ast.Call) and _is_name(node.func, self.__name)
+                and not node.keywords
+                and len(node.args) == len(self.__params))
+
+    def _attempt(self, node, accumulate):
+        '''
+            The rewritten body, None if there is no tail call to eliminate or
+            if a return value cannot be combined with the accumulator
+        '''
+        self.__count = 0
+        self.__simple = True
+        hidden = list(self.__hidden)
+        body = self._rewrite(node.body, True, accumulate)
+        if not self.__count or not self.__simple:
+            self.__hidden = hidden
+            return None
+        self.eliminated += self.__count
+        return body
+
+    def _rewrite(self, statements, tail, accumulate):
+        result = []
+        i = 0
+        while i < len(statements):
+            match = self._match(statements, i, tail)
+            statement = statements[i]
+            if match is not None and (match[3] is None
+                                      or accumulate is not None):
+                _, consumed, call, combined = match
+                if combined is not None:
+                    operand = _operand(combined, call, statement)
+                    result.append(self._assign(
+                        self.__accumulator, ast.BinOp(
+                            ast.Name(self.__accumulator, ast.Load()),
+                            accumulate(), operand), statement))
+                result += self._reassign(call, statement)
+                self.__count += 1
+                i += consumed
+                continue
+            if isinstance(statement, ast.While):
+                statement = _replace_body(
+                    statement, self._rewrite(statement.body, False,
+                                             accumulate), statement.orelse)
+            elif isinstance(statement, ast.If):
+                last = tail and i == len(statements) - 1
+                statement = _replace_body(
+                    statement,
+                    self._rewrite(statement.body, last, accumulate),
+                    self._rewrite(statement.orelse, last, accumulate))
+            elif isinstance(statement, ast.Return) and accumulate is not None:
+                if not isinstance(statement.value, (ast.Name, ast.Constant)):
+                    # Only variables and constants can be combined
+                    self.__simple = False
+                statement = ast.copy_location(ast.Return(ast.BinOp(
+                    ast.Name(self.__accumulator, ast.Load()), accumulate(),
+                    statement.value)), statement)
+            result.append(statement)
+            i += 1
+        return result
+
+    def _reassign(self, call, location):
+        '''
+            Assign the call's arguments to the parameters then jump. An
+            argument goes through a temporary when a later argument reads
+            the parameter it replaces
+        '''
+        direct, copies = [], []
+        for i, (param, arg) in enumerate(zip(self.__params, call.args)):
+            if _is_name(arg, param):
+                continue
+            if any(_is_name(n, param)
+                   for later in call.args[i + 1:] for n in ast.walk(later)):
+                if i not in self.__temporaries:
+                    self.__temporaries[i] = self.__fresh.next()
+                temporary = self.__temporaries[i]
+                self._hide(temporary)
+                direct.append(self._assign(temporary, arg, location))
+                copies.append(self._assign(
+                    param, ast.Name(temporary, ast.Load()), location))
+            else:
+                direct.append(self._assign(param, arg, location))
+        return direct + copies + [ast.copy_location(TailJump(), location)]
+
+    def _hide(self, name):
+        if name not in self.__hidden:
+            self.__hidden.append(name)
+
+    @staticmethod
+    def _assign(name, value, location):
+        return ast.copy_location(
+            ast.Assign([ast.Name(name, ast.Store())], value), location)
+
+
+def _is_name(node, name):
+    return isinstance(node, ast.Name) and node.id == name
+
+
+def _operand(combined, call, statement):
+    '''
+        The operand of the combining BinOp that is not the recursive result
+    '''
+    result = statement.targets[0].id if isinstance(statement, ast.Assign) \
+        else None
+    if combined.left is call or _is_name(combined.left, result):
+        return combined.right
+    return combined.left
+
+
+def _replace_body(statement, body, orelse):
+    if body is statement.body and orelse is statement.orelse:
+        return statement
+    copy = type(statement)(statement.test, body, orelse)
+    return ast.copy_location(copy, statement)
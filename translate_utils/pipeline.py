@@ -0,0 +1,254 @@
+import ast
+import io
+import sys
+from .visitors.ProgramAnalysis import ProgramAnalysis
+from .visitors.GeneralizedProgram import GeneralizedProgram
+from .generators.StaticMemoryAllocation import StaticMemoryAllocation
+from .generators.EntryPoint import EntryPoint
+from .optimizers.ConstantFolding import ConstantFolding
+from .optimizers.DeadCode import DeadCodeElimination
+from .optimizers.Inliner import DEFAULT_BUDGET, Inliner
+from .optimizers.LoopInvariant import LoopInvariantMotion
+from .optimizers.Memoize import DEFAULT_ENTRIES, Memoizer
+from .optimizers.PartialEvaluation import DEFAULT_STEPS, PartialEvaluator
+from .optimizers.Peephole import PeepholeOptimizer
+from .optimizers.RegisterTracking import RegisterTracker
+from .optimizers.StackSlots import StackSlotSharing
+from .optimizers.TailRecursion import TailRecursion
+from .utils.timings import count_nodes, phase
+
+DEFAULT_OPTIONS = {
+    # evaluate constant expressions at translation time
+    'fold': True,
+    # True for every peephole rule, False to disable the pass, or an
+    # iterable with the names of the rules to apply
+    'peephole': True,
+    # remove loads of values already held by the accumulator/index register
+    'track_registers': True,
+    # text sink receiving the optimization reports (None to discard them)
+    'report': None,
+    # replace the calls to pure functions with arguments known at
+    # translation time by their result
+    'evaluate': True,
+    # statements and expressions a call site may run when evaluated
+    'evaluate_budget': DEFAULT_STEPS,
+    # substitute the body of small leaf functions at their call sites
+    'inline': True,
+    # largest function inlined, in statements
+    'inline_budget': DEFAULT_BUDGET,
+    # move the invariant computations of while loops before the loop
+    'hoist': True,
+    # drop unreachable functions and stores whose value is never read
+    'dead_code': True,
+    # compile self-calls in tail position as jumps
+    'tail_calls': True,
+    # let the locals of a function whose live ranges are disjoint share
+    # their stack slot
+    'share_slots': True,
+    # record the results of pure recursive functions of one parameter in
+    # tables: False, True, or the number of arguments (from 0) recorded
+    'memoize': False,
+    # utils.cache.TranslationCache reusing the code of unchanged functions
+    'cache': None,
+    # utils.block_profile.BlockProfile receiving the map of the counters
+    # the generated code increments at the head of every basic block (the
+    # cache is not used, cached functions carry no counters)
+    'profile': None,
+    # utils.timings.PhaseTimings receiving the time, peak memory and
+    # node/instruction counts of every phase and function
+    'timings': None,
+    # write the object code in the hex format of the Pep/9 loader instead
+    # of the assembly
+    'object': False,
+    # text sink receiving the assembler listing of the object code
+    'listing': None,
+}
+
+
+def translate(source: str, filename: str = '<string>', **options) -> str:
+    '''
+        Translate RBS source code and return the Pep/9 assembly as a string.
+        See DEFAULT_OPTIONS for the accepted options
+    '''
+    buffer = io.StringIO()
+    translate_to(source, buffer, filename, **options)
+    return buffer.getvalue()
+
+
+def translate_to(source: str, writer, filename: str = '<string>',
+                 **options) -> None:
+    '''
+        Translate RBS source code, writing the Pep/9 assembly to writer
+        (any object with a write(str) method, e.g. a file or io.StringIO)
+    '''
+    timings = options.get('timings')
+    try:
+        with phase(timings, 'parse') as record:
+            root_node = ast.parse(source, filename)
+        _count(record, root_node)
+        process(filename, root_node, writer, options)
+    finally:
+        if timings is not None:
+            # Stop tracing even if the translation failed
+            timings.finish()
+
+
+def process(input_file, root_node, writer=None, options=None):
+    '''
+        Run the translation pipeline over an already parsed module. Each
+        section is written with a single call; output goes to stdout unless
+        a writer is given
+    '''
+    if writer is None:
+        writer = sys.stdout
+    options = resolve_options(options)
+    if options['object']:
+        # The data section is assembled together with the instructions
+        output, writer = writer, io.StringIO()
+    writer.write(f'; Translating {input_file}\n'
+                 '; Branching to top level (tl) instructions\n'
+                 '\t\tBR tl_1\n')
+    timings = options['timings']
+    if options['fold']:
+        with phase(timings, 'fold') as record:
+            folding = ConstantFolding()
+            root_node = ast.fix_missing_locations(folding.visit(root_node))
+        _count(record, root_node)
+        _report(options, folding.report())
+
+    if options['evaluate']:
+        with phase(timings, 'evaluate') as record:
+            evaluator = PartialEvaluator(options['evaluate_budget'])
+            root_node = evaluator.evaluate(root_node)
+        _count(record, root_node)
+        _report(options, evaluator.report())
+
+    if options['inline']:
+        with phase(timings, 'inline') as record:
+            inliner = Inliner(options['inline_budget'])
+            root_node = inliner.inline(root_node)
+        _count(record, root_node)
+        _report(options, inliner.report())
+
+    if options['hoist']:
+        with phase(timings, 'hoist') as record:
+            motion = LoopInvariantMotion()
+            root_node = motion.hoist(root_node)
+        _count(record, root_node)
+        _report(options, motion.report())
+
+    if options['dead_code']:
+        with phase(timings, 'dead code') as record:
+            elimination = DeadCodeElimination()
+            root_node = elimination.eliminate(root_node)
+        _count(record, root_node)
+        _report(options, elimination.report())
+
+    # Globals, functions and array indices, found in a single walk
+    with phase(timings, 'analysis'):
+        info = ProgramAnalysis().analyze(root_node)
+
+    general_level = GeneralizedProgram('tl_1')
+    general_level.info = info
+    general_level.timings = timings
+    if options['profile'] is not None:
+        options['profile'].start([*info.globals, *info.functions])
+        general_level.profile = options['profile']
+    else:
+        general_level.cache = options['cache']
+    if options['tail_calls']:
+        general_level.tail_recursion = TailRecursion()
+    if options['share_slots']:
+        general_level.stack_slots = StackSlotSharing()
+    general_level.slicing_vars = set(info.slicing_vars)
+    tables = ()
+    if options['memoize']:
+        memoizer = Memoizer(DEFAULT_ENTRIES if options['memoize'] is True
+                            else options['memoize'])
+        memoizer.select(root_node, [*info.globals, *info.functions])
+        general_level.memoizer = memoizer
+        tables = memoizer.declarations()
+        _report(options, memoizer.report())
+
+    with phase(timings, 'static memory allocation'):
+        memory_alloc = StaticMemoryAllocation(info.globals, general_level.st,
+                                              tables)
+        general_level.st = memory_alloc.generate(writer)
+    with phase(timings, 'visit') as record:
+        general_level.visit(root_node)
+        # Frames are allocated while visiting the functions, they are
+        # buffered so that they end up before the instructions
+        writer.write(general_level.frames.getvalue())
+        instructions = general_level.finalize()
+    record['instructions'] = len(instructions)
+    if timings is not None:
+        # Counted once the functions are timed, not while
+        functions = {node.name: node for node in root_node.body
+                     if isinstance(node, ast.FunctionDef)}
+        for function in timings.functions:
+            function['nodes'] = count_nodes(functions[function['name']])
+    if general_level.tail_recursion is not None:
+        _report(options, general_level.tail_recursion.report())
+    _report(options, general_level.frame_report())
+    if options['cache'] is not None and options['profile'] is None:
+        _report(options, options['cache'].report())
+    if options['profile'] is not None:
+        _report(options, [f'; profile {len(options["profile"].blocks)} '
+                          f'block counters'])
+
+    peephole = None
+    if options['peephole']:
+        rules = None if options['peephole'] is True else options['peephole']
+        # tl_1 is the target of the branch written before the data section
+        peephole = PeepholeOptimizer(rules, pinned={'tl_1'})
+        with phase(timings, 'peephole') as record:
+            instructions = peephole.optimize(instructions)
+        record['instructions'] = len(instructions)
+
+    if options['track_registers']:
+        tracker = RegisterTracker()
+        with phase(timings, 'register tracking') as record:
+            instructions = tracker.optimize(instructions)
+        record['instructions'] = len(instructions)
+        _report(options, tracker.report())
+        if peephole is not None:
+            # Removed loads may have made new patterns adjacent
+            with phase(timings, 'peephole') as record:
+                instructions = peephole.optimize(instructions)
+            record['instructions'] = len(instructions)
+
+    if peephole is not None:
+        _report(options, peephole.report())
+
+    with phase(timings, 'emission'):
+        ep = EntryPoint(instructions)
+        if options['object']:
+            ep.generate_object(writer.getvalue(), output, options['listing'])
+        else:
+            ep.generate(writer)
+    if timings is not None:
+        timings.finish()
+
+
+def resolve_options(options=None):
+    '''
+        Complete the given options with DEFAULT_OPTIONS, rejecting unknown
+        option names
+    '''
+    resolved = dict(DEFAULT_OPTIONS)
+    for name, value in (options or {}).items():
+        if name not in DEFAULT_OPTIONS:
+            raise ValueError(f'Unknown translation option: {name}')
+        resolved[name] = value
+    return resolved
+
+
+def _report(options, lines):
+    if options['report'] is not None and lines:
+        options['report'].write('\n'.join(lines) + '\n')
+
+
+def _count(record, root_node):
+    # Nodes left by an AST pass, only counted when timing
+    if record:
+        record['nodes'] = count_nodes(root_node)
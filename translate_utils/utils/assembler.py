@@ -0,0 +1,220 @@
+'''
+    Two-pass Pep/9 assembler for the subset of the language produced by the
+    translator (every instruction, .BLOCK, .WORD, .BYTE, .EQUATE and .END),
+    and writers of its object code in the loader's hex format and of its
+    listing
+'''
+from . import pep9
+from .ir import Instruction
+
+# Bytes per line of an object file, as written by Pep/9
+OBJECT_BYTES_PER_LINE = 16
+
+ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', '0': '\0', '\\': '\\', "'": "'"}
+
+
+class Program():
+    '''
+        Result of an assembly: the memory image (loaded at address 0), the
+        symbol table and a listing of (address, object bytes, source line)
+    '''
+
+    def __init__(self, code: bytearray, symbols: dict, listing: list) -> None:
+        self.code = code
+        self.symbols = symbols
+        self.listing = listing
+
+
+class Assembler():
+    """
+        Assembles source text, or a list of lines that are either text or
+        ir.Instruction objects: the instructions generated by the
+        translator are encoded without being rendered and parsed again
+    """
+
+    def __init__(self, source) -> None:
+        self.__lines = source.splitlines() if isinstance(source, str) \
+            else list(source)
+
+    def assemble(self, listing=True) -> Program:
+        '''
+            Without listing, the listing of the Program is left empty
+        '''
+        statements = self._first_pass()
+        code = bytearray()
+        lines = []
+        for number, address, label, mnemonic, operand, mode in statements:
+            obj = self._encode(number, mnemonic, operand, mode)
+            code += obj
+            if listing:
+                lines.append((address, bytes(obj), self._text(number)))
+        return Program(code, self.symbols, lines)
+
+    #######
+    # Helper Functions
+    #######
+
+    def _first_pass(self):
+        '''
+            Parse every line and assign addresses to the labels
+        '''
+        self.symbols = dict(pep9.PREDEFINED_SYMBOLS)
+        statements = []
+        address = 0
+        for number, line in enumerate(self.__lines):
+            label, mnemonic, operand, mode = self._parse_line(number, line)
+            if mnemonic == '.EQUATE':
+                self._define(number, label, self._number(number, operand))
+                continue
+            if label is not None:
+                self._define(number, label, address)
+            if mnemonic is None:
+                continue
+            if mnemonic == '.END':
+                break
+            statements.append((number, address, label, mnemonic, operand,
+                               mode))
+            address += self._size(number, mnemonic, operand)
+        return statements
+
+    def _parse_line(self, number, line):
+        if isinstance(line, Instruction):
+            return line.label, line.opcode.value, line.operand, line.mode
+        code = self._strip_comment(line).strip()
+        label = None
+        if code and ':' in code.split(None, 1)[0]:
+            label, _, code = code.partition(':')
+            label, code = label.strip(), code.strip()
+        if not code:
+            return label, None, None, None
+        parts = code.split(None, 1)
+        mnemonic = parts[0].upper()
+        if len(parts) == 1:
+            return label, mnemonic, None, None
+        rest = parts[1].strip()
+        if rest.startswith("'"):
+            # Character literal, which may itself contain a comma
+            end = rest.index("'", 2 if rest[1] == '\\' else 1) + 1
+            operand, rest = rest[:end], rest[end:]
+            mode = rest.partition(',')[2].strip() or None
+        else:
+            operand, _, mode = rest.partition(',')
+            operand, mode = operand.strip(), mode.strip() or None
+        return label, mnemonic, operand, mode
+
+    def _text(self, number):
+        line = self.__lines[number]
+        return line.line() if isinstance(line, Instruction) else line
+
+    @staticmethod
+    def _strip_comment(line):
+        in_quote = False
+        for i, c in enumerate(line):
+            if c == "'" and (i == 0 or line[i - 1] != '\\'):
+                in_quote = not in_quote
+            elif c == ';' and not in_quote:
+                return line[:i]
+        return line
+
+    def _define(self, number, label, value):
+        if label is None:
+            raise ValueError(f'line {number + 1}: .EQUATE requires a label')
+        if label in self.symbols and label not in pep9.PREDEFINED_SYMBOLS:
+            raise ValueError(f'line {number + 1}: duplicate symbol {label}')
+        self.symbols[label] = value
+
+    def _size(self, number, mnemonic, operand):
+        if mnemonic in pep9.UNARY:
+            return 1
+        if mnemonic in pep9.BRANCH or mnemonic in pep9.NONUNARY:
+            return 3
+        if mnemonic == '.BLOCK':
+            return self._number(number, operand)
+        if mnemonic == '.WORD':
+            return 2
+        if mnemonic == '.BYTE':
+            return 1
+        raise ValueError(f'line {number + 1}: unsupported mnemonic {mnemonic}')
+
+    def _encode(self, number, mnemonic, operand, mode):
+        if mnemonic in pep9.UNARY:
+            return bytearray([pep9.UNARY[mnemonic]])
+        if mnemonic == '.BLOCK':
+            return bytearray(self._number(number, operand))
+        if mnemonic == '.WORD':
+            return bytearray(self._value(number, operand).to_bytes(2, 'big'))
+        if mnemonic == '.BYTE':
+            return bytearray([self._value(number, operand) & 0xFF])
+
+        if mnemonic in pep9.BRANCH:
+            modes = pep9.BRANCH_MODES
+            opcode = pep9.BRANCH[mnemonic]
+            mode = mode or 'i'
+        else:
+            modes = pep9.ADDRESSING_MODES
+            opcode = pep9.NONUNARY[mnemonic]
+        if mode not in modes:
+            raise ValueError(
+                f'line {number + 1}: invalid addressing mode {mode!r} '
+                f'for {mnemonic}')
+        value = self._value(number, operand)
+        return bytearray([opcode | modes[mode]]) + value.to_bytes(2, 'big')
+
+    def _value(self, number, operand):
+        '''
+            Resolve an operand (decimal, hexadecimal, character or symbol)
+            to its 16-bit representation
+        '''
+        if operand is None:
+            raise ValueError(f'line {number + 1}: missing operand')
+        if operand.startswith("'"):
+            char = operand[1:-1]
+            if char.startswith('\\'):
+                char = ESCAPES[char[1]]
+            return ord(char)
+        if operand in self.symbols:
+            return self.symbols[operand] & 0xFFFF
+        return self._number(number, operand) & 0xFFFF
+
+    def _number(self, number, operand):
+        try:
+            return int(operand, 0)
+        except (TypeError, ValueError):
+            raise ValueError(
+                f'line {number + 1}: invalid or undefined operand {operand!r}')
+
+
+def assemble(source, listing=True) -> Program:
+    return Assembler(source).assemble(listing)
+
+
+def object_text(code) -> str:
+    '''
+        The object code in the format read by the Pep/9 loader: bytes in
+        hexadecimal separated by spaces, ended by zz
+    '''
+    lines = []
+    for start in range(0, len(code), OBJECT_BYTES_PER_LINE):
+        lines.append(' '.join(f'{byte:02X}' for byte in
+                              code[start:start + OBJECT_BYTES_PER_LINE]))
+    lines.append('zz')
+    return '\n'.join(lines) + '\n'
+
+
+def read_object(text: str) -> Program:
+    '''
+        Load object code written in the loader's format, without symbols
+    '''
+    return Program(bytearray.fromhex(text.partition('zz')[0]), {}, [])
+
+
+def listing_text(program: Program) -> str:
+    '''
+        The listing of an assembled program: the address and object code
+        (the first 3 bytes of a longer .BLOCK) of every source line
+    '''
+    lines = ['Addr  Object  Source']
+    for address, obj, line in program.listing:
+        code = obj[:3].hex().upper() + ('...' if len(obj) > 3 else '')
+        lines.append(f'{address:04X}  {code:<9} {line.expandtabs(8)}')
+    return '\n'.join(lines) + '\n'
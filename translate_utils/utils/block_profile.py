@@ -0,0 +1,157 @@
+'''
+    Basic-block profiling: the map from the counters of a program
+    translated in profile mode to its source, and the hot-spot report built
+    from a dump of the counter table.
+
+    Usage: python -m translate_utils.utils.block_profile program.profile.json
+               dump.txt
+           python -m translate_utils.utils.block_profile program.profile.json
+               --run program.pep -i 10 5
+'''
+import argparse
+import json
+
+from .assembler import assemble
+from .ir import Instruction, Opcode
+from .simulator import Pep9Simulator
+
+# Counters are words, they wrap around past this count
+WRAP = 0x10000
+
+
+class BlockProfile():
+    """
+        Counters of a program translated in profile mode. Counter i is the
+        word labelled <prefix>i, incremented by the code at the head of a
+        basic block (function entry, loop test, if, else, end of if). The
+        counters are contiguous, the table starts at the first one
+    """
+
+    def __init__(self) -> None:
+        self.prefix = '_bb'
+        self.blocks = []    # (function, source line, block kind)
+
+    def start(self, names):
+        '''
+            Forget the counters of a previous translation and pick a label
+            prefix that none of the program's names starts with
+        '''
+        self.blocks = []
+        self.prefix = '_bb'
+        while any(name.startswith(self.prefix) for name in names):
+            self.prefix = '_b' + chr(ord(self.prefix[-1]) + 1)
+
+    def counter(self, function, line, kind) -> str:
+        '''
+            Allocate the counter of a block, returning its label
+        '''
+        self.blocks.append((function, line, kind))
+        return f'{self.prefix}{len(self.blocks) - 1}'
+
+    def table(self):
+        '''
+            The .BLOCK reserving each counter, placed after the program
+        '''
+        return [Instruction(Opcode.BLOCK, 2, label=f'{self.prefix}{i}')
+                for i in range(len(self.blocks))]
+
+    def to_json(self):
+        return {
+            'table': f'{self.prefix}0',
+            'counters': [{'function': function, 'line': line, 'block': kind}
+                         for function, line, kind in self.blocks],
+        }
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_json(), f, indent=1)
+            f.write('\n')
+
+
+####
+# Hot-spot report
+####
+
+def read_dump(text, count):
+    '''
+        The counts held by a dump of the counter table: a JSON list of
+        integers, or the bytes of the table in hexadecimal (as shown by a
+        memory view, an address followed by ':' starting a line is skipped)
+    '''
+    if text.lstrip().startswith('['):
+        counts = json.loads(text)
+    else:
+        data = bytearray()
+        for line in text.splitlines():
+            for token in line.rpartition(':')[2].split():
+                data += bytes.fromhex(token)
+        counts = [int.from_bytes(data[i:i + 2], 'big')
+                  for i in range(0, len(data) - 1, 2)]
+    if len(counts) < count:
+        raise ValueError(f'The dump holds {len(counts)} counters, the map '
+                         f'describes {count}')
+    return counts[:count]
+
+
+def run_counts(profile_map, source, inputs=()):
+    '''
+        Run the profiled program on the simulator and read its counters
+    '''
+    program = assemble(source)
+    simulator = Pep9Simulator(program, inputs)
+    simulator.run()
+    start = program.symbols[profile_map['table']]
+    return [int.from_bytes(simulator.memory[address:address + 2], 'big')
+            for address in range(start, start + 2 * len(
+                profile_map['counters']), 2)]
+
+
+def hot_spots(profile_map, counts, top=None):
+    '''
+        Report lines, the blocks sorted by decreasing execution count
+    '''
+    total = sum(counts)
+    blocks = sorted(zip(counts, profile_map['counters']),
+                    key=lambda block: -block[0])
+    lines = [f'; hot spots: {total} block executions in '
+             f'{len(counts)} blocks (counts wrap at {WRAP})',
+             f'{"count":>8} {"share":>6}  {"function":<16}{"line":>5}  block']
+    for count, block in blocks[:top]:
+        share = 100 * count / total if total else 0
+        lines.append(f'{count:>8} {share:>5.1f}%  {block["function"]:<16}'
+                     f'{block["line"]:>5}  {block["block"]}')
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Report the hot spots of a program translated with '
+                    '--profile from a dump of its counter table')
+    parser.add_argument('map', help='counter map (.profile.json) written '
+                                    'next to the translation')
+    parser.add_argument('dump', nargs='?',
+                        help='counter table dump, JSON list or hex bytes')
+    parser.add_argument('--run', metavar='PEP',
+                        help='run the profiled program on the simulator '
+                             'instead of reading a dump')
+    parser.add_argument('-i', '--input', nargs='*', type=int, default=[],
+                        help='values consumed by DECI when running')
+    parser.add_argument('--top', type=int, default=20,
+                        help='number of blocks listed (default: 20)')
+    args = parser.parse_args()
+    if (args.dump is None) == (args.run is None):
+        parser.error('give either a dump or --run')
+
+    with open(args.map) as f:
+        profile_map = json.load(f)
+    if args.run is not None:
+        with open(args.run) as f:
+            counts = run_counts(profile_map, f.read(), args.input)
+    else:
+        with open(args.dump) as f:
+            counts = read_dump(f.read(), len(profile_map['counters']))
+    print('\n'.join(hot_spots(profile_map, counts, args.top)))
+
+
+if __name__ == '__main__':
+    main()
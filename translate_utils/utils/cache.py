@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import re
+import sys
+
+from . import pep9
+from .ir import Opcode
+
+# Default bound on the total size of the cache directory
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+# Labels numbered by the visitors' counters, renumbered when an entry is
+# spliced at another position of the program
+NUMBERED_LABEL = re.compile(
+    r'^(test|body|end_l|tail|memo|if|else|end_if)_(\d+)$')
+COUNTERS = {'test': 'loops', 'body': 'loops', 'end_l': 'loops',
+            'tail': 'loops', 'memo': 'loops',
+            'if': 'ifs', 'else': 'ifs', 'end_if': 'ifs'}
+
+_code_version = None
+# Directories a store failed in, warned about once per process
+_unwritable = set()
+
+
+def code_version() -> str:
+    '''
+        Hash of the translator's sources, so that entries produced by another
+        version of the code generator are never reused
+    '''
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha256()
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        for directory, _, files in sorted(os.walk(root)):
+            for name in sorted(files):
+                if name.endswith('.py'):
+                    with open(os.path.join(directory, name), 'rb') as f:
+                        digest.update(f.read())
+        _code_version = digest.hexdigest()
+    return _code_version
+
+
+def renumber(instructions, offsets):
+    '''
+        Shift the numbered labels (defined or referenced) of the
+        instructions by the offset of their counter
+    '''
+    def shift(name):
+        match = NUMBERED_LABEL.match(name) if name else None
+        if match is None:
+            return name
+        kind, number = match.groups()
+        return f'{kind}_{int(number) + offsets[COUNTERS[kind]]}'
+
+    result = []
+    for instruction in instructions:
+        label = shift(instruction.label)
+        operand = instruction.operand
+        if (instruction.opcode.value in pep9.BRANCH
+                and instruction.opcode is not Opcode.CALL):
+            operand = shift(operand)
+        if label != instruction.label or operand != instruction.operand:
+            instruction = instruction.replace(label=label, operand=operand)
+        result.append(instruction)
+    return result
+
+
+class TranslationCache():
+    """
+        On-disk store of translated functions, one JSON file per key. The
+        least recently used entries are evicted once the directory grows
+        beyond max_bytes
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.__size = None      # bytes used, computed on the first store
+
+    def report(self):
+        return [f'; cache {self.hits} functions reused, {self.misses} '
+                f'translated, {self.evicted} entries evicted']
+
+    @staticmethod
+    def key(*parts) -> str:
+        '''
+            Digest of the JSON-serializable parts and the translator version
+        '''
+        data = json.dumps([code_version(), *parts], sort_keys=True)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            # Mark the entry as recently used
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry) -> None:
+        '''
+            Store the entry. The cache is only an optimization: when the
+            directory cannot be written the entry is dropped, with a warning
+            the first time
+        '''
+        data = json.dumps(entry)
+        path = self._path(key)
+        # Write then rename, concurrent translations never read half an entry
+        temporary = f'{path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temporary, 'w') as f:
+                f.write(data)
+            os.replace(temporary, path)
+        except OSError as e:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+            if self.directory not in _unwritable:
+                _unwritable.add(self.directory)
+                print(f'warning: translation cache disabled, cannot write '
+                      f'to {self.directory}: {e.strerror or e}',
+                      file=sys.stderr)
+            return
+        if self.__size is None:
+            self.__size = sum(size for _, size, _ in self._entries())
+        else:
+            self.__size += len(data)
+        if self.__size > self.max_bytes:
+            self._evict()
+
+    ####
+    # Helper functions
+    ####
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def _entries(self):
+        '''
+            (path, size, last use) of every entry
+        '''
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict(self):
+        '''
+            Remove the least recently used entries until the cache fits in
+            max_bytes
+        '''
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        size = sum(e[1] for e in entries)
+        for path, entry_size, _ in entries:
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                self.evicted += 1
+            except OSError:
+                pass
+            size -= entry_size
+        self.__size = size
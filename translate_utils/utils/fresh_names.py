@@ -0,0 +1,42 @@
+import ast
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+class FreshNames():
+    """
+        Generates variable names unused in a module: _ followed by a base 36
+        number, at most 5 characters so that they keep their name once
+        converted
+    """
+
+    def __init__(self, root_node) -> None:
+        self.__root = root_node
+        self.__used = None      # names of the module, collected when needed
+        self.__count = 0
+
+    def _collect(self):
+        used = set()
+        for node in ast.walk(self.__root):
+            if isinstance(node, ast.Name):
+                used.add(node.id)
+            elif isinstance(node, ast.FunctionDef):
+                used.add(node.name)
+                used.update(arg.arg for arg in node.args.args)
+        return used
+
+    def next(self) -> str:
+        if self.__used is None:
+            self.__used = self._collect()
+        while True:
+            number, digits = self.__count, ''
+            self.__count += 1
+            while True:
+                number, digit = divmod(number, len(DIGITS))
+                digits = DIGITS[digit] + digits
+                if not number:
+                    break
+            name = '_' + digits
+            if name not in self.__used:
+                self.__used.add(name)
+                return name
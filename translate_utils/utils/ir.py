@@ -0,0 +1,156 @@
+'''
+    Structured representation of the generated instructions: an opcode, an
+    operand, an addressing mode and an optional label, rendered to Pep/9
+    assembly text only when the program is written
+'''
+import enum
+
+from . import pep9
+
+# Addressing modes reading a pointer from memory before the operand
+INDIRECT_MODES = {'n', 'sf', 'sfx'}
+
+# Bytes of data accessed by the operand of each instruction (absent: none)
+_DATA_BYTES = {
+    'DECI': 2, 'DECO': 2, 'HEXO': 2, 'STRO': 1, 'NOP': 2,
+    'ADDSP': 2, 'SUBSP': 2, 'ADDA': 2, 'ADDX': 2, 'SUBA': 2, 'SUBX': 2,
+    'ANDA': 2, 'ANDX': 2, 'ORA': 2, 'ORX': 2, 'CPWA': 2, 'CPWX': 2,
+    'CPBA': 1, 'CPBX': 1, 'LDWA': 2, 'LDWX': 2, 'LDBA': 1, 'LDBX': 1,
+    'STWA': 2, 'STWX': 2, 'STBA': 1, 'STBX': 1,
+}
+
+# Bytes of stack accessed by the instruction itself
+_STACK_BYTES = {'CALL': 2, 'RET': 2}
+
+
+class _OpcodeBase(enum.Enum):
+    """Metadata shared by every opcode"""
+
+    @property
+    def mnemonic(self) -> str:
+        return self.value
+
+    @property
+    def directive(self) -> bool:
+        return self.value.startswith('.')
+
+    @property
+    def size(self) -> int:
+        '''
+            Bytes occupied by the instruction in the object code
+        '''
+        return _SIZES[self]
+
+    @property
+    def flags_read(self) -> frozenset:
+        return _FLAGS_READ[self]
+
+    @property
+    def flags_written(self) -> frozenset:
+        return _FLAGS_WRITTEN[self]
+
+
+# Every Pep/9 mnemonic, plus the .END directive closing the program and
+# .BLOCK reserving data after it (the profile counters)
+Opcode = _OpcodeBase('Opcode', [
+    (mnemonic, mnemonic)
+    for mnemonic in (*pep9.UNARY, *pep9.BRANCH, *pep9.NONUNARY)
+] + [('END', '.END'), ('BLOCK', '.BLOCK')])
+
+_SIZES = {opcode: 0 if opcode.directive
+          else pep9.instruction_size(opcode.value) for opcode in Opcode}
+_FLAGS_READ = {opcode: frozenset(pep9.FLAGS_READ.get(opcode.value, ''))
+               for opcode in Opcode}
+_FLAGS_WRITTEN = {opcode: frozenset(pep9.FLAGS_WRITTEN.get(opcode.value, ''))
+                  for opcode in Opcode}
+
+
+class Instruction():
+    """
+        One generated instruction. Instructions are shared between lists
+        (the runtime library, cached functions), they are never modified:
+        replace() returns a modified copy
+    """
+
+    __slots__ = ('opcode', 'operand', 'mode', 'label')
+
+    def __init__(self, opcode, operand=None, mode=None, label=None) -> None:
+        self.opcode = opcode
+        # Operands are compared by the optimizers, numbers are kept as text
+        # so that 2 and '2' never designate different locations
+        self.operand = operand if operand is None or type(operand) is str \
+            else str(operand)
+        self.mode = mode
+        self.label = label
+
+    @classmethod
+    def parse(cls, text, label=None):
+        '''
+            The instruction written as text, such as 'LDWA x,d'
+        '''
+        mnemonic, operand, mode = pep9.split_instruction(text)
+        return cls(Opcode(mnemonic), operand, mode, label)
+
+    def replace(self, **changes):
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes)
+        return Instruction(**fields)
+
+    @property
+    def size(self) -> int:
+        if self.opcode is Opcode.BLOCK:
+            return int(self.operand)
+        return _SIZES[self.opcode]
+
+    @property
+    def cycles(self) -> int:
+        '''
+            Estimate matching the simulator's: one cycle per byte of
+            instruction fetched and per byte of data read or written
+        '''
+        cycles = _SIZES[self.opcode] + _STACK_BYTES.get(self.opcode.value, 0)
+        if self.mode is None or self.mode == 'i':
+            return cycles
+        if self.opcode.value in pep9.BRANCH:
+            # Indexed branch, the target is read from a table
+            return cycles + 2
+        cycles += _DATA_BYTES.get(self.opcode.value, 0)
+        if self.mode in INDIRECT_MODES:
+            cycles += 2
+        return cycles
+
+    def text(self) -> str:
+        '''
+            The instruction without its label, as written in the program
+        '''
+        return pep9.join_instruction(self.opcode.value, self.operand,
+                                     self.mode)
+
+    def line(self) -> str:
+        '''
+            The instruction as a line of the program, with its label
+        '''
+        if self.label is None:
+            return f'\t\t{self.text()}'
+        return f'{self.label + ":":<9}\t{self.text()}'
+
+    def to_json(self):
+        return [self.label, self.opcode.value, self.operand, self.mode]
+
+    @classmethod
+    def from_json(cls, data):
+        label, mnemonic, operand, mode = data
+        return cls(Opcode(mnemonic), operand, mode, label)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Instruction):
+            return NotImplemented
+        return (self.opcode is other.opcode and self.operand == other.operand
+                and self.mode == other.mode and self.label == other.label)
+
+    def __hash__(self) -> int:
+        return hash((self.opcode, self.operand, self.mode, self.label))
+
+    def __repr__(self) -> str:
+        label = f'{self.label}: ' if self.label is not None else ''
+        return f'<Instruction {label}{self.text()}>'
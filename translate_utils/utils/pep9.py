@@ -0,0 +1,95 @@
+'''
+    Pep/9 instruction set tables shared by the assembler and the simulator
+'''
+
+# Three-bit addressing mode field (aaa) of non-unary instructions
+ADDRESSING_MODES = {
+    'i': 0, 'd': 1, 'n': 2, 's': 3, 'sf': 4, 'x': 5, 'sx': 6, 'sfx': 7,
+}
+
+# One-bit addressing mode field (a) of branches and CALL
+BRANCH_MODES = {'i': 0, 'x': 1}
+
+# Instructions without operand specifier (one byte)
+UNARY = {
+    'STOP': 0x00, 'RET': 0x01, 'RETTR': 0x02, 'MOVSPA': 0x03,
+    'MOVFLGA': 0x04, 'MOVAFLG': 0x05, 'NOTA': 0x06, 'NOTX': 0x07,
+    'NEGA': 0x08, 'NEGX': 0x09, 'ASLA': 0x0A, 'ASLX': 0x0B,
+    'ASRA': 0x0C, 'ASRX': 0x0D, 'ROLA': 0x0E, 'ROLX': 0x0F,
+    'RORA': 0x10, 'RORX': 0x11, 'NOP0': 0x26, 'NOP1': 0x27,
+}
+
+# Branches and CALL, addressed with the a field
+BRANCH = {
+    'BR': 0x12, 'BRLE': 0x14, 'BRLT': 0x16, 'BREQ': 0x18, 'BRNE': 0x1A,
+    'BRGE': 0x1C, 'BRGT': 0x1E, 'BRV': 0x20, 'BRC': 0x22, 'CALL': 0x24,
+}
+
+# Remaining instructions, addressed with the aaa field
+NONUNARY = {
+    'NOP': 0x28, 'DECI': 0x30, 'DECO': 0x38, 'HEXO': 0x40, 'STRO': 0x48,
+    'ADDSP': 0x50, 'SUBSP': 0x58, 'ADDA': 0x60, 'ADDX': 0x68,
+    'SUBA': 0x70, 'SUBX': 0x78, 'ANDA': 0x80, 'ANDX': 0x88, 'ORA': 0x90,
+    'ORX': 0x98, 'CPWA': 0xA0, 'CPWX': 0xA8, 'CPBA': 0xB0, 'CPBX': 0xB8,
+    'LDWA': 0xC0, 'LDWX': 0xC8, 'LDBA': 0xD0, 'LDBX': 0xD8,
+    'STWA': 0xE0, 'STWX': 0xE8, 'STBA': 0xF0, 'STBX': 0xF8,
+}
+
+# Branches that depend on the status bits
+CONDITIONAL_BRANCHES = {
+    'BRLE', 'BRLT', 'BREQ', 'BRNE', 'BRGE', 'BRGT', 'BRV', 'BRC',
+}
+
+# Status bits read by each instruction (absent: none)
+FLAGS_READ = {
+    'BRLE': 'NZ', 'BRLT': 'N', 'BREQ': 'Z', 'BRNE': 'Z', 'BRGE': 'N',
+    'BRGT': 'NZ', 'BRV': 'V', 'BRC': 'C', 'MOVFLGA': 'NZVC',
+    'ROLA': 'C', 'ROLX': 'C', 'RORA': 'C', 'RORX': 'C',
+}
+
+# Status bits written by each instruction (absent: none)
+FLAGS_WRITTEN = {
+    'ADDA': 'NZVC', 'ADDX': 'NZVC', 'SUBA': 'NZVC', 'SUBX': 'NZVC',
+    'CPWA': 'NZVC', 'CPWX': 'NZVC', 'CPBA': 'NZVC', 'CPBX': 'NZVC',
+    'ADDSP': 'NZVC', 'SUBSP': 'NZVC', 'MOVAFLG': 'NZVC',
+    'ASLA': 'NZVC', 'ASLX': 'NZVC', 'ASRA': 'NZC', 'ASRX': 'NZC',
+    'ROLA': 'C', 'ROLX': 'C', 'RORA': 'C', 'RORX': 'C',
+    'NEGA': 'NZV', 'NEGX': 'NZV', 'DECI': 'NZV',
+    'NOTA': 'NZ', 'NOTX': 'NZ', 'ANDA': 'NZ', 'ANDX': 'NZ',
+    'ORA': 'NZ', 'ORX': 'NZ', 'LDWA': 'NZ', 'LDWX': 'NZ',
+    'LDBA': 'NZ', 'LDBX': 'NZ',
+}
+
+# Instructions after which execution never falls through
+UNCONDITIONAL = {'BR', 'RET', 'STOP'}
+
+# Symbols predefined by the Pep/9 assembler (memory-mapped I/O)
+PREDEFINED_SYMBOLS = {'charIn': 0xFC15, 'charOut': 0xFC16}
+
+
+def instruction_size(mnemonic: str) -> int:
+    '''
+        Number of bytes occupied by an instruction
+    '''
+    return 1 if mnemonic.upper() in UNARY else 3
+
+
+def join_instruction(mnemonic: str, operand=None, mode=None) -> str:
+    '''
+        Inverse of split_instruction
+    '''
+    if operand is None:
+        return mnemonic
+    return f'{mnemonic} {operand},{mode}' if mode else f'{mnemonic} {operand}'
+
+
+def split_instruction(instruction: str):
+    '''
+        Split an instruction such as 'LDWA x,d' into its mnemonic, operand
+        and addressing mode ('LDWA', 'x', 'd'). Missing parts are None
+    '''
+    parts = instruction.split(None, 1)
+    if len(parts) == 1:
+        return parts[0], None, None
+    operand, _, mode = parts[1].partition(',')
+    return parts[0], operand.strip(), mode.strip() or None
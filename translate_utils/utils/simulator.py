@@ -0,0 +1,392 @@
+'''
+    Headless Pep/9 simulator used to measure the code produced by the
+    translator. Trap instructions (DECI, DECO, HEXO, STRO, NOP) are executed
+    natively and count as a single instruction.
+
+    Usage: python -m translate_utils.utils.simulator program.pep -i 10 5
+'''
+import argparse
+import json
+import sys
+from collections import Counter
+from . import pep9
+from .assembler import Program, assemble, read_object
+
+# Initial stack pointer set by the Pep/9 operating system
+STACK_TOP = 0xFB8F
+
+
+class Pep9Simulator():
+
+    def __init__(self, program: Program, inputs=(), max_steps=10_000_000,
+                 stack_top=STACK_TOP) -> None:
+        self.program = program
+        self.memory = bytearray(0x10000)
+        self.memory[:len(program.code)] = program.code
+        self.__inputs = list(inputs)
+        self.__chars = ''
+        self.max_steps = max_steps
+        self.stack_top = stack_top
+
+        self.a = self.x = self.pc = 0
+        self.sp = stack_top
+        self.n = self.z = self.v = self.c = 0
+
+        self.output = []        # text written by DECO, HEXO, STRO, charOut
+        self.values = []        # every integer written by DECO
+        self.instructions = 0
+        self.fetched_bytes = 0
+        self.memory_reads = 0
+        self.memory_writes = 0
+        self.traffic = 0        # data bytes read or written
+        self.min_sp = stack_top
+        self.histogram = Counter()
+        self.halted = False
+
+    def run(self) -> dict:
+        '''
+            Execute until STOP and return the execution statistics
+        '''
+        while not self.halted:
+            if self.instructions >= self.max_steps:
+                raise RuntimeError(
+                    f'step limit of {self.max_steps} instructions exceeded')
+            self.step()
+        return self.stats()
+
+    def stats(self) -> dict:
+        return {
+            'instructions': self.instructions,
+            # Cycle estimate based on bus traffic: one cycle per byte of
+            # instruction fetched and per byte of data read or written
+            'cycles': self.fetched_bytes + self.traffic,
+            'memory_reads': self.memory_reads,
+            'memory_writes': self.memory_writes,
+            'stack_high_water': self.stack_top - self.min_sp,
+            'histogram': dict(self.histogram.most_common()),
+            'output': ''.join(self.output),
+            'values': self.values,
+        }
+
+    def step(self):
+        mnemonic, mode, spec = self._fetch()
+        self.instructions += 1
+        self.histogram[mnemonic] += 1
+
+        if mnemonic in pep9.UNARY:
+            self._execute_unary(mnemonic)
+        elif mnemonic in pep9.BRANCH:
+            self._execute_branch(mnemonic, mode, spec)
+        else:
+            self._execute_nonunary(mnemonic, mode, spec)
+
+    #######
+    # Helper Functions
+    #######
+
+    def _fetch(self):
+        opcode = self.memory[self.pc]
+        try:
+            mnemonic, mode = DECODE[opcode]
+        except KeyError:
+            raise RuntimeError(
+                f'illegal opcode 0x{opcode:02X} at 0x{self.pc:04X}')
+        if mnemonic in pep9.UNARY:
+            self.pc = (self.pc + 1) & 0xFFFF
+            self.fetched_bytes += 1
+            return mnemonic, None, None
+        spec = (self.memory[(self.pc + 1) & 0xFFFF] << 8) | \
+            self.memory[(self.pc + 2) & 0xFFFF]
+        self.pc = (self.pc + 3) & 0xFFFF
+        self.fetched_bytes += 3
+        return mnemonic, mode, spec
+
+    def _execute_unary(self, mnemonic):
+        if mnemonic == 'STOP':
+            self.halted = True
+        elif mnemonic == 'RET':
+            self.pc = self._read_word(self.sp)
+            self._set_sp(self.sp + 2)
+        elif mnemonic == 'MOVSPA':
+            self.a = self.sp
+        elif mnemonic == 'MOVFLGA':
+            self.a = (self.n << 3) | (self.z << 2) | (self.v << 1) | self.c
+        elif mnemonic == 'MOVAFLG':
+            self.n, self.z = (self.a >> 3) & 1, (self.a >> 2) & 1
+            self.v, self.c = (self.a >> 1) & 1, self.a & 1
+        elif mnemonic in ('NOP0', 'NOP1'):
+            pass
+        elif mnemonic == 'RETTR':
+            raise RuntimeError('RETTR is not supported')
+        else:
+            register = mnemonic[-1]
+            value = self._register(register)
+            operation = mnemonic[:-1]
+            if operation == 'NOT':
+                value = ~value & 0xFFFF
+            elif operation == 'NEG':
+                self.v = int(value == 0x8000)
+                value = -value & 0xFFFF
+            elif operation == 'ASL':
+                self.c = value >> 15
+                self.v = int((value >> 15) != ((value >> 14) & 1))
+                value = (value << 1) & 0xFFFF
+            elif operation == 'ASR':
+                self.c = value & 1
+                value = (value >> 1) | (value & 0x8000)
+            elif operation == 'ROL':
+                value, self.c = ((value << 1) | self.c) & 0xFFFF, value >> 15
+            elif operation == 'ROR':
+                value, self.c = (value >> 1) | (self.c << 15), value & 1
+            self._set_register(register, value)
+            if operation not in ('ROL', 'ROR'):
+                self._set_nz(value)
+
+    def _execute_branch(self, mnemonic, mode, spec):
+        target = spec if mode == 'i' else self._read_word(spec + self.x)
+        taken = {
+            'BR': True,
+            'CALL': True,
+            'BRLE': self.n or self.z,
+            'BRLT': self.n,
+            'BREQ': self.z,
+            'BRNE': not self.z,
+            'BRGE': not self.n,
+            'BRGT': not self.n and not self.z,
+            'BRV': self.v,
+            'BRC': self.c,
+        }[mnemonic]
+        if mnemonic == 'CALL':
+            self._set_sp(self.sp - 2)
+            self._write_word(self.sp, self.pc)
+        if taken:
+            self.pc = target
+
+    def _execute_nonunary(self, mnemonic, mode, spec):
+        if mnemonic == 'DECI':
+            if not self.__inputs:
+                raise RuntimeError('DECI: no input left')
+            value = int(self.__inputs.pop(0)) & 0xFFFF
+            self._write_word(self._address(mode, spec), value)
+            self._set_nz(value)
+            self.v = 0
+        elif mnemonic in ('STWA', 'STWX'):
+            self._write_word(self._address(mode, spec),
+                             self._register(mnemonic[-1]))
+        elif mnemonic in ('STBA', 'STBX'):
+            self._write_byte(self._address(mode, spec),
+                             self._register(mnemonic[-1]) & 0xFF)
+        elif mnemonic == 'STRO':
+            address = self._address(mode, spec)
+            while self._read_byte(address):
+                self.output.append(chr(self._read_byte(address)))
+                address = (address + 1) & 0xFFFF
+        elif mnemonic in ('LDBA', 'LDBX', 'CPBA', 'CPBX'):
+            self._execute_byte(mnemonic, self._operand_byte(mode, spec))
+        else:
+            self._execute_word(mnemonic, self._operand_word(mode, spec))
+
+    def _execute_word(self, mnemonic, operand):
+        if mnemonic == 'DECO':
+            value = _signed(operand)
+            self.values.append(value)
+            self.output.append(str(value))
+        elif mnemonic == 'HEXO':
+            self.output.append(f'{operand:04X}')
+        elif mnemonic == 'NOP':
+            pass
+        elif mnemonic in ('ADDSP', 'SUBSP'):
+            sign = 1 if mnemonic == 'ADDSP' else -1
+            self._set_sp(self._add(self.sp, operand, sign))
+        else:
+            register, operation = mnemonic[-1], mnemonic[:-1]
+            value = self._register(register)
+            if operation == 'ADD':
+                self._set_register(register, self._add(value, operand, 1))
+            elif operation == 'SUB':
+                self._set_register(register, self._add(value, operand, -1))
+            elif operation == 'AND':
+                self._set_register(register, value & operand)
+                self._set_nz(value & operand)
+            elif operation == 'OR':
+                self._set_register(register, value | operand)
+                self._set_nz(value | operand)
+            elif operation == 'CPW':
+                self._add(value, operand, -1)
+                # Pep/9 corrects the sign of a comparison that overflowed
+                self.n ^= self.v
+            elif operation == 'LDW':
+                self._set_register(register, operand)
+                self._set_nz(operand)
+
+    def _execute_byte(self, mnemonic, operand):
+        register = mnemonic[-1]
+        value = self._register(register)
+        if mnemonic.startswith('LDB'):
+            self._set_register(register, (value & 0xFF00) | operand)
+            self.n, self.z = 0, int(operand == 0)
+        else:
+            result = ((value & 0xFF) - operand) & 0xFF
+            self.n, self.z = result >> 7, int(result == 0)
+            self.v = self.c = 0
+
+    def _add(self, left, right, sign):
+        '''
+            16-bit addition (sign 1) or subtraction (sign -1) setting NZVC
+        '''
+        if sign < 0:
+            right = ~right & 0xFFFF
+        total = left + right + (1 if sign < 0 else 0)
+        result = total & 0xFFFF
+        self.c = total >> 16
+        self.v = int((left ^ result) & (right ^ result) & 0x8000 != 0)
+        self._set_nz(result)
+        return result
+
+    def _set_nz(self, value):
+        self.n, self.z = value >> 15, int(value == 0)
+
+    def _register(self, name):
+        return self.a if name == 'A' else self.x
+
+    def _set_register(self, name, value):
+        if name == 'A':
+            self.a = value & 0xFFFF
+        else:
+            self.x = value & 0xFFFF
+
+    def _set_sp(self, value):
+        self.sp = value & 0xFFFF
+        self.min_sp = min(self.min_sp, self.sp)
+
+    def _address(self, mode, spec):
+        '''
+            Effective address of the operand for every addressing mode but
+            immediate
+        '''
+        if mode == 'd':
+            return spec
+        if mode == 'n':
+            return self._read_word(spec)
+        if mode == 's':
+            return (self.sp + spec) & 0xFFFF
+        if mode == 'sf':
+            return self._read_word(self.sp + spec)
+        if mode == 'x':
+            return (spec + self.x) & 0xFFFF
+        if mode == 'sx':
+            return (self.sp + spec + self.x) & 0xFFFF
+        if mode == 'sfx':
+            return (self._read_word(self.sp + spec) + self.x) & 0xFFFF
+        raise RuntimeError(f'invalid addressing mode {mode!r} for a store')
+
+    def _operand_word(self, mode, spec):
+        if mode == 'i':
+            return spec
+        return self._read_word(self._address(mode, spec))
+
+    def _operand_byte(self, mode, spec):
+        if mode == 'i':
+            return spec & 0xFF
+        return self._read_byte(self._address(mode, spec))
+
+    def _read_word(self, address):
+        address &= 0xFFFF
+        self.memory_reads += 1
+        self.traffic += 2
+        return (self.memory[address] << 8) | \
+            self.memory[(address + 1) & 0xFFFF]
+
+    def _write_word(self, address, value):
+        address &= 0xFFFF
+        self.memory_writes += 1
+        self.traffic += 2
+        self.memory[address] = (value >> 8) & 0xFF
+        self.memory[(address + 1) & 0xFFFF] = value & 0xFF
+
+    def _read_byte(self, address):
+        self.memory_reads += 1
+        self.traffic += 1
+        if address == pep9.PREDEFINED_SYMBOLS['charIn']:
+            if not self.__chars:
+                self.__chars = ' '.join(str(v) for v in self.__inputs) + '\n'
+                self.__inputs = []
+            char, self.__chars = self.__chars[0], self.__chars[1:]
+            return ord(char) & 0xFF
+        return self.memory[address]
+
+    def _write_byte(self, address, value):
+        self.memory_writes += 1
+        self.traffic += 1
+        if address == pep9.PREDEFINED_SYMBOLS['charOut']:
+            self.output.append(chr(value))
+        self.memory[address] = value
+
+
+def _signed(value):
+    return value - 0x10000 if value & 0x8000 else value
+
+
+def _build_decoder():
+    decode = {}
+    for mnemonic, opcode in pep9.UNARY.items():
+        decode[opcode] = (mnemonic, None)
+    for mnemonic, opcode in pep9.BRANCH.items():
+        for mode, bits in pep9.BRANCH_MODES.items():
+            decode[opcode | bits] = (mnemonic, mode)
+    for mnemonic, opcode in pep9.NONUNARY.items():
+        for mode, bits in pep9.ADDRESSING_MODES.items():
+            decode[opcode | bits] = (mnemonic, mode)
+    return decode
+
+
+DECODE = _build_decoder()
+
+
+def simulate(source: str, inputs=(), max_steps=10_000_000) -> dict:
+    '''
+        Assemble Pep/9 source code, run it on the scripted DECI inputs and
+        return the execution statistics
+    '''
+    return Pep9Simulator(assemble(source), inputs, max_steps).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Run a Pep/9 program (or an RBS program, translated '
+                    'first) and report execution statistics')
+    parser.add_argument('file', help='Pep/9 (.pep), object code (.pepo) or '
+                                     'RBS (.py) file')
+    parser.add_argument('-i', '--input', nargs='*', type=int, default=[],
+                        help='values consumed by DECI, in order')
+    parser.add_argument('--max-steps', type=int, default=10_000_000)
+    parser.add_argument('--json', default=False, action='store_true',
+                        help='print the statistics as JSON')
+    args = parser.parse_args()
+
+    with open(args.file) as f:
+        source = f.read()
+    if args.file.endswith('.pepo'):
+        stats = Pep9Simulator(read_object(source), args.input,
+                              args.max_steps).run()
+    else:
+        if args.file.endswith('.py'):
+            from ..pipeline import translate
+            source = translate(source, args.file)
+        stats = simulate(source, args.input, args.max_steps)
+
+    if args.json:
+        json.dump(stats, sys.stdout, indent=2)
+        print()
+        return
+    print(f'output:           {stats["output"]}')
+    for key in ('instructions', 'cycles', 'memory_reads', 'memory_writes',
+                'stack_high_water'):
+        print(f'{key + ":":<18}{stats[key]}')
+    print('histogram:')
+    for mnemonic, count in stats['histogram'].items():
+        print(f'  {mnemonic:<8}{count}')
+
+
+if __name__ == '__main__':
+    main()
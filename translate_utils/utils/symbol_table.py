@@ -1,4 +1,10 @@
 
+from collections import Counter
+
+# Letters tried, in turn, as the last character of a truncated name
+SUFFIXES = 26
+
+
 class SymbolTable():
     '''
         Stores the variable's name with its corresponding converted name
@@ -10,6 +16,9 @@ class SymbolTable():
         self.__specialVar = set()
         # store all functions' name (label)
         self.__labels = dict()
+        # reverse indexes of the converted names, for collision checks
+        self.__symbol_names = Counter()
+        self.__label_names = set()
 
     def get_name(self, name: str) -> str:
         return self.__symbols[name]
@@ -31,11 +40,7 @@ class SymbolTable():
         if name[-1] == "_":      # special case for array's name
             return self.update_and_get(name, name[-8:])
 
-        new_name = name[:8]
-        i = 0
-        while new_name in list(self.__symbols.values()) + list(self.__labels.values()):
-            new_name = name[:7] + chr(97 + (ord(name[7]) + i - 97) % 26)
-            i += 1
+        new_name = self._unique(name[:8], name, check_labels=True)
         if not label_conv:
             return self.update_and_get(name, new_name)
         return self.update_and_get(name, new_name, True)
@@ -48,20 +53,13 @@ class SymbolTable():
            two characters of the function name
         '''
         if len(name) <= 5:
-            self.__symbols[name] = f'{f_name[:2]}_{name}'
-            return self.get_name(name)
+            return self.update_and_get(name, f'{f_name[:2]}_{name}')
 
         if name[-1] == '_':
             return self.update_and_get(name, f'{f_name[:2]}_{name[-5:]}')
 
-        new_name = f'{f_name[:2]}_{name[:5]}'
-        i = 0
-        while new_name in self.__symbols.values():
-            new_name = new_name[:7] + \
-                chr(97 + (ord(new_name[7]) + i - 97) % 26)
-            i += 1
-        self.__symbols[name] = new_name
-        return self.get_name(name)
+        new_name = self._unique(f'{f_name[:2]}_{name[:5]}', name)
+        return self.update_and_get(name, new_name)
 
     def add_special_var(self, var_name: str) -> None:
         '''
@@ -98,7 +96,8 @@ class SymbolTable():
             symbol table
         '''
         for c in const:
-            self.__symbols.update(c)
+            for o_name, n_name in c.items():
+                self._set_symbol(o_name, n_name)
 
     #######
     # Helper Functions
@@ -111,8 +110,9 @@ class SymbolTable():
         '''
         if label:
             self.__labels[name] = new_name
+            self.__label_names.add(new_name)
             return self.get_label(name)
-        self.__symbols[name] = new_name
+        self._set_symbol(name, new_name)
         return self.get_name(name)
 
     def get_labels(self):
@@ -120,3 +120,33 @@ class SymbolTable():
 
     def update_labels(self, labels: dict[str: str]):
         self.__labels = labels
+        self.__label_names = set(labels.values())
+
+    def _set_symbol(self, name: str, new_name: str):
+        old_name = self.__symbols.get(name)
+        if old_name is not None:
+            self.__symbol_names[old_name] -= 1
+            if not self.__symbol_names[old_name]:
+                del self.__symbol_names[old_name]
+        self.__symbols[name] = new_name
+        self.__symbol_names[new_name] += 1
+
+    def _taken(self, new_name: str, check_labels: bool) -> bool:
+        return new_name in self.__symbol_names or (
+            check_labels and new_name in self.__label_names)
+
+    def _unique(self, new_name: str, name: str, check_labels=False) -> str:
+        '''
+            new_name if it is free, otherwise the first free name obtained by
+            cycling its 8th character through the lowercase letters
+        '''
+        if not self._taken(new_name, check_labels):
+            return new_name
+        for i in range(SUFFIXES):
+            candidate = new_name[:7] + \
+                chr(97 + (ord(new_name[7]) + i - 97) % SUFFIXES)
+            if not self._taken(candidate, check_labels):
+                return candidate
+        raise ValueError(
+            f'Cannot find a unique Pep/9 name for {name}: every '
+            f'{new_name[:7]}? name is already taken')
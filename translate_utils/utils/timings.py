@@ -0,0 +1,144 @@
+'''
+    Wall time, peak memory (tracemalloc) and node/instruction counts of the
+    translation phases and of every function, rendered as a table or JSON
+'''
+import ast
+import contextlib
+import time
+import tracemalloc
+
+
+class PhaseTimings():
+    """
+        Records of the phases run by the pipeline, in order, and of the
+        functions translated while visiting the module. The peak memory of
+        a record is the largest amount allocated by it on top of what was
+        allocated when it started (nested records included).
+
+        tracemalloc is started by the first phase unless it is already
+        tracing, and stopped by finish(); it slows the translation down,
+        the times are comparable with each other rather than with an
+        untraced run
+    """
+
+    def __init__(self) -> None:
+        self.phases = []        # records, see _record
+        self.functions = []
+        self.__stack = []       # [record, memory at start, peak so far]
+        self.__started = False
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        '''
+            Time the body as a phase, yielding its record so that the
+            caller can fill in the counts
+        '''
+        record = _record(name)
+        self.phases.append(record)
+        with self._measure(record):
+            yield record
+
+    @contextlib.contextmanager
+    def function(self, name):
+        record = _record(name)
+        self.functions.append(record)
+        with self._measure(record):
+            yield record
+
+    def finish(self):
+        if self.__started:
+            tracemalloc.stop()
+            self.__started = False
+
+    def to_json(self):
+        return {
+            'seconds': sum(r['seconds'] for r in self.phases),
+            'peak_bytes': max((r['peak_bytes'] for r in self.phases),
+                              default=0),
+            'phases': self.phases,
+            'functions': self.functions,
+        }
+
+    def table(self):
+        '''
+            Report lines, the phases then the functions by decreasing time
+        '''
+        total = self.to_json()
+        lines = [f'; timings {total["seconds"] * 1000:.1f} ms, largest phase '
+                 f'peak {total["peak_bytes"] / 1024:.1f} KiB',
+                 f'{"phase":<24}{"ms":>10}{"peak KiB":>10}{"nodes":>9}'
+                 f'{"instructions":>14}']
+        for record in self.phases:
+            lines.append(_row(record['name'], record))
+        if self.functions:
+            lines.append('functions')
+        for record in sorted(self.functions, key=lambda r: -r['seconds']):
+            lines.append(_row('  ' + record['name'], record))
+        return lines
+
+    ####
+    # Measurement
+    ####
+
+    @contextlib.contextmanager
+    def _measure(self, record):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.__started = True
+        if self.__stack:
+            # The enclosing record keeps its peak before it is reset
+            parent = self.__stack[-1]
+            parent[2] = max(parent[2], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        frame = [record, tracemalloc.get_traced_memory()[0], 0]
+        self.__stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            self.__stack.pop()
+            peak = max(frame[2], tracemalloc.get_traced_memory()[1])
+            record['peak_bytes'] = peak - frame[1]
+            if self.__stack:
+                parent = self.__stack[-1]
+                parent[2] = max(parent[2], peak)
+            tracemalloc.reset_peak()
+
+
+def phase(timings, name):
+    '''
+        timings.phase(name), or a context doing nothing without timings
+    '''
+    if timings is None:
+        return contextlib.nullcontext({})
+    return timings.phase(name)
+
+
+def function(timings, name):
+    '''
+        timings.function(name), or a context doing nothing without timings
+    '''
+    if timings is None:
+        return contextlib.nullcontext({})
+    return timings.function(name)
+
+
+def count_nodes(node):
+    return sum(1 for _ in ast.walk(node))
+
+
+def _record(name):
+    return {'name': name, 'seconds': 0.0, 'peak_bytes': 0, 'nodes': None,
+            'instructions': None}
+
+
+def _row(name, record):
+    return (f'{name:<24}{record["seconds"] * 1000:>10.2f}'
+            f'{record["peak_bytes"] / 1024:>10.1f}'
+            f'{_count(record["nodes"]):>9}'
+            f'{_count(record["instructions"]):>14}')
+
+
+def _count(value):
+    return '-' if value is None else value
@@ -1,7 +1,11 @@
-from .TopLevelProgram import TopLevelProgram
-from .FunctionVariables import FunctionVariableExtraction
+from .TopLevelProgram import TopLevelProgram, _log2
 from ..generators.DynamicMemoryAllocation import DynamicMemoryAllocation
+from ..optimizers.StackSlots import sequential
+from ..utils.cache import renumber
+from ..utils.ir import Instruction, Opcode
+from ..utils import timings
 import ast
+import io
 
 
 class GeneralizedProgram(TopLevelProgram):
@@ -13,6 +17,27 @@ class GeneralizedProgram(TopLevelProgram):
         self.func_name = ''
         self.current_tl = 1     # store the id for the current function
         self.num_local_vars = 0
+        # collects the memory allocation of every function's frame
+        self.frames = io.StringIO()
+        # TranslationCache reusing the translation of unchanged functions
+        self.cache = None
+        # ProgramInfo of the module, from ProgramAnalysis
+        self.info = None
+        # TailRecursion turning self-calls into jumps, None to keep them
+        self.tail_recursion = None
+        self._tail_label = None     # where the function's tail calls jump
+        self._light = False         # if the function uses the light convention
+        # StackSlotSharing packing the locals of the frames, None to give
+        # each local its own slot
+        self.stack_slots = None
+        # (function, frame sizes) of every function, see _translate_function
+        self.frame_sizes = []
+        # Memoizer recording the results of pure recursive functions, None
+        # to not memoize
+        self.memoizer = None
+        self._memo = None           # (values, flags, entries, parameter)
+        # PhaseTimings receiving a record per function, None to not time
+        self.timings = None
 
     ####
     # Handling function calls
@@ -22,80 +47,303 @@ class GeneralizedProgram(TopLevelProgram):
         self.func_name = node.name
         self.func_name = self.st.convert(self.func_name, True)
 
+        # The function's frame and instructions only depend on its AST and
+        # on the global symbols it refers to, they can be reused from the
+        # cache as long as neither changed
+        with timings.function(self.timings, node.name) as record:
+            key = None
+            function = None
+            if self.cache is not None:
+                # The sizes of the arrays can depend on the call sites
+                key = self.cache.key(ast.dump(node),
+                                     self._function_context(node),
+                                     self.info.functions[node.name].local_vars,
+                                     self.tail_recursion is not None,
+                                     self.stack_slots is not None,
+                                     self._memo_table(node.name))
+                function = self.cache.get(key)
+            record['cached'] = function is not None
+            if function is None:
+                function = self._translate_function(node)
+                if key is not None:
+                    self.cache.put(key, dict(function, instructions=[
+                        i.to_json() for i in function['instructions']]))
+            else:
+                function['instructions'] = [Instruction.from_json(i)
+                                            for i in function['instructions']]
+        record['instructions'] = len(function['instructions'])
+
+        self._func_info[node.name] = function['returns']
+        self.num_local_vars = function['local_bytes']
+        self.slicing_vars = self.slicing_vars.union(function['slicing_vars'])
+        self.array_names.update(function['array_names'])
+        self._runtime.update(function['runtime'])
+        if self.tail_recursion is not None:
+            self.tail_recursion.eliminated += function['tail_calls'][0]
+            self.tail_recursion.accumulated += function['tail_calls'][1]
+        self.frames.write(function['frames'])
+        self.frame_sizes.append((node.name, function['frame']))
+
+        # Labels were numbered from 0 when the function was translated
+        instructions = renumber(function['instructions'],
+                                {'loops': self._elem_id, 'ifs': self._if_id})
+        self._elem_id += function['loops']
+        self._if_id += function['ifs']
+
+        if function['light']:
+            # Placed after the program, nothing needs to branch around it
+            self._light_functions.add(node.name)
+            self._out_of_line += instructions
+            return
+
+        self.current_tl += 1
+
+        # ====================== Translation begins here ======================
+        self._record_instruction(Opcode.BR, f'tl_{self.current_tl}')
+        self._instructions += instructions
+        self._record_instruction(Opcode.NOP1, label=f'tl_{self.current_tl}')
+
+    def visit_TailEntry(self, node):
+        self._tail_label = f'tail_{self._identify()}'
+        self._block_head(node, 'tail call', self._tail_label)
+
+    def visit_TailJump(self, node):
+        # The parameters have been reassigned, start the body over
+        self._record_instruction(Opcode.BR, self._tail_label)
+
+    def visit_Return(self, node):
+        # Need to load value from an array element if return a subscript
+        if isinstance(node.value, ast.Subscript):
+            self._load_arr_val(node.value)
+        else:
+            self.visit(node.value)
+
+        if self._light:
+            # The value is returned in the accumulator
+            self._record_instruction(Opcode.RET)
+            return
+
+        # Store the return value to the accumulator
+        self._record_instruction(
+            Opcode.STWA, self.st.get_name('retVal'), 's')
+        if self._memo is not None:
+            self._memo_store()
+        self._stack_operation(self.num_local_vars)
+        self._record_instruction(Opcode.RET)
+
+    ##################
+    # Helper functions
+    ##################
+
+    def _translate_function(self, node):
+        '''
+            Translate a function on its own, returning its frame layout,
+            instructions (with loop and if labels numbered from 0) and what
+            the program needs to know about it
+        '''
         # Initialize another instance of GeneralizedProgram to visit the
         # current FunctionDef
         func_visitor = GeneralizedProgram(self.func_name)
         func_visitor._update_const(self.st)
         func_visitor.st.update_labels(self.st.get_labels())
 
-        # Initialize a functional variable extractor to extract
-        # all parameters, local variables, and return variables
-        var_extractor = FunctionVariableExtraction()
-        var_extractor.visit(node)
-        self.num_local_vars = sum(
-            [t[1] for t in var_extractor.results['local_var']])
-        self.slicing_vars = self.slicing_vars.union(var_extractor.slicing_vars)
-
-        # check whether the function has return
-        if var_extractor.results['return']:
-            self._func_info[node.name] = True
+        # Parameters, local variables and return of the function
+        func_info = self.info.functions[node.name]
+        tail_calls = [0, 0]
+        memo = self._memo_table(node.name)
+        if self.tail_recursion is not None and memo is None:
+            counts = (self.tail_recursion.eliminated,
+                      self.tail_recursion.accumulated)
+            node, hidden = self.tail_recursion.transform(node)
+            # The accumulator and temporaries get a slot in the frame
+            func_info = func_info._replace(local_vars=func_info.local_vars +
+                                           tuple((h, 2) for h in hidden))
+            tail_calls = [self.tail_recursion.eliminated - counts[0],
+                          self.tail_recursion.accumulated - counts[1]]
+            self.tail_recursion.eliminated, \
+                self.tail_recursion.accumulated = counts
+        unshared = sum([t[1] for t in func_info.local_vars])
+        if self.stack_slots is not None:
+            offsets, num_local_vars = self.stack_slots.assign(
+                node, func_info.local_vars)
         else:
-            self._func_info[node.name] = False
+            offsets, num_local_vars = sequential(func_info.local_vars)
+        returns = func_info.returns
+        light = self._is_light(node, func_info)
 
         # Update the new function visitor's attribute to match the
         # current (general) visitor
         func_visitor._func_info.update(self._func_info)
-        func_visitor.current_tl = self.current_tl
-        func_visitor._elem_id = self._elem_id
-        func_visitor._if_id = self._if_id
-        func_visitor.num_local_vars = self.num_local_vars
-        func_visitor.array_names = self.array_names
+        func_visitor._func_info[node.name] = returns
+        func_visitor._light_functions = set(self._light_functions)
+        func_visitor._light = light
+        func_visitor.num_local_vars = num_local_vars
+        func_visitor.array_names = set(self.array_names)
+        func_visitor.profile = self.profile
+        func_visitor._scope = node.name
+        if memo is not None:
+            # Entries are indexed by the parameter
+            func_visitor._memo = (*memo, func_info.params[0])
 
         # Output Pep9 code for local memory allocation
+        frames = io.StringIO()
         memory_alloc = DynamicMemoryAllocation(
-            var_extractor.results, func_visitor.st, node.name)
-        memory_alloc.generate()
+            func_info, func_visitor.st, node.name, light, offsets)
+        memory_alloc.generate(frames)
 
         func_visitor._in_function = True
-
-        self.current_tl += 1
-
-        # ======================= Translation begins here =======================
-        self._record_instruction(f'BR tl_{self.current_tl}')
-        func_visitor._stack_operation(self.num_local_vars, 1)
+        func_visitor._stack_operation(num_local_vars, 1)
+        if light and func_info.params:
+            # Spill the parameter passed in the accumulator
+            func_visitor._record_instruction(
+                Opcode.STWA, func_visitor.st.get_name(func_info.params[0]),
+                's')
+        # After the spill, the accumulator is free
+        func_visitor._count_block(node, 'entry')
+        if memo is not None:
+            func_visitor._memo_lookup()
 
         for contents in node.body:
             func_visitor.visit(contents)
 
-        if not self._func_info[node.name]:
-            func_visitor._stack_operation(self.num_local_vars)
-            func_visitor._record_instruction('RET')
+        if not returns:
+            func_visitor._stack_operation(num_local_vars)
+            func_visitor._record_instruction(Opcode.RET)
 
-        # Update the attributes of the general visitor to match the
-        # FunctionDef visitor
-        self._instructions += func_visitor._instructions
-        self._elem_id = func_visitor._elem_id
-        self._if_id = func_visitor._if_id
+        return {
+            'frames': frames.getvalue(),
+            'instructions': func_visitor._instructions,
+            'loops': func_visitor._elem_id,
+            'ifs': func_visitor._if_id,
+            'returns': returns,
+            'local_bytes': num_local_vars,
+            'slicing_vars': sorted(func_info.slicing_vars),
+            'array_names': sorted(
+                func_visitor.array_names - self.array_names),
+            'runtime': sorted(func_visitor._runtime),
+            'tail_calls': tail_calls,
+            'light': light,
+            # bytes of the locals, of the locals without slot sharing and
+            # of the whole frame (return address, parameters and return
+            # value included)
+            'frame': [num_local_vars, unshared,
+                      num_local_vars + 2 + 2 * len(func_info.params)
+                      + (2 if returns and not light else 0)],
+        }
 
-        self._record_instruction(
-            'NOP1', label=f'tl_{self.current_tl}')
+    def frame_report(self):
+        '''
+            Report lines, the stack bytes taken by every call of each
+            function
+        '''
+        lines = []
+        for name, (local_bytes, unshared, total) in self.frame_sizes:
+            shared = (f', {unshared} without slot sharing'
+                      if unshared != local_bytes else '')
+            lines.append(f'; frame {name}: {total} bytes, locals '
+                         f'{local_bytes}{shared}')
+        saved = sum(frame[1] - frame[0] for _, frame in self.frame_sizes)
+        return lines + [f'; frames {len(self.frame_sizes)} functions, '
+                        f'{saved} bytes saved by slot sharing']
 
-    def visit_Return(self, node):
-        # Need to load value from an array element if return a subscript
-        if isinstance(node.value, ast.Subscript):
-            self._load_arr_val(node.value)
-        else:
-            self.visit(node.value)
+    def _memo_table(self, name):
+        if self.memoizer is None:
+            return None
+        return self.memoizer.tables.get(name)
 
-        # Store the return value to the accumulator
+    def _memo_lookup(self):
+        '''
+            Return the value recorded for the argument, if there is one
+        '''
+        values, flags = self._memo[:2]
+        miss = f'memo_{self._identify()}'
+        self._memo_index(miss)
+        self._record_instruction(Opcode.LDWA, flags, 'x')
+        self._record_instruction(Opcode.BREQ, miss)
+        self._record_instruction(Opcode.LDWA, values, 'x')
         self._record_instruction(
-            f'STWA {self.st.get_name("retVal")},s')
+            Opcode.STWA, self.st.get_name('retVal'), 's')
         self._stack_operation(self.num_local_vars)
-        self._record_instruction('RET')
+        self._record_instruction(Opcode.RET)
+        self._record_instruction(Opcode.NOP1, label=miss)
 
-    ##################
-    # Helper functions
-    ##################
+    def _memo_store(self):
+        '''
+            Record the value returned (still in the accumulator) for the
+            argument
+        '''
+        values, flags = self._memo[:2]
+        done = f'memo_{self._identify()}'
+        self._memo_index(done)
+        self._record_instruction(Opcode.STWA, values, 'x')
+        self._record_instruction(Opcode.LDWA, 1, 'i')
+        self._record_instruction(Opcode.STWA, flags, 'x')
+        self._record_instruction(Opcode.NOP1, label=done)
+
+    def _memo_index(self, outside):
+        '''
+            Load the offset of the argument's entry in the index register,
+            branching to outside for an argument out of the tables. The
+            unsigned comparison sends negative arguments there as well
+        '''
+        _, _, entries, param = self._memo
+        self._record_instruction(Opcode.LDWX, self.st.get_name(param), 's')
+        self._record_instruction(Opcode.CPWX, entries, 'i')
+        self._record_instruction(Opcode.BRC, outside)
+        self._record_instruction(Opcode.ASLX)
+
+    def _is_light(self, node, func_info):
+        '''
+            Whether the function can use the light calling convention: its
+            parameter (if any) is passed and spilled below the return
+            address, and the result is returned in the accumulator. Leaf
+            functions without locals only, as nothing may push onto the
+            stack while the parameter lives there, and no runtime routine
+            may be called
+        '''
+        if func_info.local_vars or len(func_info.params) > 1:
+            return False
+        for n in ast.walk(node):
+            if (isinstance(n, ast.Call) and isinstance(n.func, ast.Name)
+                    and (n.func.id in self._func_info
+                         or n.func.id == node.name)):
+                return False
+            if isinstance(n, ast.BinOp) and (
+                    isinstance(n.op, ast.Mult) and _log2(n.left) is None
+                    and _log2(n.right) is None
+                    or isinstance(n.op, (ast.FloorDiv, ast.Mod))
+                    and _log2(n.right) is None):
+                return False
+        return True
+
+    def _function_context(self, node):
+        '''
+            The part of the global symbol context the translation of a
+            function may depend on
+        '''
+        names = {n.id for n in ast.walk(node) if isinstance(n, ast.Name)}
+        names.add(node.name)
+        labels = self.st.get_labels()
+        constants = {}
+        for const in self.st.identify_const():
+            constants.update(const)
+        # Array names are looked up by their Python or converted name, and
+        # locals are converted to f_name[:2]_name (with a possible suffix)
+        prefixes = set()
+        for name in names:
+            prefixes.update({name[:7], constants.get(name, name)[:7],
+                             f'{self.func_name[:2]}_{name[:4]}',
+                             f'{self.func_name[:2]}_{name[-5:-1]}'})
+        return {
+            'label': self.func_name,
+            'constants': {n: constants[n] for n in names if n in constants},
+            'labels': {n: labels[n] for n in names if n in labels},
+            'returns': {n: self._func_info[n] for n in names
+                        if n in self._func_info},
+            'light': sorted(n for n in names if n in self._light_functions),
+            'arrays': sorted(a for a in self.array_names
+                             if a in names or a[:7] in prefixes),
+        }
 
     def _stack_operation(self, byte: int, op: int = 0):
         # push and pop bytes from the stack
@@ -103,9 +351,9 @@ class GeneralizedProgram(TopLevelProgram):
         if not byte:
             return
         if op:
-            self._record_instruction(f'SUBSP {byte},i')
+            self._record_instruction(Opcode.SUBSP, byte, 'i')
             return
-        self._record_instruction(f'ADDSP {byte},i')
+        self._record_instruction(Opcode.ADDSP, byte, 'i')
 
     def _update_const(self, st):
         # Extract all constant variables
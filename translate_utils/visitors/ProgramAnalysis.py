@@ -0,0 +1,244 @@
+import ast
+from collections import namedtuple
+from types import MappingProxyType
+
+# What the code generators need to know about a function.
+# local_vars: ((name, size in bytes), ...) in order of first assignment
+FunctionInfo = namedtuple(
+    'FunctionInfo', ['local_vars', 'params', 'returns', 'slicing_vars'])
+
+# Frame bytes of a local array whose length is not known
+DEFAULT_ARRAY_BYTES = 200
+
+# Result of the analysis, shared read-only by the translation passes.
+# globals: {var_name: ('const', 42) | ('val', 10) | ('arr', bytes) | 'other'}
+# functions: {function name: FunctionInfo}
+# slicing_vars: global variables used as array indices
+# array_names: Python names of every (global or local) array
+ProgramInfo = namedtuple(
+    'ProgramInfo', ['globals', 'functions', 'slicing_vars', 'array_names'])
+
+
+class ProgramAnalysis():
+    """
+        Collects in a single walk over the statements of a module what the
+        translation needs: global variables, then the locals, parameters,
+        return and array indices of every function. Statements are
+        dispatched on their type through a table, expressions are not
+        visited
+    """
+
+    def __init__(self) -> None:
+        self.__dispatch = {
+            ast.Assign: self._assign,
+            ast.While: self._block,
+            ast.If: self._block,
+            ast.Return: self._return,
+            ast.FunctionDef: self._function_def,
+        }
+
+    def analyze(self, root_node) -> ProgramInfo:
+        self.__globals = {}
+        self.__slicing_vars = set()
+        self.__functions = {}
+        self.__arrays = set()
+        self.__function = None      # scope of the function being analyzed
+        self.__nesting = 0          # depth of the while/if being analyzed
+        # (function, array, parameter index) of the local arrays whose
+        # length is a parameter
+        self.__sized_by = []
+        self._statements(root_node.body)
+        if self.__sized_by:
+            self._array_lengths(root_node)
+        return ProgramInfo(MappingProxyType(self.__globals),
+                           MappingProxyType(self.__functions),
+                           frozenset(self.__slicing_vars),
+                           frozenset(self.__arrays))
+
+    ####
+    # Statements
+    ####
+
+    def _statements(self, statements):
+        dispatch = self.__dispatch
+        for statement in statements:
+            handler = dispatch.get(type(statement))
+            if handler is not None:
+                handler(statement)
+
+    def _block(self, node):
+        self.__nesting += 1
+        self._statements(node.body)
+        self._statements(node.orelse)
+        self.__nesting -= 1
+
+    def _assign(self, node):
+        if len(node.targets) != 1:
+            raise ValueError("Only unary assignments are supported")
+        target = node.targets[0]
+        scope = self.__function
+        if isinstance(target, ast.Subscript):
+            # Array indices are kept in the index register
+            (self.__slicing_vars if scope is None
+             else scope['slicing_vars']).add(target.slice.id)
+            return
+        var_name = target.id
+        if var_name[-1] == '_':
+            self.__arrays.add(var_name)
+        if scope is None:
+            self._global_assign(var_name, node.value)
+        else:
+            self._local_assign(scope, var_name, node.value)
+
+    def _global_assign(self, var_name, value):
+        if var_name in self.__globals:
+            return
+        if var_name[0] == '_' and var_name[1:].isupper():
+            self.__globals[var_name] = ('const', value.value)
+        elif isinstance(value, ast.Constant) and not self.__nesting:
+            # Only an assignment executed exactly once, at the module level,
+            # can become the initial value of the variable
+            self.__globals[var_name] = ('val', value.value)
+        elif var_name[-1] == '_':
+            self.__globals[var_name] = ('arr', value.right.value * 2)
+        else:
+            self.__globals[var_name] = 'other'
+
+    def _local_assign(self, scope, var_name, value):
+        if var_name in scope['locals'] or var_name in scope['params']:
+            return
+        if var_name[-1] != '_':
+            # Normal variables have a size of 2 bytes
+            length = 2
+        elif isinstance(value.right, ast.Constant):
+            length = value.right.value * 2
+        else:
+            # Arrays of variable length get 200 bytes, unless the length is
+            # a parameter bounded at every call (see _array_lengths)
+            length = DEFAULT_ARRAY_BYTES
+            if (isinstance(value.right, ast.Name)
+                    and value.right.id in scope['params']):
+                self.__sized_by.append((
+                    scope['name'], var_name,
+                    scope['params'].index(value.right.id)))
+        scope['locals'][var_name] = length
+
+    def _return(self, node):
+        if self.__function is not None:
+            self.__function['returns'] = True
+
+    def _function_def(self, node):
+        if self.__function is not None:
+            raise ValueError(
+                f'Nested function definitions are not supported: {node.name}')
+        arguments = node.args
+        self.__function = {
+            'name': node.name,
+            'locals': {},
+            'params': tuple(arg.arg for arg in arguments.posonlyargs +
+                            arguments.args + arguments.kwonlyargs),
+            'returns': False,
+            'slicing_vars': set(),
+        }
+        nesting, self.__nesting = self.__nesting, 0
+        self._statements(node.body)
+        self.__nesting = nesting
+        scope, self.__function = self.__function, None
+        self.__functions[node.name] = FunctionInfo(
+            tuple(scope['locals'].items()), scope['params'],
+            scope['returns'], frozenset(scope['slicing_vars']))
+
+    ####
+    # Array lengths
+    ####
+
+    def _array_lengths(self, root_node):
+        '''
+            Size the local arrays created with [0] * param from the largest
+            value the parameter can take. A variable is bounded when every
+            value it receives (the arguments of every call for a parameter,
+            every assigned value for a local) is a constant, a bounded
+            variable, or a bounded variable minus a constant, as when a
+            recursion counts down. A parameter assigned in its function and
+            a global bound nothing
+        '''
+        calls = {}          # function -> [(caller or None, call), ...]
+        assigned = {}       # function -> {local: [assigned values]}
+        for statement in root_node.body:
+            caller = None
+            if isinstance(statement, ast.FunctionDef):
+                caller = statement.name
+                assigned[caller] = values = {}
+                for n in ast.walk(statement):
+                    if (isinstance(n, ast.Assign)
+                            and isinstance(n.targets[0], ast.Name)):
+                        values.setdefault(n.targets[0].id, []).append(
+                            n.value)
+            for n in ast.walk(statement):
+                if isinstance(n, ast.Call) and isinstance(n.func, ast.Name):
+                    calls.setdefault(n.func.id, []).append((caller, n))
+
+        bounds = {}
+
+        def bound(key, visiting):
+            '''
+                Largest value of a ('param', function, index) or ('local',
+                function, name) variable, None if unbounded. Going around a
+                cycle only subtracts, it adds no value to those entering it
+            '''
+            if key in bounds:
+                return bounds[key]
+            if key in visiting:
+                return -1
+            kind, function, variable = key
+            if kind == 'param':
+                params = self.__functions[function].params
+                if params[variable] in assigned.get(function, {}):
+                    return None
+                sources = []
+                for caller, call in calls.get(function, ()):
+                    if call.keywords or len(call.args) != len(params):
+                        return None
+                    sources.append((call.args[variable], caller))
+            else:
+                sources = [(value, function)
+                           for value in assigned[function][variable]]
+            visiting.add(key)
+            largest = -1
+            for node, scope in sources:
+                value = evaluate(node, scope, visiting)
+                if value is None:
+                    largest = None
+                    break
+                largest = max(largest, value)
+            visiting.discard(key)
+            if not visiting:
+                # Only a result computed outside of any cycle is final
+                bounds[key] = largest
+            return largest
+
+        def evaluate(node, scope, visiting):
+            if (isinstance(node, ast.BinOp) and isinstance(node.op, ast.Sub)
+                    and isinstance(node.right, ast.Constant)
+                    and node.right.value >= 0):
+                node = node.left
+            if isinstance(node, ast.Constant) and isinstance(node.value, int):
+                return node.value
+            if scope is None or not isinstance(node, ast.Name):
+                return None
+            params = self.__functions[scope].params
+            if node.id in params:
+                return bound(('param', scope, params.index(node.id)),
+                             visiting)
+            if node.id in assigned[scope]:
+                return bound(('local', scope, node.id), visiting)
+            return None
+
+        for function, array, index in self.__sized_by:
+            value = bound(('param', function, index), set())
+            if value is None:
+                continue
+            info = self.__functions[function]
+            self.__functions[function] = info._replace(local_vars=tuple(
+                (name, max(value, 0) * 2 if name == array else size)
+                for name, size in info.local_vars))
@@ -1,7 +1,7 @@
 import ast
 from ..utils.symbol_table import SymbolTable as st
-
-LabeledInstruction = tuple[str, str]
+from ..utils.ir import Instruction, Opcode
+from ..generators.RuntimeLibrary import RuntimeLibrary
 
 
 class TopLevelProgram(ast.NodeVisitor):
@@ -12,7 +12,7 @@ class TopLevelProgram(ast.NodeVisitor):
         self.st = st()     # symbol tables
         self.entry_point = entry_point
         self._instructions = list()
-        self._record_instruction('NOP1', label=entry_point)
+        self._record_instruction(Opcode.NOP1, label=entry_point)
         self._should_save = True
         self._current_variable = None
         self._modify_index = False      # if the visitor is modifying an array index
@@ -22,9 +22,25 @@ class TopLevelProgram(ast.NodeVisitor):
         self._func_info = {}            # if each function has a return value
         self.slicing_vars = set()       # stores variables that are array indices
         self.array_names = set()        # stores names of arrays
+        self._runtime = set()           # runtime routines called so far
+        self._light_functions = set()   # functions taking their parameter
+                                        # and returning their value in A
+        self._out_of_line = []          # functions placed after the program
+        self._discard_result = False    # if the value of a call is unused
+        self.profile = None             # BlockProfile numbering the block
+                                        # counters, None when not profiling
+        self._scope = '<module>'        # function whose blocks are counted
 
     def finalize(self):
-        self._instructions.append((None, '.END'))
+        counters = self.profile.table() if self.profile is not None else []
+        if self._runtime or self._out_of_line or counters:
+            # Functions, routines and counters follow the program, which
+            # must not run into them
+            self._record_instruction(Opcode.STOP)
+            self._instructions += self._out_of_line
+            self._instructions += RuntimeLibrary(self._runtime).generate()
+            self._instructions += counters
+        self._record_instruction(Opcode.END)
         return self._instructions
 
     ####
@@ -40,7 +56,7 @@ class TopLevelProgram(ast.NodeVisitor):
             # Load the index to the index register
             addressing_mode = self._identify_addressing_mode(slicer)
             self._record_instruction(
-                f'LDWX {self.st.get_name(slicer)},{addressing_mode}')
+                Opcode.LDWX, self.st.get_name(slicer), addressing_mode)
             # Add instruction 'ASLX' if accessing the array
             self.visit(node.targets[0])
         else:
@@ -73,10 +89,10 @@ class TopLevelProgram(ast.NodeVisitor):
                 # Store the value to the index register
                 # if assigning value to index
                 self._record_instruction(
-                    f'STWX {self._current_variable},{addressing_mode}')
+                    Opcode.STWX, self._current_variable, addressing_mode)
             else:
                 self._record_instruction(
-                    f'STWA {self._current_variable},{addressing_mode}')
+                    Opcode.STWA, self._current_variable, addressing_mode)
         else:
             self._should_save = True
 
@@ -85,25 +101,34 @@ class TopLevelProgram(ast.NodeVisitor):
 
     def visit_Constant(self, node):
         if self._modify_index:
-            self._record_instruction(f'LDWX {node.value},i')
+            self._record_instruction(Opcode.LDWX, node.value, 'i')
         else:
-            self._record_instruction(f'LDWA {node.value},i')
+            self._record_instruction(Opcode.LDWA, node.value, 'i')
 
     def visit_Name(self, node):
         var_name = node.id
         addressing_mode = self._identify_addressing_mode(var_name)
         self._record_instruction(
-            f'LDWA {self.st.get_name(node.id)},{addressing_mode}')
+            Opcode.LDWA, self.st.get_name(node.id), addressing_mode)
 
     def visit_BinOp(self, node):
-        self._access_memory(node.left, 'LDWA')
+        if isinstance(node.op, (ast.Mult, ast.FloorDiv, ast.Mod)):
+            self._multiplicative(node)
+            return
+        self._access_memory(node.left, Opcode.LDWA)
         if isinstance(node.op, ast.Add):
-            self._access_memory(node.right, 'ADDA')
+            self._access_memory(node.right, Opcode.ADDA)
         elif isinstance(node.op, ast.Sub):
-            self._access_memory(node.right, 'SUBA')
+            self._access_memory(node.right, Opcode.SUBA)
         else:
             raise ValueError(f'Unsupported binary operator: {node.op}')
 
+    def visit_Expr(self, node):
+        # A call whose value is not used pops its return slot unread
+        self._discard_result = True
+        self.visit(node.value)
+        self._discard_result = False
+
     def visit_Call(self, node):
         match node.func.id:
             case 'int':
@@ -113,61 +138,71 @@ class TopLevelProgram(ast.NodeVisitor):
                 # We are only supporting integers for now
                 if self._in_function:
                     self._record_instruction(
-                        f'DECI {self._current_variable},s')
+                        Opcode.DECI, self._current_variable, 's')
                 else:
                     self._record_instruction(
-                        f'DECI {self._current_variable},d')
+                        Opcode.DECI, self._current_variable, 'd')
                 self._should_save = False  # DECI already save the value in memory
             case 'print':
                 # loading for printing an array element
                 if isinstance(node.args[0], ast.Subscript):
                     slicer = self.st.get_name(node.args[0].slice.id)
                     s_mode = self._identify_addressing_mode(slicer)
-                    self._record_instruction(f'LDWX {slicer},{s_mode}')
-                    self._record_instruction('ASLX')
+                    self._record_instruction(Opcode.LDWX, slicer, s_mode)
+                    self._record_instruction(Opcode.ASLX)
                     var_name = self.st.get_name(node.args[0].value.id)
                 else:
                     # We are only supporting integers for now
                     var_name = self.st.get_name(node.args[0].id)
                 addressing_mode = self._identify_addressing_mode(var_name)
-                self._record_instruction(f'DECO {var_name},{addressing_mode}')
+                self._record_instruction(
+                    Opcode.DECO, var_name, addressing_mode)
             case 'exit':
-                self._record_instruction('STOP')
+                self._record_instruction(Opcode.STOP)
             case _:
                 # Raise an error if the called function is not defined
                 if node.func.id not in self._func_info:
                     raise ValueError(
                         f'Unsupported function call: {node.func.id}')
-                has_return = self._func_info[node.func.id]
                 params = node.args
+                if node.func.id in self._light_functions:
+                    # Light convention: parameter and result in A
+                    if params:
+                        self._load_operand(params[0], Opcode.LDWA)
+                    self._record_instruction(
+                        Opcode.CALL, self.st.get_label(node.func.id))
+                    return
+                has_return = self._func_info[node.func.id]
                 # Calculate the required space on the stack
                 required_bytes = (len(params) + has_return) * 2
 
                 # Load required parameters and store them onto the stack
                 for i, param in enumerate(params):
-                    self._access_memory(param, 'LDWA')
+                    self._access_memory(param, Opcode.LDWA)
                     if not isinstance(param, ast.Constant) and param.id in self.slicing_vars:
                         self._record_instruction(
-                            f'STWX {-(required_bytes - i*2)},s')
+                            Opcode.STWX, -(required_bytes - i*2), 's')
                     else:
                         self._record_instruction(
-                            f'STWA {-(required_bytes - i*2)},s')
+                            Opcode.STWA, -(required_bytes - i*2), 's')
 
                 # Push parameters and return values to the stack
-                self._record_instruction(f'SUBSP {required_bytes},i')
+                self._record_instruction(Opcode.SUBSP, required_bytes, 'i')
 
                 # Call the function
                 self._record_instruction(
-                    f'CALL {self.st.get_label(node.func.id)}')
+                    Opcode.CALL, self.st.get_label(node.func.id))
 
                 # Extract the returned value from the function if it has one
-                if has_return:
-                    self._record_instruction(f'ADDSP {required_bytes - 2},i')
-                    self._record_instruction('LDWA 0,s')
+                if has_return and not self._discard_result:
+                    self._record_instruction(
+                        Opcode.ADDSP, required_bytes - 2, 'i')
+                    self._record_instruction(Opcode.LDWA, 0, 's')
                     # Pop from the stack
-                    self._record_instruction('ADDSP 2,i')
+                    self._record_instruction(Opcode.ADDSP, 2, 'i')
                 else:
-                    self._record_instruction(f'ADDSP {required_bytes},i')
+                    self._record_instruction(
+                        Opcode.ADDSP, required_bytes, 'i')
 
     ####
     # Handling While loops (only variable OP variable)
@@ -175,38 +210,43 @@ class TopLevelProgram(ast.NodeVisitor):
 
     def visit_While(self, node):
         loop_id = self._identify()
-        inverted = {
-            ast.Lt:  'BRGE',  # '<'  in the code means we branch if '>='
-            ast.LtE: 'BRGT',  # '<=' in the code means we branch if '>'
-            ast.Gt:  'BRLE',  # '>'  in the code means we branch if '<='
-            ast.GtE: 'BRLT',  # '>=' in the code means we branch if '<'
-            ast.NotEq: 'BREQ',  # '!=' in the code means we branch if '=='
-            ast.Eq: 'BRNE',  # '==' in the code means we branch if '!='
+        branch = {
+            ast.Lt:  Opcode.BRLT,
+            ast.LtE: Opcode.BRLE,
+            ast.Gt:  Opcode.BRGT,
+            ast.GtE: Opcode.BRGE,
+            ast.NotEq: Opcode.BRNE,
+            ast.Eq: Opcode.BREQ,
         }
+        # The test is laid out after the body: the loop is entered by a
+        # branch to the test, then every iteration ends with a single
+        # branch taken back to the body while the condition holds
+        self._record_instruction(Opcode.BR, f'test_{loop_id}')
+        self._record_instruction(Opcode.NOP1, label=f'body_{loop_id}')
+        # Visiting the body of the loop
+        for contents in node.body:
+            self.visit(contents)
+
+        label = self._count_block(node, 'loop test', f'test_{loop_id}')
         # left part can only be a variable
         # loading an array element
         if isinstance(node.test.left, ast.Subscript):
-            self._load_arr_val(node.test.left, f'test_{loop_id}')
+            self._load_arr_val(node.test.left, label)
         else:
-            self._access_memory(node.test.left, 'LDWA',
-                                label=f'test_{loop_id}')
+            self._access_memory(node.test.left, Opcode.LDWA, label=label)
 
         # loading from index register if the variable is used as the array's index
         if node.test.left.id in self.slicing_vars:
-            self._access_memory(node.test.comparators[0], 'CPWX')
+            self._access_memory(node.test.comparators[0], Opcode.CPWX)
         else:
             # right part can only be a variable
-            self._access_memory(node.test.comparators[0], 'CPWA')
+            self._access_memory(node.test.comparators[0], Opcode.CPWA)
 
-        # Branching is condition is not true (thus, inverted)
+        # Branching back if the condition is true
         self._record_instruction(
-            f'{inverted[type(node.test.ops[0])]} end_l_{loop_id}')
-        # Visiting the body of the loop
-        for contents in node.body:
-            self.visit(contents)
-        self._record_instruction(f'BR test_{loop_id}')
+            branch[type(node.test.ops[0])], f'body_{loop_id}')
         # Sentinel marker for the end of the loop
-        self._record_instruction(f'NOP1', label=f'end_l_{loop_id}')
+        self._record_instruction(Opcode.NOP1, label=f'end_l_{loop_id}')
 
     ####
     # Handling Conditional Statements (only variable OP variable)
@@ -215,59 +255,60 @@ class TopLevelProgram(ast.NodeVisitor):
     def visit_If(self, node):
         if_id = self._identify_if()
         inverted = {
-            ast.Lt:  'BRGE',  # '<'  in the code means we branch if '>='
-            ast.LtE: 'BRGT',  # '<=' in the code means we branch if '>'
-            ast.Gt:  'BRLE',  # '>'  in the code means we branch if '<='
-            ast.GtE: 'BRLT',  # '>=' in the code means we branch if '<'
-            ast.NotEq: 'BREQ',  # '!=' in the code means we branch if '=='
-            ast.Eq: 'BRNE'  # '==' in the code means we branch if '!='
+            ast.Lt:  Opcode.BRGE,  # '<'  in the code means we branch if '>='
+            ast.LtE: Opcode.BRGT,  # '<=' in the code means we branch if '>'
+            ast.Gt:  Opcode.BRLE,  # '>'  in the code means we branch if '<='
+            ast.GtE: Opcode.BRLT,  # '>=' in the code means we branch if '<'
+            ast.NotEq: Opcode.BREQ,  # '!=' in the code means we branch if '=='
+            ast.Eq: Opcode.BRNE  # '==' in the code means we branch if '!='
         }
+        label = self._count_block(node, 'if', f'if_{if_id}')
         # Load the variable that is being compared
         # loading an array element
         if isinstance(node.test.left, ast.Subscript):
             var_name = node.test.left.value.id
-            self._load_arr_val(node.test.left, f'if_{if_id}')
+            self._load_arr_val(node.test.left, label)
         else:
             var_name = node.test.left.id
-            self._access_memory(node.test.left, 'LDWA', label=f'if_{if_id}')
+            self._access_memory(node.test.left, Opcode.LDWA, label=label)
 
         # Compare in the index register if the variable is an array index
         if var_name in self.slicing_vars:
-            self._access_memory(node.test.comparators[0], 'CPWX')
+            self._access_memory(node.test.comparators[0], Opcode.CPWX)
         else:
-            self._access_memory(node.test.comparators[0], 'CPWA')
+            self._access_memory(node.test.comparators[0], Opcode.CPWA)
 
         # Record appropriate branching instruction if the if-statement has
         # else or elif
         if node.orelse:
             self._record_instruction(
-                f'{inverted[type(node.test.ops[0])]} else_{if_id}')
+                inverted[type(node.test.ops[0])], f'else_{if_id}')
         else:
             self._record_instruction(
-                f'{inverted[type(node.test.ops[0])]} end_if_{if_id}')
+                inverted[type(node.test.ops[0])], f'end_if_{if_id}')
 
         # Visit contents in the body of if
         for contents in node.body:
             self.visit(contents)
 
         # Branch to the end-if state
-        self._record_instruction(f'BR end_if_{if_id}')
+        self._record_instruction(Opcode.BR, f'end_if_{if_id}')
 
         # Visite contents in the body of else or elif
         if node.orelse:
-            self._record_instruction('NOP1', label=f'else_{if_id}')
+            self._block_head(node, 'else', f'else_{if_id}')
+            # Falls through to the end-if state
             for contents in node.orelse:
                 self.visit(contents)
-            self._record_instruction(f'BR end_if_{if_id}')
 
-        self._record_instruction(f'NOP1', label=f'end_if_{if_id}')
+        self._block_head(node, 'end if', f'end_if_{if_id}')
 
     ####
     # Handling Array Slicing
     ####
 
     def visit_Subscript(self, node):
-        self._record_instruction('ASLX')
+        self._record_instruction(Opcode.ASLX)
 
     ####
     # Not handling function calls
@@ -281,21 +322,97 @@ class TopLevelProgram(ast.NodeVisitor):
     # Helper functions to
     ####
 
-    def _record_instruction(self, instruction, label=None):
-        self._instructions.append((label, instruction))
+    def _record_instruction(self, opcode, operand=None, mode=None,
+                            label=None):
+        self._instructions.append(Instruction(opcode, operand, mode, label))
 
-    def _access_memory(self, node, instruction, label=None):
+    def _count_block(self, node, kind, label=None):
+        '''
+            In profile mode, increment the counter of the basic block
+            starting here (blocks are reported at the line of the statement
+            creating them). The increment takes the label of the block and
+            only uses the accumulator, dead at every block head. Returns the
+            label left for the first instruction of the block
+        '''
+        if self.profile is None:
+            return label
+        counter = self.profile.counter(self._scope, node.lineno, kind)
+        self._record_instruction(Opcode.LDWA, counter, 'd', label)
+        self._record_instruction(Opcode.ADDA, 1, 'i')
+        self._record_instruction(Opcode.STWA, counter, 'd')
+        return None
+
+    def _block_head(self, node, kind, label):
+        # Sentinel marker of a block, unless its counter holds the label
+        label = self._count_block(node, kind, label)
+        if label is not None:
+            self._record_instruction(Opcode.NOP1, label=label)
+
+    def _access_memory(self, node, opcode, label=None):
         if isinstance(node, ast.Constant):
             # Extract the value as an immediate if we encounter an ast.Constant instance
-            instruction = self._identify_ldst(node.value, instruction)
-            self._record_instruction(f'{instruction} {node.value},i', label)
+            opcode = self._identify_ldst(node.value, opcode)
+            self._record_instruction(opcode, node.value, 'i', label)
         else:
             # instructions could be LDWA/LDWX, STWA/STWX, etc.
-            instruction = self._identify_ldst(node.id, instruction)
+            opcode = self._identify_ldst(node.id, opcode)
             # identify the addressing mode based on current variable and current visitor state
             addressing_mode = self._identify_addressing_mode(node.id)
             self._record_instruction(
-                f'{instruction} {self.st.get_name(node.id)},{addressing_mode}', label)
+                opcode, self.st.get_name(node.id), addressing_mode, label)
+
+    def _load_operand(self, node, opcode):
+        '''
+            Load a variable or a constant without redirecting it to the index
+            register
+        '''
+        if isinstance(node, ast.Constant):
+            self._record_instruction(opcode, node.value, 'i')
+        else:
+            addressing_mode = self._identify_addressing_mode(node.id)
+            self._record_instruction(
+                opcode, self.st.get_name(node.id), addressing_mode)
+
+    def _multiplicative(self, node):
+        '''
+            *, // and % by a constant power of two become shifts and masks,
+            the general case calls a runtime routine
+        '''
+        op = type(node.op)
+        left, right = node.left, node.right
+        if op is ast.Mult and _log2(right) is None and _log2(left) is not None:
+            left, right = right, left
+        register = 'X' if self._modify_index else 'A'
+
+        shift = _log2(right)
+        if shift is not None:
+            self._load_operand(left, Opcode['LDW' + register])
+            if op is ast.Mod:
+                self._record_instruction(
+                    Opcode['AND' + register], right.value - 1, 'i')
+            else:
+                shift_op = Opcode[('ASL' if op is ast.Mult else 'ASR')
+                                  + register]
+                for _ in range(shift):
+                    self._record_instruction(shift_op)
+            return
+
+        routine = RuntimeLibrary.MULTIPLY if op is ast.Mult \
+            else RuntimeLibrary.DIVIDE
+        self._runtime.add(routine)
+        # The right operand is passed on the stack, the left one in A
+        self._load_operand(right, Opcode.LDWA)
+        self._record_instruction(Opcode.STWA, -2, 's')
+        self._load_operand(left, Opcode.LDWA)
+        self._record_instruction(Opcode.SUBSP, 2, 'i')
+        self._record_instruction(Opcode.CALL, routine)
+        if op is ast.Mod:
+            # The remainder is left in the argument
+            self._record_instruction(Opcode.LDWA, 0, 's')
+        self._record_instruction(Opcode.ADDSP, 2, 'i')
+        if self._modify_index:
+            self._record_instruction(Opcode.STWA, -2, 's')
+            self._record_instruction(Opcode.LDWX, -2, 's')
 
     def _identify(self):
         result = self._elem_id
@@ -311,7 +428,7 @@ class TopLevelProgram(ast.NodeVisitor):
         '''
             identify the appropriate addressing mode for the given variable
         '''
-        if self._in_function and TopLevelProgram._check_constant(var_name):
+        if TopLevelProgram._check_constant(var_name):
             return 'i'
         # current variable is for an array and it is local
         elif self._in_function and var_name in self.array_names and var_name[2] == '_':
@@ -323,12 +440,12 @@ class TopLevelProgram(ast.NodeVisitor):
         else:
             return 'd'
 
-    def _identify_ldst(self, var_name: str, instruction: str):
+    def _identify_ldst(self, var_name: str, opcode):
         if var_name in self.slicing_vars or self._modify_index:
             # Perform all operations involving an array index in the index register
-            return instruction[:-1] + 'X'
+            return Opcode[opcode.name[:-1] + 'X']
         else:
-            return instruction
+            return opcode
 
     def _load_arr_val(self, node, id=''):
         '''
@@ -338,16 +455,11 @@ class TopLevelProgram(ast.NodeVisitor):
         slicing_var = self.st.get_name(node.slice.id)
         s_addressing_mode = self._identify_addressing_mode(slicing_var)
         v_addressing_mode = self._identify_addressing_mode(var_name)
-        if id:
-            self._record_instruction(
-                f'LDWX {slicing_var},{s_addressing_mode}', id)
-        else:
-            self._record_instruction(
-                f'LDWX {slicing_var},{s_addressing_mode}')
+        self._record_instruction(
+            Opcode.LDWX, slicing_var, s_addressing_mode, id or None)
         # ASLX
         self.visit_Subscript(node)
-        self._record_instruction(
-            f'LDWA {var_name},{v_addressing_mode}')
+        self._record_instruction(Opcode.LDWA, var_name, v_addressing_mode)
 
     @staticmethod
     def _check_constant(var_name: str) -> bool:
@@ -355,3 +467,15 @@ class TopLevelProgram(ast.NodeVisitor):
         if len(var_name) == 1:
             return False
         return var_name[0] == '_' and var_name[1].isupper()
+
+
+def _log2(node):
+    '''
+        k if the node is the constant 2**k, None otherwise
+    '''
+    if not isinstance(node, ast.Constant) or type(node.value) is not int:
+        return None
+    value = node.value
+    if value <= 0 or value & (value - 1):
+        return None
+    return value.bit_length() - 1
@@ -1,21 +1,71 @@
 import argparse
 import ast
-from translate_utils.visitors.GlobalVariables import GlobalVariableExtraction
-from translate_utils.visitors.TopLevelProgram import TopLevelProgram
-from translate_utils.visitors.GeneralizedProgram import GeneralizedProgram
-from translate_utils.generators.StaticMemoryAllocation import StaticMemoryAllocation
-from translate_utils.generators.EntryPoint import EntryPoint
+import contextlib
+import glob
+import io
+import json
+import os
+import signal
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+# process is re-exported so that translator.process keeps working for scripts
+from translate_utils.pipeline import (  # noqa: F401
+    process, translate, translate_to)
+from translate_utils.optimizers.Inliner import DEFAULT_BUDGET
+from translate_utils.optimizers.Memoize import DEFAULT_ENTRIES
+from translate_utils.optimizers.PartialEvaluation import DEFAULT_STEPS
+from translate_utils.optimizers.Peephole import PeepholeOptimizer
+from translate_utils.utils.block_profile import BlockProfile
+from translate_utils.utils.cache import DEFAULT_MAX_BYTES, TranslationCache
+from translate_utils.utils.timings import PhaseTimings
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache',
+                                 'rbs-translator')
+# Bounds of a request handled in serve mode
+DEFAULT_REQUEST_TIMEOUT = 10.0
+DEFAULT_WORKER_MEMORY = 1024
+MAX_REQUEST_BYTES = 4 * 1024 * 1024
+# Pipeline options a request may set, the others are sinks and objects
+# owned by the server
+REQUEST_OPTIONS = ('fold', 'peephole', 'track_registers', 'evaluate',
+                   'evaluate_budget', 'inline', 'inline_budget', 'hoist',
+                   'dead_code', 'tail_calls', 'share_slots', 'memoize',
+                   'object')
 
 
 def main():
-    input_file, print_ast = process_cli()
-    with open(input_file) as f:
-        source = f.read()
-    node = ast.parse(source)
-    if print_ast:
-        print(ast.dump(node, indent=2))
-    else:
-        process(input_file, node)
+    args = process_cli()
+    options = translation_options(args)
+    if args['serve']:
+        sys.exit(serve(options, args['jobs'], args['socket'],
+                       args['request_timeout'], args['worker_memory']))
+    if args['batch']:
+        def run(paths):
+            return translate_batch(paths, args['out_dir'], args['jobs'],
+                                   options, args['report'], args['profile'],
+                                   args['timings'], args['listing'])
+        if args['watch']:
+            watch(args['batch'], run)
+        sys.exit(run(args['batch']))
+
+    input_file = args['f']
+    if args['ast_only']:
+        with open(input_file) as f:
+            print(ast.dump(ast.parse(f.read()), indent=2))
+        return
+    if args['report']:
+        options['report'] = sys.stderr
+    if args['profile']:
+        options['profile'] = BlockProfile()
+    if args['watch']:
+        watch([input_file], lambda paths: _translate_stdout(
+            paths[0], options, args['timings'], args['listing']))
+    _translate_stdout(input_file, options, args['timings'], args['listing'])
 
 
 def process_cli():
@@ -23,26 +73,631 @@ def process_cli():
     parser = argparse.ArgumentParser()
     parser.add_argument('-f', help='filename to compile (.py)')
     parser.add_argument('--ast-only', default=False, action='store_true')
+    parser.add_argument('-b', '--batch', nargs='+', metavar='PATH',
+                        help='directories, glob patterns or files to '
+                             'translate, writing one .pep file per input')
+    parser.add_argument('-o', '--out-dir',
+                        help='directory receiving the .pep files of a batch '
+                             '(default: next to each input)')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='number of worker processes used by a batch '
+                             '(default: number of CPUs)')
+    parser.add_argument('--no-fold', default=False, action='store_true',
+                        help='do not evaluate constant expressions at '
+                             'translation time')
+    parser.add_argument('--no-peephole', default=False, action='store_true',
+                        help='disable the peephole optimizer')
+    parser.add_argument('--peephole', nargs='+', metavar='RULE',
+                        choices=PeepholeOptimizer.RULES,
+                        help='apply only the given peephole rules')
+    parser.add_argument('--no-track-registers', default=False,
+                        action='store_true',
+                        help='do not remove loads of values already held '
+                             'by a register')
+    parser.add_argument('--no-inline', default=False, action='store_true',
+                        help='do not substitute small functions at their '
+                             'call sites')
+    parser.add_argument('--inline-budget', type=int, metavar='STATEMENTS',
+                        help='largest function inlined (default: '
+                             f'{DEFAULT_BUDGET} statements)')
+    parser.add_argument('--no-evaluate', default=False, action='store_true',
+                        help='keep the calls to pure functions with '
+                             'arguments known at translation time')
+    parser.add_argument('--evaluate-budget', type=int, metavar='STEPS',
+                        help=f'statements and expressions a call may run '
+                             f'when evaluated at translation time (default: '
+                             f'{DEFAULT_STEPS})')
+    parser.add_argument('--no-hoist', default=False, action='store_true',
+                        help='keep loop-invariant computations inside their '
+                             'loops')
+    parser.add_argument('--no-dead-code', default=False,
+                        action='store_true',
+                        help='keep unreachable functions and unread stores')
+    parser.add_argument('--no-tail-calls', default=False,
+                        action='store_true',
+                        help='keep self-calls in tail position as calls')
+    parser.add_argument('--no-share-slots', default=False,
+                        action='store_true',
+                        help='give every local variable its own stack slot')
+    parser.add_argument('--memoize', nargs='?', type=int,
+                        const=DEFAULT_ENTRIES, metavar='ENTRIES',
+                        help='record the results of pure recursive '
+                             'functions of one parameter, for the '
+                             'arguments 0 to ENTRIES - 1 (default: '
+                             f'{DEFAULT_ENTRIES})')
+    parser.add_argument('--profile', default=False, action='store_true',
+                        help='count the executions of every basic block, '
+                             'writing the map of the counters to a '
+                             '.profile.json file next to the input (next '
+                             'to each output in a batch)')
+    parser.add_argument('--object', default=False, action='store_true',
+                        help='write the object code in the hex format of '
+                             'the Pep/9 loader (.pepo files in a batch) '
+                             'instead of the assembly')
+    parser.add_argument('--listing', default=False, action='store_true',
+                        help='with --object, write the assembler listing '
+                             'to a .pepl file next to the input (next to '
+                             'each output in a batch)')
+    parser.add_argument('--timings', nargs='?', const='table',
+                        choices=('table', 'json'),
+                        help='print the time, peak memory and node and '
+                             'instruction counts of every phase and '
+                             'function to stderr, as a table (default) or '
+                             'one JSON object per file')
+    parser.add_argument('--report', default=False, action='store_true',
+                        help='print optimization reports to stderr')
+    parser.add_argument('--no-cache', default=False, action='store_true',
+                        help='translate every function instead of reusing '
+                             'cached translations')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f'directory of the function cache (default: '
+                             f'{DEFAULT_CACHE_DIR})')
+    parser.add_argument('--cache-size', type=int,
+                        default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        metavar='MB',
+                        help='size above which the least recently used '
+                             'cache entries are evicted')
+    parser.add_argument('--watch', default=False, action='store_true',
+                        help='translate again whenever an input is saved')
+    parser.add_argument('--serve', default=False, action='store_true',
+                        help='keep running, translating the JSON requests '
+                             'read from stdin (or --socket) one per line')
+    parser.add_argument('--socket', metavar='PATH',
+                        help='with --serve, listen on this Unix domain '
+                             'socket instead of stdin/stdout')
+    parser.add_argument('--request-timeout', type=float,
+                        default=DEFAULT_REQUEST_TIMEOUT, metavar='SECONDS',
+                        help='with --serve, CPU time after which a '
+                             'translation is abandoned')
+    parser.add_argument('--worker-memory', type=int,
+                        default=DEFAULT_WORKER_MEMORY, metavar='MB',
+                        help='with --serve, address space of each worker')
     args = vars(parser.parse_args())
-    return args['f'], args['ast_only']
+    if args['socket'] and not args['serve']:
+        parser.error('--socket requires --serve')
+    if not args['f'] and not args['batch'] and not args['serve']:
+        parser.error('one of -f, --batch or --serve is required')
+    if args['listing'] and not args['object']:
+        parser.error('--listing requires --object')
+    return args
+
+
+def translation_options(args):
+    '''
+        Translate the parsed command line into pipeline options
+    '''
+    options = {}
+    if args['no_fold']:
+        options['fold'] = False
+    if args['no_track_registers']:
+        options['track_registers'] = False
+    if args['no_inline']:
+        options['inline'] = False
+    if args['inline_budget'] is not None:
+        options['inline_budget'] = args['inline_budget']
+    if args['no_evaluate']:
+        options['evaluate'] = False
+    if args['evaluate_budget'] is not None:
+        options['evaluate_budget'] = args['evaluate_budget']
+    if args['no_hoist']:
+        options['hoist'] = False
+    if args['no_dead_code']:
+        options['dead_code'] = False
+    if args['no_tail_calls']:
+        options['tail_calls'] = False
+    if args['no_share_slots']:
+        options['share_slots'] = False
+    if args['memoize']:
+        options['memoize'] = args['memoize']
+    if args['no_peephole']:
+        options['peephole'] = False
+    elif args['peephole']:
+        options['peephole'] = args['peephole']
+    if args['object']:
+        options['object'] = True
+    if not args['no_cache']:
+        options['cache'] = TranslationCache(
+            args['cache_dir'], args['cache_size'] * 1024 * 1024)
+    return options
+
+
+def _translate_stdout(input_file, options, timings=None, listing=False):
+    with open(input_file) as f:
+        source = f.read()
+    phase_timings = PhaseTimings() if timings else None
+    listing_buffer = io.StringIO() if listing else None
+    translate_to(source, sys.stdout, input_file, timings=phase_timings,
+                 listing=listing_buffer, **options)
+    sys.stdout.flush()
+    if listing_buffer is not None:
+        with open(listing_path(input_file), 'w') as f:
+            f.write(listing_buffer.getvalue())
+    if options.get('profile') is not None:
+        options['profile'].save(profile_path(input_file))
+    if phase_timings is not None:
+        print(format_timings(phase_timings, timings, input_file), end='',
+              file=sys.stderr)
+    return 0
+
+
+def format_timings(phase_timings, timings, input_file):
+    '''
+        The timings of a file as a table, or as a JSON line for the 'json'
+        format
+    '''
+    if timings == 'json':
+        return json.dumps(dict(phase_timings.to_json(), file=input_file)) \
+            + '\n'
+    return f'; {input_file}\n' + '\n'.join(phase_timings.table()) + '\n'
+
+
+####
+# Watch mode
+####
+
+def watch(paths, run, interval=0.5):
+    '''
+        Call run with the input files matched by paths, then again with the
+        ones saved since, until interrupted. Unchanged functions of a saved
+        file are reused from the cache
+    '''
+    seen = {}
+    try:
+        while True:
+            changed = []
+            for input_file in collect_inputs(paths):
+                try:
+                    mtime = os.stat(input_file).st_mtime_ns
+                except OSError:
+                    continue
+                if seen.get(input_file) != mtime:
+                    seen[input_file] = mtime
+                    changed.append(input_file)
+            if changed:
+                start = time.perf_counter()
+                try:
+                    run(changed)
+                except Exception as e:
+                    # Half-edited sources raise anything, keep watching
+                    print(f'error: {type(e).__name__}: {e}', file=sys.stderr)
+                print(f'; watch: {len(changed)} file(s) translated in '
+                      f'{time.perf_counter() - start:.3f}s', file=sys.stderr)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+####
+# Serve mode
+####
+
+def serve(options, jobs=None, socket_path=None,
+          timeout=DEFAULT_REQUEST_TIMEOUT, memory=DEFAULT_WORKER_MEMORY):
+    '''
+        Translate requests until stdin is closed (or, with a socket path,
+        until interrupted), keeping the translator loaded in a pool of
+        worker processes. A request is a JSON object on a line:
+
+            {"id": 1, "source": "...", "filename": "a.py",
+             "options": {"inline": false}, "report": true, "timings": true,
+             "profile": false, "listing": false}
+
+        and gets a line back, in completion order:
+
+            {"id": 1, "ok": true, "output": "...", "error": null,
+             "line": null, "diagnostics": [...], "timings": {...},
+             "seconds": 0.01}
+
+        Only "source" is required. options holds the pipeline options of
+        REQUEST_OPTIONS. A failed translation (or a request that is not
+        valid) has ok false and the error message, with its source line
+        when known. Each worker runs a request for at most timeout seconds
+        of CPU time within memory MB, and a worker that dies is replaced
+    '''
+    server = TranslationServer(options, jobs, timeout, memory)
+    # Stop as cleanly on a kill as on an interrupt
+    signal.signal(signal.SIGTERM, _terminate)
+    try:
+        if socket_path is None:
+            lock = threading.Lock()
+
+            def respond(response):
+                with lock:
+                    sys.stdout.write(json.dumps(response) + '\n')
+                    sys.stdout.flush()
+            for line in sys.stdin:
+                server.handle(line, respond)
+            server.wait()
+        else:
+            server.listen(socket_path)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+class TranslationServer():
+    """
+        Dispatches the requests of serve mode to a pool of worker
+        processes. Responses are handed to the callback given with each
+        request, from the pool's thread, as soon as they are ready
+    """
+
+    def __init__(self, options, jobs=None, timeout=DEFAULT_REQUEST_TIMEOUT,
+                 memory=DEFAULT_WORKER_MEMORY) -> None:
+        self.options = options
+        self.jobs = jobs
+        self.timeout = timeout
+        self.memory = memory
+        self.__lock = threading.Lock()
+        self.__pending = set()
+        self.__idle = threading.Condition(self.__lock)
+        self.__pool = self._pool()
+
+    def handle(self, line, respond):
+        '''
+            Start the translation of a request line, respond(response) is
+            called once it is done. Requests that cannot be started are
+            answered at once
+        '''
+        start = time.perf_counter()
+        if not line.strip():
+            return
+        request = {}
+        try:
+            if len(line) > MAX_REQUEST_BYTES:
+                raise ValueError(f'larger than {MAX_REQUEST_BYTES} bytes')
+            request = json.loads(line)
+            options = self._options(request)
+        except ValueError as e:
+            request_id = request.get('id') if isinstance(request, dict) \
+                else None
+            response = _failure(request_id, f'invalid request: {e}')
+            response['seconds'] = time.perf_counter() - start
+            respond(response)
+            return
+        with self.__lock:
+            try:
+                future = self.__pool.submit(
+                    _serve_request, request, options, self.timeout)
+            except BrokenProcessPool:
+                # A worker died, the pool cannot be used anymore
+                self.__pool.shutdown(wait=False)
+                self.__pool = self._pool()
+                future = self.__pool.submit(
+                    _serve_request, request, options, self.timeout)
+            self.__pending.add(future)
+        future.add_done_callback(
+            lambda f: self._done(f, request.get('id'), start, respond))
+
+    def wait(self):
+        '''
+            Block until every request started has been answered
+        '''
+        with self.__idle:
+            self.__idle.wait_for(lambda: not self.__pending)
+
+    def listen(self, socket_path):
+        '''
+            Serve the clients connecting to a Unix domain socket, each on
+            its own thread, until interrupted
+        '''
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                lock = threading.Lock()
+                done = threading.Semaphore(0)
+                started = 0
+
+                def respond(response):
+                    try:
+                        with lock:
+                            self.wfile.write(
+                                (json.dumps(response) + '\n').encode())
+                            self.wfile.flush()
+                    except OSError:
+                        pass
+                    done.release()
+                for line in self.rfile:
+                    server.handle(line.decode(errors='replace'), respond)
+                    started += 1
+                # Answer everything before the connection is closed
+                for _ in range(started):
+                    done.acquire()
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        with socketserver.ThreadingUnixStreamServer(socket_path, Handler) \
+                as listener:
+            listener.daemon_threads = True
+            try:
+                listener.serve_forever()
+            finally:
+                os.unlink(socket_path)
+
+    def close(self):
+        self.__pool.shutdown(cancel_futures=True)
+
+    ####
+    # Helper functions
+    ####
+
+    def _pool(self):
+        return ProcessPoolExecutor(max_workers=self.jobs,
+                                   initializer=_serve_worker,
+                                   initargs=(self.memory,))
+
+    def _options(self, request):
+        '''
+            The options of the translation asked for by a request
+        '''
+        if not isinstance(request, dict) \
+                or not isinstance(request.get('source'), str):
+            raise ValueError('expected an object with a "source" string')
+        requested = request.get('options') or {}
+        if not isinstance(requested, dict):
+            raise ValueError('"options" must be an object')
+        unknown = sorted(set(requested) - set(REQUEST_OPTIONS))
+        if unknown:
+            raise ValueError(f'unknown options: {", ".join(unknown)}')
+        return dict(self.options, **requested)
+
+    def _done(self, future, request_id, start, respond):
+        if future.cancelled():
+            response = _failure(request_id, 'cancelled')
+        elif future.exception() is not None:
+            # The worker died (BrokenProcessPool), the next request gets a
+            # new pool
+            response = _failure(
+                request_id, f'{type(future.exception()).__name__}: '
+                            f'{future.exception()}')
+        else:
+            response = future.result()
+        response['seconds'] = time.perf_counter() - start
+        try:
+            respond(response)
+        finally:
+            with self.__idle:
+                self.__pending.discard(future)
+                self.__idle.notify_all()
+
+
+def _serve_worker(memory):
+    '''
+        Initializer of the serve mode workers: bound their address space
+    '''
+    try:
+        import resource
+    except ImportError:
+        return
+    limit = memory * 1024 * 1024
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _serve_request(request, options, timeout):
+    '''
+        Worker: translate the source of a request. Failures, including
+        running out of time or memory, are reported back instead of raised
+    '''
+    report_buffer = io.StringIO() if request.get('report') else None
+    listing_buffer = io.StringIO() \
+        if request.get('listing') and options.get('object') else None
+    block_profile = BlockProfile() if request.get('profile') else None
+    phase_timings = PhaseTimings() if request.get('timings') else None
+    response = _failure(request.get('id'), None)
+    try:
+        with _cpu_limit(timeout):
+            response['output'] = translate(
+                request['source'], request.get('filename', '<request>'),
+                report=report_buffer, profile=block_profile,
+                timings=phase_timings, listing=listing_buffer, **options)
+        response['ok'] = True
+    except SyntaxError as e:
+        response['error'] = f'SyntaxError: {e.msg}'
+        response['line'] = e.lineno
+    except MemoryError:
+        response['error'] = 'MemoryError: the translation ran out of memory'
+    except RecursionError:
+        response['error'] = 'RecursionError: the program nests too deeply'
+    except Exception as e:
+        response['error'] = f'{type(e).__name__}: {e}'
+    if report_buffer is not None:
+        response['diagnostics'] = report_buffer.getvalue().splitlines()
+    if phase_timings is not None:
+        response['timings'] = phase_timings.to_json()
+    if block_profile is not None and response['ok']:
+        response['profile'] = block_profile.to_json()
+    if listing_buffer is not None and response['ok']:
+        response['listing'] = listing_buffer.getvalue()
+    return response
+
+
+def _failure(request_id, error):
+    return {'id': request_id, 'ok': False, 'output': None, 'error': error,
+            'line': None, 'diagnostics': []}
+
+
+@contextlib.contextmanager
+def _cpu_limit(timeout):
+    '''
+        Raise TimeoutError in the body once it used timeout seconds of CPU
+        time, where the platform has interval timers
+    '''
+    if not timeout or not hasattr(signal, 'setitimer'):
+        yield
+        return
+    previous = signal.signal(signal.SIGPROF, _timed_out)
+    signal.setitimer(signal.ITIMER_PROF, timeout)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, previous)
+
+
+def _terminate(signum, frame):
+    sys.exit(0)
+
+
+def _timed_out(signum, frame):
+    raise TimeoutError('the translation took too long')
+
+
+####
+# Batch translation
+####
+
+def translate_batch(paths, out_dir=None, jobs=None, options=None,
+                    report=False, profile=False, timings=None, listing=False):
+    '''
+        Translate every RBS source matched by paths (directories, glob
+        patterns or plain files) on a pool of worker processes, writing one
+        .pep file per input (.pepo with the object option, with its listing
+        if asked) and its counter map when profiling. timings is None or
+        the format of the timings printed per file. Returns the number of
+        files that failed.
+    '''
+    options = options or {}
+    inputs = collect_inputs(paths)
+    if not inputs:
+        print('error: no input files found', file=sys.stderr)
+        return 1
+    extension = '.pepo' if options.get('object') else '.pep'
+    outputs = [output_path(f, inputs, out_dir, extension) for f in inputs]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        # Hand out several files per task so that small sources do not pay
+        # one inter-process round trip each
+        chunksize = max(1, len(inputs) // ((jobs or os.cpu_count() or 1) * 4))
+        results = list(pool.map(_translate_file, inputs, outputs,
+                                repeat(options), repeat(report),
+                                repeat(profile), repeat(timings),
+                                repeat(listing),
+                                chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+
+    failed = 0
+    total_lines = 0
+    for input_file, lines, error, report_text, timings_text in results:
+        total_lines += lines
+        if report_text:
+            print(f'; {input_file}\n{report_text}', end='', file=sys.stderr)
+        if timings_text:
+            print(timings_text, end='', file=sys.stderr)
+        if error is not None:
+            failed += 1
+            print(f'error: {input_file}: {error}', file=sys.stderr)
+
+    rate = elapsed if elapsed > 0 else float('inf')
+    print(f'Translated {len(inputs) - failed}/{len(inputs)} files '
+          f'({failed} failed) in {elapsed:.3f}s: '
+          f'{len(inputs) / rate:.1f} files/s, '
+          f'{total_lines / rate:.1f} lines/s',
+          file=sys.stderr)
+    return failed
+
+
+def collect_inputs(paths):
+    '''
+        Expand directories (recursively) and glob patterns into a sorted,
+        duplicate-free list of .py files
+    '''
+    inputs = []
+    for path in paths:
+        if os.path.isdir(path):
+            found = glob.glob(os.path.join(path, '**', '*.py'), recursive=True)
+        elif glob.has_magic(path):
+            found = glob.glob(path, recursive=True)
+        else:
+            found = [path]
+        inputs.extend(sorted(found))
+    return list(dict.fromkeys(os.path.normpath(f) for f in inputs))
+
+
+def output_path(input_file, inputs, out_dir=None, extension='.pep'):
+    '''
+        Map an input file to its .pep file. Inside out_dir the directory
+        structure below the inputs' common parent is preserved, so that
+        sources sharing a file name do not overwrite each other
+    '''
+    stem = os.path.splitext(input_file)[0]
+    if out_dir is None:
+        return stem + extension
+    root = os.path.commonpath(
+        [os.path.dirname(os.path.abspath(f)) for f in inputs])
+    return os.path.join(
+        out_dir, os.path.relpath(os.path.abspath(stem), root) + extension)
+
 
+def profile_path(path):
+    '''
+        Map an input or output file to the counter map of its profile
+    '''
+    return os.path.splitext(path)[0] + '.profile.json'
 
-def process(input_file, root_node):
-    print(f'; Translating {input_file}')
-    general_level = GeneralizedProgram('tl_1')
 
-    extractor = GlobalVariableExtraction()
-    extractor.visit(root_node)
+def listing_path(path):
+    return os.path.splitext(path)[0] + '.pepl'
 
-    general_level.slicing_vars = extractor.slicing_vars
 
-    memory_alloc = StaticMemoryAllocation(extractor.results, general_level.st)
-    print('; Branching to top level (tl) instructions')
-    print('\t\tBR tl_1')
-    general_level.st = memory_alloc.generate()
-    general_level.visit(root_node)
-    ep = EntryPoint(general_level.finalize())
-    ep.generate()
+def _translate_file(input_file, output_file, options, report, profile,
+                    timings, listing):
+    '''
+        Worker: translate a single file. Any failure is reported back
+        instead of raised, so one bad source does not abort the batch
+    '''
+    lines = 0
+    report_buffer = io.StringIO() if report else None
+    block_profile = BlockProfile() if profile else None
+    phase_timings = PhaseTimings() if timings else None
+    listing_buffer = io.StringIO() if listing else None
+    try:
+        with open(input_file) as f:
+            source = f.read()
+        lines = source.count('\n')
+        assembly = translate(source, input_file, report=report_buffer,
+                             profile=block_profile, timings=phase_timings,
+                             listing=listing_buffer, **options)
+        os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+        with open(output_file, 'w') as f:
+            f.write(assembly)
+        if block_profile is not None:
+            block_profile.save(profile_path(output_file))
+        if listing_buffer is not None:
+            with open(listing_path(output_file), 'w') as f:
+                f.write(listing_buffer.getvalue())
+    except Exception as e:
+        return input_file, lines, f'{type(e).__name__}: {e}', None, None
+    return input_file, lines, None, \
+        report_buffer.getvalue() if report else None, \
+        format_timings(phase_timings, timings, input_file) if timings \
+        else None
 
 
 if __name__ == '__main__':